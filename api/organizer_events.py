@@ -0,0 +1,67 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+from urllib.parse import parse_qs, urlparse
+
+# The recommender package lives at the repository root, shared with the Flask service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommender.auth import authenticate
+from recommender.responses import compact_recommendations, parse_limit, wants_compact_format
+from recommender.service import engine, fetch_organizer_inputs
+
+class handler(BaseHTTPRequestHandler):
+    """Vercel serverless function handler: open events ranked for one of the organizer's
+    hotels (GET /api/organizer/events?hotel_id=...[&hall_id=...])"""
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Authorization, Content-Type')
+        self.end_headers()
+    
+    def send_json(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+    
+    def do_GET(self):
+        try:
+            auth_header = self.headers.get('Authorization')
+            if not auth_header or not auth_header.startswith('Bearer '):
+                self.send_json(401, {'error': 'Unauthorized'})
+                return
+            
+            query = parse_qs(urlparse(self.path).query)
+            hotel_id, hall_id = query.get('hotel_id', [None])[0], query.get('hall_id', [None])[0] or None
+            try:
+                if not hotel_id:
+                    raise ValueError('hotel_id is required')
+                limit = parse_limit(query.get('limit', [None])[0], 'limit')
+            except ValueError as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            compact = wants_compact_format(query.get('format', [None])[0], self.headers.get('Accept'))
+            
+            user_id, _ = authenticate(auth_header.split(' ')[1])
+            if user_id is None:
+                self.send_json(401, {'error': 'Invalid token'})
+                return
+            
+            owned, events, hotels, halls, bookings = fetch_organizer_inputs(user_id, hotel_id)
+            if not owned:
+                self.send_json(404, {'error': 'Hotel not found'})
+                return
+            
+            recommendations = engine.recommend_events(events, hotels, halls, hotel_id, hall_id, limit, bookings)
+            if compact:
+                self.send_json(200, compact_recommendations(recommendations))
+            else:
+                self.send_json(200, {'recommendations': recommendations, 'count': len(recommendations)})
+        
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
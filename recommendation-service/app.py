@@ -1,330 +1,270 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import requests
+import sys
 from datetime import datetime
-import re
+import json
+import logging
+import random
+import time
 
 load_dotenv()
 
+# The recommender package lives at the repository root, shared with the Vercel function
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommender.auth import authenticate
+from recommender.batch import batch_run_slots, fetch_batch_events, iter_batch_recommendations
+from recommender.caches import (catalog_cache, etag_matches, fetch_bookings, fetch_catalog_table, result_cache,
+                               token_cache)
+from recommender.config import (ADMIN_TOKEN, AVAILABILITY_FILTER, HALL_COLUMNS, HOTEL_COLUMNS, LOG_LEVEL,
+                               LOG_SAMPLE_RATE)
+from recommender.metrics import REQUEST_SECONDS, STAGE_SECONDS, SUPABASE_SECONDS, StageTimings, logger
+from recommender.responses import (compact_recommendations, iter_stream_chunks, parse_limit, wants_compact_format,
+                                   wants_stream)
+from recommender.service import (CATALOG_COLUMNS, apply_catalog_change, engine, fetch_organizer_inputs,
+                                 fetch_recommendation_inputs)
+
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['ETag'])
 
-# Supabase configuration
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
 
-def supabase_query(table: str, select: str = '*', filters: dict = None):
-    """Make a direct REST API call to Supabase"""
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}'
-    }
-    params = {'select': select}
-    if filters:
-        params.update(filters)
-    
-    print(f'Querying: {url} with params: {params}')
-    response = requests.get(url, headers=headers, params=params)
-    print(f'Query response status: {response.status_code}')
-    print(f'Query response: {response.text[:500]}')
-    response.raise_for_status()
-    return response.json()
+@app.after_request
+def record_request_time(response):
+    elapsed = time.perf_counter() - g.request_start
+    REQUEST_SECONDS.observe(elapsed, endpoint=request.endpoint or 'unknown', status=response.status_code)
+    timings = g.get('timings')
+    if timings is not None and random.random() < LOG_SAMPLE_RATE:
+        logger.info('%s %s -> %s in %.1fms (%s)', request.method, request.path, response.status_code,
+                    elapsed * 1000, timings.summary())
+    return response
 
-class VenueRecommendationEngine:
-    def __init__(self):
-        self.location_weight = 0.40
-        self.capacity_weight = 0.30
-        self.budget_weight = 0.20
-        self.event_type_weight = 0.10
+@app.route('/api/recommendations', methods=['GET'])
+def get_recommendations():
+    timings = g.timings = StageTimings()
+    try:
+        # Get user ID from authorization header
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            logger.debug('No auth header found')
+            return jsonify({'error': 'Unauthorized'}), 401
         
-    def normalize_location(self, location):
-        """Normalize location string for better matching"""
-        return location.lower().strip()
-    
-    def calculate_location_score(self, event_location, hotel_city):
-        """Calculate location match score using string similarity"""
-        event_loc = self.normalize_location(event_location)
-        hotel_loc = self.normalize_location(hotel_city)
+        try:
+            limit = parse_limit(request.args.get('limit'), 'limit')
+            per_event_limit = parse_limit(request.args.get('per_event_limit'), 'per_event_limit')
+            stream = wants_stream(request.args.get('stream'), request.headers.get('Accept'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        compact = wants_compact_format(request.args.get('format'), request.headers.get('Accept'))
+        if compact and stream:
+            return jsonify({'error': 'The compact format cannot be streamed'}), 400
         
-        # Exact match
-        if event_loc == hotel_loc:
-            return 100
+        token = auth_header.split(' ')[1]
         
-        # Partial match
-        if event_loc in hotel_loc or hotel_loc in event_loc:
-            return 50
+        with timings.span('auth'):
+            user_id, error_details = authenticate(token)
+        if user_id is None:
+            return jsonify({'error': 'Invalid token', 'details': error_details}), 401
         
-        # Check for common cities/regions
-        common_words = set(event_loc.split()) & set(hotel_loc.split())
-        if common_words:
-            return 30
+        # Fetch user's events, hotels and halls in parallel
+        # (hotels and halls are served from the catalog cache when warm)
+        with timings.span('fetch'):
+            events, hotels, halls, bookings = fetch_recommendation_inputs(user_id, timings)
+        logger.debug('User %s: %d events, %d hotels, %d halls', user_id, len(events or []),
+                     len(hotels or []), len(halls or []))
         
-        return 0
-    
-    def calculate_capacity_score(self, event_guests, hall_capacity):
-        """Calculate how well the hall capacity matches guest count"""
-        if hall_capacity is None:
-            return 25  # Some score for halls without specified capacity
+        if not events:
+            if stream == 'ndjson':
+                return Response('', mimetype='application/x-ndjson')
+            return jsonify({'recommendations': [], 'message': 'No events found'})
         
-        # Perfect fit (capacity is 100-120% of guest count)
-        ratio = hall_capacity / event_guests
+        # Unchanged events and catalog produce the same recommendations, so the
+        # client's copy is still valid
+        with timings.span('catalog_indexes'):
+            catalog_version = engine.scoring_version(hotels, halls, bookings)
+        etag = result_cache.etag(catalog_version, events, limit, per_event_limit, compact, stream)
+        cache_headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return '', 304, cache_headers
         
-        if 1.0 <= ratio <= 1.2:
-            return 100
-        elif 0.8 <= ratio < 1.0:
-            # Slightly small
-            return 70
-        elif 1.2 < ratio <= 1.5:
-            # Slightly large but acceptable
-            return 85
-        elif ratio > 1.5:
-            # Too large
-            return max(50 - (ratio - 1.5) * 10, 20)
-        else:
-            # Too small
-            return max(30 - (1.0 - ratio) * 50, 0)
-    
-    def calculate_budget_score(self, event_budget, hall_price):
-        """Calculate budget compatibility score"""
-        if event_budget is None or hall_price is None:
-            return 50  # Neutral score if budget info missing
+        # Score, rescoring only events that changed since the last request
+        with timings.span('scoring'):
+            matches = result_cache.matches(engine, user_id, events, hotels, halls, bookings)
         
-        price_ratio = hall_price / event_budget
+        if stream:
+            # Recommendations are built and serialized one at a time as the body is sent
+            chunks = iter_stream_chunks(
+                engine.iter_ranked(matches, limit, per_event_limit), stream,
+                timestamp=datetime.now().isoformat()
+            )
+            mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+            return Response(stream_with_context(chunks), mimetype=mimetype, headers=cache_headers)
         
-        if price_ratio <= 0.7:
-            # Excellent value
-            return 100
-        elif price_ratio <= 0.85:
-            # Good value
-            return 90
-        elif price_ratio <= 1.0:
-            # Within budget
-            return 80
-        elif price_ratio <= 1.15:
-            # Slightly over budget
-            return 50
-        elif price_ratio <= 1.3:
-            # Moderately over budget
-            return 30
-        else:
-            # Way over budget
-            return 10
-    
-    def calculate_event_type_score(self, event_type, event_name, hotel_description):
-        """Calculate event type matching using keyword analysis"""
-        if not hotel_description:
-            return 50  # Neutral score if no description
+        with timings.span('sorting'):
+            recommendations = engine.rank_matches(matches, limit, per_event_limit)
         
-        try:
-            # Combine event info
-            event_text = f"{event_type} {event_name}".lower()
-            hotel_text = hotel_description.lower()
-            
-            # Extract keywords
-            event_keywords = set(re.findall(r'\w+', event_text))
-            hotel_keywords = set(re.findall(r'\w+', hotel_text))
-            
-            # Remove common stop words
-            stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-            event_keywords -= stop_words
-            hotel_keywords -= stop_words
-            
-            # Find matches
-            common_keywords = event_keywords & hotel_keywords
-            
-            if len(common_keywords) > 0:
-                # Calculate match ratio
-                match_ratio = len(common_keywords) / len(event_keywords) if event_keywords else 0
-                return min(100, 60 + match_ratio * 40)
-            
-            # Check for semantic similarity using simple word containment
-            similarity_count = sum(1 for word in event_keywords if word in hotel_text)
-            if similarity_count > 0:
-                return min(100, 50 + (similarity_count / len(event_keywords)) * 30)
+        with timings.span('serialization'):
+            if compact:
+                response = compact_recommendations(recommendations)
+                response['timestamp'] = datetime.now().isoformat()
+                return jsonify(response), 200, cache_headers
             
-            return 40
-        except:
-            return 50
+            return jsonify({
+                'recommendations': recommendations,
+                'count': len(recommendations),
+                'timestamp': datetime.now().isoformat()
+            }), 200, cache_headers
     
-    def calculate_overall_score(self, scores):
-        """Calculate weighted overall match score"""
-        overall = (
-            scores['location'] * self.location_weight +
-            scores['capacity'] * self.capacity_weight +
-            scores['budget'] * self.budget_weight +
-            scores['event_type'] * self.event_type_weight
-        )
-        return round(overall, 2)
-    
-    def generate_reasons(self, scores, event, hotel, hall):
-        """Generate human-readable reasons for the match"""
-        reasons = []
-        
-        # Location
-        if scores['location'] >= 90:
-            reasons.append("Perfect location match")
-        elif scores['location'] >= 50:
-            reasons.append("Nearby location")
-        elif scores['location'] >= 30:
-            reasons.append("In the same region")
-        
-        # Capacity
-        if hall and hall.get('capacity'):
-            if scores['capacity'] >= 90:
-                reasons.append(f"Ideal hall capacity for {event['guest_count']} guests")
-            elif scores['capacity'] >= 70:
-                reasons.append(f"Hall can accommodate {event['guest_count']} guests")
-            elif scores['capacity'] >= 50:
-                reasons.append(f"Hall available (capacity: {hall['capacity']})")
-        
-        # Budget
-        if scores['budget'] >= 90:
-            reasons.append("Excellent value - Great savings!")
-        elif scores['budget'] >= 80:
-            reasons.append("Within your budget")
-        elif scores['budget'] >= 50:
-            reasons.append("Slightly above budget")
-        
-        # Event Type
-        if scores['event_type'] >= 70:
-            reasons.append(f"Perfect for {event['event_type']} events")
-        elif scores['event_type'] >= 60:
-            reasons.append(f"Suitable for {event['event_type']}")
-        
-        return reasons
-    
-    def recommend_venues(self, events, hotels, halls):
-        """Generate recommendations for all events"""
-        recommendations = []
-        
-        for event in events:
-            for hotel in hotels:
-                # Find halls for this hotel
-                hotel_halls = [h for h in halls if h['hotel_id'] == hotel['id']]
-                
-                if not hotel_halls:
-                    # No halls, use hotel-level scoring
-                    scores = {
-                        'location': self.calculate_location_score(event['location'], hotel['city']),
-                        'capacity': 50,  # Neutral
-                        'budget': 50,    # Neutral
-                        'event_type': self.calculate_event_type_score(
-                            event['event_type'], 
-                            event['event_name'], 
-                            hotel.get('description', '')
-                        )
-                    }
-                    
-                    overall_score = self.calculate_overall_score(scores)
-                    
-                    if overall_score >= 40:  # Minimum threshold
-                        recommendations.append({
-                            'hotel': hotel,
-                            'hall': None,
-                            'event': event,
-                            'matchScore': overall_score,
-                            'reasons': self.generate_reasons(scores, event, hotel, None),
-                            'confidence': overall_score / 100,
-                            'scores': scores
-                        })
-                else:
-                    # Score each hall
-                    for hall in hotel_halls:
-                        scores = {
-                            'location': self.calculate_location_score(event['location'], hotel['city']),
-                            'capacity': self.calculate_capacity_score(event['guest_count'], hall.get('capacity')),
-                            'budget': self.calculate_budget_score(event.get('budget'), hall.get('price_per_event')),
-                            'event_type': self.calculate_event_type_score(
-                                event['event_type'], 
-                                event['event_name'], 
-                                hotel.get('description', '')
-                            )
-                        }
-                        
-                        overall_score = self.calculate_overall_score(scores)
-                        
-                        if overall_score >= 40:  # Minimum threshold
-                            recommendations.append({
-                                'hotel': hotel,
-                                'hall': hall,
-                                'event': event,
-                                'matchScore': overall_score,
-                                'reasons': self.generate_reasons(scores, event, hotel, hall),
-                                'confidence': overall_score / 100,
-                                'scores': scores
-                            })
-        
-        # Sort by match score
-        recommendations.sort(key=lambda x: x['matchScore'], reverse=True)
-        
-        return recommendations
+    except Exception as e:
+        logger.exception('GET /api/recommendations failed')
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/api/recommendations', methods=['GET'])
-def get_recommendations():
+@app.route('/api/organizer/events', methods=['GET'])
+def get_organizer_events():
+    """Open events ranked for one of the organizer's hotels (?hotel_id=), or one of its halls (&hall_id=)"""
+    timings = g.timings = StageTimings()
     try:
-        # Get user ID from authorization header
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
-            print('No auth header found')
             return jsonify({'error': 'Unauthorized'}), 401
         
-        token = auth_header.split(' ')[1]
-        print(f'Token received: {token[:20]}...')
-        
-        # Verify token with Supabase - use the anon key in apikey header
-        headers = {
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {token}'
-        }
-        
-        print(f'Calling: {SUPABASE_URL}/auth/v1/user')
-        user_response = requests.get(f"{SUPABASE_URL}/auth/v1/user", headers=headers)
-        print(f'User response status: {user_response.status_code}')
-        print(f'User response: {user_response.text[:200]}')
-        
-        if user_response.status_code != 200:
-            return jsonify({'error': 'Invalid token', 'details': user_response.text}), 401
-        
-        user_data = user_response.json()
-        user_id = user_data.get('id')
-        print(f'User ID: {user_id}')
-        
-        # Fetch user's events (all statuses, not just open)
-        events = supabase_query('events', '*', {'user_id': f'eq.{user_id}'})
-        print(f'Found {len(events) if events else 0} events')
-        print(f'Events: {events}')
-        
-        if not events:
-            return jsonify({'recommendations': [], 'message': 'No events found'})
+        hotel_id, hall_id = request.args.get('hotel_id'), request.args.get('hall_id') or None
+        if not hotel_id:
+            return jsonify({'error': 'hotel_id is required'}), 400
+        try:
+            limit = parse_limit(request.args.get('limit'), 'limit')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        compact = wants_compact_format(request.args.get('format'), request.headers.get('Accept'))
         
-        # Fetch all hotels
-        hotels = supabase_query('hotels', '*')
-        print(f'Found {len(hotels) if hotels else 0} hotels')
+        with timings.span('auth'):
+            user_id, error_details = authenticate(auth_header.split(' ')[1])
+        if user_id is None:
+            return jsonify({'error': 'Invalid token', 'details': error_details}), 401
         
-        # Fetch all halls
-        halls = supabase_query('hotel_halls', '*')
-        print(f'Found {len(halls) if halls else 0} halls')
+        # Open events are served from the catalog cache like hotels and halls
+        with timings.span('fetch'):
+            owned, events, hotels, halls, bookings = fetch_organizer_inputs(user_id, hotel_id, timings)
+        if not owned:
+            return jsonify({'error': 'Hotel not found'}), 404
         
-        # Generate recommendations
-        engine = VenueRecommendationEngine()
-        recommendations = engine.recommend_venues(events, hotels, halls)
+        with timings.span('scoring'):
+            recommendations = engine.recommend_events(events, hotels, halls, hotel_id, hall_id, limit, bookings)
         
-        return jsonify({
-            'recommendations': recommendations,
-            'count': len(recommendations),
-            'timestamp': datetime.now().isoformat()
-        })
+        with timings.span('serialization'):
+            if compact:
+                response = compact_recommendations(recommendations)
+                response['timestamp'] = datetime.now().isoformat()
+                return jsonify(response)
+            
+            return jsonify({
+                'recommendations': recommendations,
+                'count': len(recommendations),
+                'timestamp': datetime.now().isoformat()
+            })
     
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception('GET /api/organizer/events failed')
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/catalog/invalidate', methods=['POST'])
+def invalidate_catalog():
+    """Drop cached catalog tables, e.g. after an organizer edits a venue"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    dropped = catalog_cache.invalidate(request.args.get('table'))
+    return jsonify({'invalidated': dropped, 'cache': catalog_cache.stats()})
+
+@app.route('/api/admin/recommendations/batch', methods=['POST'])
+def batch_recommendations():
+    """Recommendations for many events at once, streamed as NDJSON (one line per event)"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    payload = request.get_json(silent=True) or {}
+    user_ids, event_ids, status = payload.get('user_ids'), payload.get('event_ids'), payload.get('status')
+    if not (user_ids or event_ids or status):
+        return jsonify({'error': 'Select events with user_ids, event_ids or status'}), 400
+    if not all(ids is None or isinstance(ids, list) for ids in (user_ids, event_ids)):
+        return jsonify({'error': 'user_ids and event_ids must be lists'}), 400
+    if user_ids and event_ids:
+        return jsonify({'error': 'Pass user_ids or event_ids, not both'}), 400
+    try:
+        per_event_limit = parse_limit(payload.get('per_event_limit'), 'per_event_limit')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    compact = payload.get('format') == 'compact'
+    
+    # Held until the response is closed, which also happens when the client goes away
+    if not batch_run_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many batch runs in progress, retry later'}), 429
+    try:
+        hotels = fetch_catalog_table('hotels', HOTEL_COLUMNS)
+        halls = fetch_catalog_table('hotel_halls', HALL_COLUMNS)
+        bookings = fetch_bookings() if AVAILABILITY_FILTER else None
+    except Exception:
+        batch_run_slots.release()
+        raise
+    
+    def generate():
+        try:
+            events = fetch_batch_events(user_ids, event_ids, status)
+            for result in iter_batch_recommendations(events, hotels, halls, per_event_limit, compact,
+                                                     bookings=bookings):
+                yield json.dumps(result, default=str) + '\n'
+        except Exception as e:
+            # The status line is already sent, so report the failure in-band
+            logger.exception('Batch recommendations failed')
+            yield json.dumps({'error': str(e)}) + '\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(batch_run_slots.release)
+    return response
+
+@app.route('/api/admin/catalog/changes', methods=['POST'])
+def catalog_changes():
+    """Apply a Supabase database webhook payload for hotels or hotel_halls"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    payload = request.get_json(silent=True)
+    payload = payload if isinstance(payload, dict) else {}
+    table = payload.get('table')
+    if table not in CATALOG_COLUMNS:
+        return jsonify({'error': f'Unsupported table: {table}'}), 400
+    record, old_record = payload.get('record'), payload.get('old_record')
+    if not all(row is None or isinstance(row, dict) for row in (record, old_record)):
+        return jsonify({'error': 'record and old_record must be objects'}), 400
+    
+    try:
+        applied = apply_catalog_change(table, payload.get('type'), record, old_record)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'applied': applied, 'cache': catalog_cache.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, stage and Supabase query latency histograms in Prometheus text format"""
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render() + SUPABASE_SECONDS.render()
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'recommendation-engine'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'recommendation-engine',
+        'catalogCache': catalog_cache.stats(),
+        'tokenCache': token_cache.stats(),
+        'resultCache': result_cache.stats(),
+        'scoringPlan': engine.plan.as_dict()
+    })
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
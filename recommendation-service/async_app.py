@@ -0,0 +1,275 @@
+"""The recommendation service on asyncio (aiohttp), as an alternative to app.py.
+
+Supabase calls don't hold a worker while they wait, so one process serves
+many concurrent requests, and identical calls in flight together are merged
+into one (see recommender/async_service.py). Scoring runs on a thread so it
+doesn't stall the event loop. Same environment and endpoints as app.py,
+except the batch endpoint, which stays on app.py.
+
+Usage:
+    python async_app.py
+"""
+from aiohttp import web
+from dotenv import load_dotenv
+import asyncio
+import os
+import sys
+from datetime import datetime
+import itertools
+import json
+import logging
+import random
+import time
+
+load_dotenv()
+
+# The recommender package lives at the repository root, shared with the Vercel function
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommender import async_rest
+from recommender.async_service import (authenticate, fetch_organizer_inputs, fetch_recommendation_inputs,
+                                       single_flight)
+from recommender.caches import catalog_cache, etag_matches, result_cache, token_cache
+from recommender.config import ADMIN_TOKEN, LOG_LEVEL, LOG_SAMPLE_RATE
+from recommender.metrics import REQUEST_SECONDS, STAGE_SECONDS, SUPABASE_SECONDS, StageTimings, logger
+from recommender.responses import (compact_recommendations, iter_stream_chunks, parse_limit, wants_compact_format,
+                                   wants_stream)
+from recommender.service import CATALOG_COLUMNS, apply_catalog_change, engine
+
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+# Chunks of a streamed response serialized per trip to the scoring thread
+STREAM_BATCH = 64
+
+def json_response(body, status=200, headers=None):
+    return web.json_response(body, status=status, headers=headers, dumps=lambda value: json.dumps(value, default=str))
+
+@web.middleware
+async def cors_preflight(request, handler):
+    if request.method == 'OPTIONS':
+        return web.Response(headers={
+            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+            'Access-Control-Allow-Headers': request.headers.get('Access-Control-Request-Headers', '*')
+        })
+    return await handler(request)
+
+async def add_cors_headers(request, response):
+    """What flask_cors does for app.py: any origin, ETag readable by scripts.
+    
+    Added as the headers are sent, so streamed responses get them too.
+    """
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = 'ETag'
+
+@web.middleware
+async def record_request_time(request, handler):
+    start = time.perf_counter()
+    response = await handler(request)
+    elapsed = time.perf_counter() - start
+    route = request.match_info.route
+    endpoint = route.handler.__name__ if route.resource is not None else 'unknown'
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, status=response.status)
+    timings = request.get('timings')
+    if timings is not None and random.random() < LOG_SAMPLE_RATE:
+        logger.info('%s %s -> %s in %.1fms (%s)', request.method, request.path, response.status,
+                    elapsed * 1000, timings.summary())
+    return response
+
+def bearer_token(request):
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+async def get_recommendations(request):
+    timings = request['timings'] = StageTimings()
+    try:
+        token = bearer_token(request)
+        if token is None:
+            logger.debug('No auth header found')
+            return json_response({'error': 'Unauthorized'}, 401)
+        
+        try:
+            limit = parse_limit(request.query.get('limit'), 'limit')
+            per_event_limit = parse_limit(request.query.get('per_event_limit'), 'per_event_limit')
+            stream = wants_stream(request.query.get('stream'), request.headers.get('Accept'))
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        compact = wants_compact_format(request.query.get('format'), request.headers.get('Accept'))
+        if compact and stream:
+            return json_response({'error': 'The compact format cannot be streamed'}, 400)
+        
+        with timings.span('auth'):
+            user_id, error_details = await authenticate(token)
+        if user_id is None:
+            return json_response({'error': 'Invalid token', 'details': error_details}, 401)
+        
+        with timings.span('fetch'):
+            events, hotels, halls, bookings = await fetch_recommendation_inputs(user_id, timings)
+        logger.debug('User %s: %d events, %d hotels, %d halls', user_id, len(events or []),
+                     len(hotels or []), len(halls or []))
+        
+        if not events:
+            if stream == 'ndjson':
+                return web.Response(text='', content_type='application/x-ndjson')
+            return json_response({'recommendations': [], 'message': 'No events found'})
+        
+        with timings.span('catalog_indexes'):
+            catalog_version = await asyncio.to_thread(engine.scoring_version, hotels, halls, bookings)
+        etag = result_cache.etag(catalog_version, events, limit, per_event_limit, compact, stream)
+        cache_headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return web.Response(status=304, headers=cache_headers)
+        
+        with timings.span('scoring'):
+            matches = await asyncio.to_thread(result_cache.matches, engine, user_id, events, hotels, halls, bookings)
+        
+        if stream:
+            response = web.StreamResponse(headers=cache_headers)
+            response.content_type = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+            await response.prepare(request)
+            chunks = iter_stream_chunks(
+                engine.iter_ranked(matches, limit, per_event_limit), stream,
+                timestamp=datetime.now().isoformat()
+            )
+            while True:
+                batch = await asyncio.to_thread(lambda: ''.join(itertools.islice(chunks, STREAM_BATCH)))
+                if not batch:
+                    break
+                await response.write(batch.encode())
+            await response.write_eof()
+            return response
+        
+        with timings.span('sorting'):
+            recommendations = await asyncio.to_thread(engine.rank_matches, matches, limit, per_event_limit)
+        
+        with timings.span('serialization'):
+            if compact:
+                response = compact_recommendations(recommendations)
+                response['timestamp'] = datetime.now().isoformat()
+                return json_response(response, headers=cache_headers)
+            
+            return json_response({
+                'recommendations': recommendations,
+                'count': len(recommendations),
+                'timestamp': datetime.now().isoformat()
+            }, headers=cache_headers)
+    
+    except Exception as e:
+        logger.exception('GET /api/recommendations failed')
+        return json_response({'error': str(e)}, 500)
+
+async def get_organizer_events(request):
+    """Open events ranked for one of the organizer's hotels (?hotel_id=), or one of its halls (&hall_id=)"""
+    timings = request['timings'] = StageTimings()
+    try:
+        token = bearer_token(request)
+        if token is None:
+            return json_response({'error': 'Unauthorized'}, 401)
+        
+        hotel_id, hall_id = request.query.get('hotel_id'), request.query.get('hall_id') or None
+        if not hotel_id:
+            return json_response({'error': 'hotel_id is required'}, 400)
+        try:
+            limit = parse_limit(request.query.get('limit'), 'limit')
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        compact = wants_compact_format(request.query.get('format'), request.headers.get('Accept'))
+        
+        with timings.span('auth'):
+            user_id, error_details = await authenticate(token)
+        if user_id is None:
+            return json_response({'error': 'Invalid token', 'details': error_details}, 401)
+        
+        with timings.span('fetch'):
+            owned, events, hotels, halls, bookings = await fetch_organizer_inputs(user_id, hotel_id, timings)
+        if not owned:
+            return json_response({'error': 'Hotel not found'}, 404)
+        
+        with timings.span('scoring'):
+            recommendations = await asyncio.to_thread(
+                engine.recommend_events, events, hotels, halls, hotel_id, hall_id, limit, bookings)
+        
+        with timings.span('serialization'):
+            if compact:
+                response = compact_recommendations(recommendations)
+                response['timestamp'] = datetime.now().isoformat()
+                return json_response(response)
+            
+            return json_response({
+                'recommendations': recommendations,
+                'count': len(recommendations),
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    except Exception as e:
+        logger.exception('GET /api/organizer/events failed')
+        return json_response({'error': str(e)}, 500)
+
+async def invalidate_catalog(request):
+    """Drop cached catalog tables, e.g. after an organizer edits a venue"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return json_response({'error': 'Unauthorized'}, 401)
+    
+    dropped = catalog_cache.invalidate(request.query.get('table'))
+    return json_response({'invalidated': dropped, 'cache': catalog_cache.stats()})
+
+async def catalog_changes(request):
+    """Apply a Supabase database webhook payload for hotels or hotel_halls"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return json_response({'error': 'Unauthorized'}, 401)
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    payload = payload if isinstance(payload, dict) else {}
+    table = payload.get('table')
+    if table not in CATALOG_COLUMNS:
+        return json_response({'error': f'Unsupported table: {table}'}, 400)
+    record, old_record = payload.get('record'), payload.get('old_record')
+    if not all(row is None or isinstance(row, dict) for row in (record, old_record)):
+        return json_response({'error': 'record and old_record must be objects'}, 400)
+    
+    try:
+        # Probes the tables' versions with the blocking client, under a lock shared with other changes
+        applied = await asyncio.to_thread(
+            apply_catalog_change, table, payload.get('type'), record, old_record)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    return json_response({'applied': applied, 'cache': catalog_cache.stats()})
+
+async def metrics(request):
+    """Request, stage and Supabase query latency histograms in Prometheus text format"""
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render() + SUPABASE_SECONDS.render()
+    return web.Response(body=('\n'.join(lines) + '\n').encode(), headers={'Content-Type': 'text/plain; version=0.0.4'})
+
+async def health_check(request):
+    return json_response({
+        'status': 'healthy',
+        'service': 'recommendation-engine',
+        'catalogCache': catalog_cache.stats(),
+        'tokenCache': token_cache.stats(),
+        'resultCache': result_cache.stats(),
+        'singleFlight': single_flight.stats(),
+        'scoringPlan': engine.plan.as_dict()
+    })
+
+async def close_supabase_session(app):
+    await async_rest.close_session()
+
+def create_app():
+    app = web.Application(middlewares=[cors_preflight, record_request_time])
+    app.router.add_get('/api/recommendations', get_recommendations)
+    app.router.add_get('/api/organizer/events', get_organizer_events)
+    app.router.add_post('/api/admin/catalog/invalidate', invalidate_catalog)
+    app.router.add_post('/api/admin/catalog/changes', catalog_changes)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/health', health_check)
+    app.on_response_prepare.append(add_cors_headers)
+    app.on_cleanup.append(close_supabase_session)
+    return app
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5000))
+    web.run_app(create_app(), host='0.0.0.0', port=port)
@@ -0,0 +1,67 @@
+"""Score recommendations for many events in one run and write them as NDJSON.
+
+Loads the catalog once, spreads the events over a process pool and writes
+one line per event as soon as its chunk is scored (lines are not in input
+order). Logging goes to stderr. Uses the same environment as app.py.
+
+Usage:
+    python batch.py --status open > suggestions.ndjson
+    python batch.py --user-ids <uuid> <uuid> --per-event-limit 5 --output suggestions.ndjson
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommender import supabase_rest
+from recommender.batch import fetch_batch_events, iter_batch_recommendations
+from recommender.catalog import CatalogTable
+from recommender.config import (AVAILABILITY_FILTER, BATCH_CHUNK_SIZE, BATCH_WORKERS, BOOKING_COLUMNS, HALL_COLUMNS,
+                               HOTEL_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument('--user-ids', nargs='+', help='score these users\' events')
+    selection.add_argument('--event-ids', nargs='+', help='score these events')
+    parser.add_argument('--status', help='only events with this status, e.g. open')
+    parser.add_argument('--per-event-limit', type=int, help='recommendations kept per event')
+    parser.add_argument('--compact', action='store_true', help='write compact recommendations')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE)
+    parser.add_argument('--output', default='-', help='output file (default: stdout)')
+    args = parser.parse_args()
+
+    if not (args.user_ids or args.event_ids or args.status):
+        parser.error('select events with --user-ids, --event-ids or --status')
+
+    with contextlib.ExitStack() as stack:
+        output = sys.stdout if args.output == '-' else stack.enter_context(open(args.output, 'w'))
+
+        # Compact tables are also what each worker process receives
+        hotels = CatalogTable.from_rows(supabase_rest.supabase_query('hotels', HOTEL_COLUMNS))
+        halls = CatalogTable.from_rows(supabase_rest.supabase_query('hotel_halls', HALL_COLUMNS))
+        bookings = None
+        if AVAILABILITY_FILTER:
+            bookings = CatalogTable.from_rows(
+                supabase_rest.supabase_query('invites', BOOKING_COLUMNS, {'status': 'eq.accepted'}))
+        events = fetch_batch_events(args.user_ids, args.event_ids, args.status)
+
+        count = 0
+        for result in iter_batch_recommendations(events, hotels, halls, args.per_event_limit, args.compact,
+                                                 workers=args.workers, chunk_size=args.chunk_size, bookings=bookings):
+            output.write(json.dumps(result, default=str) + '\n')
+            output.flush()
+            count += 1
+        print(f'Scored {count} events against {len(hotels)} hotels and {len(halls)} halls', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+"""Benchmark VenueRecommendationEngine on synthetic data.
+
+Compares the old per-(event, hotel) list scan against the grouped index
+built once per catalog load, and the python scoring backend against the
+vectorized numpy backend. Runs entirely on synthetic data, no Supabase
+connection needed.
+
+--suite measures p50/p99 latency, throughput and peak memory of
+recommend_venues and of the full GET /api/recommendations path, with
+supabase_query stubbed to serve the synthetic catalog and the bearer token
+verified locally. Results can be saved as a baseline and later runs
+compared against it.
+
+--memory reports the memory the catalog takes as parsed row dicts, as
+compact CatalogTables and mapped from a binary snapshot, and the size of the
+engine's indexes over it.
+
+--reverse times reverse queries (recommend_events: the open events that best
+fit one hotel) against a fixed catalog, with --sizes as the number of events.
+
+--profile counts the function calls one request makes on each scoring path
+(forward, top-K, the full GET /api/recommendations path and a reverse query),
+split into calls into Python functions and into builtins, and lists the
+most-called functions for the largest size.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --events 10 --halls-per-hotel 5 --sizes 100 1000 10000
+    python benchmark.py --suite --sizes 10 100 1000 10000 100000 --save-baseline baseline.json
+    python benchmark.py --suite --baseline baseline.json --max-regression 0.2
+    python benchmark.py --memory --sizes 1000 10000 50000
+    python benchmark.py --reverse --sizes 1000 10000 100000
+    python benchmark.py --profile --sizes 1000 20000
+"""
+import argparse
+import base64
+import contextlib
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import platform
+import pstats
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import app  # also puts the recommender package on sys.path
+from recommender import auth, caches, config, supabase_rest
+from recommender.catalog import CatalogTable
+from recommender.engine import VenueRecommendationEngine
+from recommender.metrics import logger
+from recommender.snapshot import read_snapshot, write_snapshot
+from recommender.vectorized import VectorizedVenueRecommendationEngine, np
+from synthetic import generate_catalog
+
+def naive_join(events, hotels, halls):
+    """The original join: scan every hall for every (event, hotel) pair"""
+    matched = 0
+    for event in events:
+        for hotel in hotels:
+            matched += len([h for h in halls if h['hotel_id'] == hotel['id']])
+    return matched
+
+
+def indexed_join(engine, events, hotels, halls):
+    """The grouped join: index once, then one lookup per (event, hotel) pair"""
+    halls_by_hotel = engine.group_halls_by_hotel(halls)
+    matched = 0
+    for event in events:
+        for hotel in hotels:
+            matched += len(halls_by_hotel.get(hotel['id'], []))
+    return matched
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def measure(fn, iterations, max_seconds):
+    """Time repeated calls of fn, then trace one extra call for its peak memory.
+
+    One untimed call warms up first. Stops after iterations calls or
+    max_seconds, whichever comes first (at least one call). Memory is traced
+    separately so it does not slow the timed calls.
+    """
+    fn()
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    while len(samples) < iterations and (not samples or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'samples': len(samples),
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'throughput_per_s': len(samples) / sum(samples),
+        'peak_mb': peak / 1e6,
+    }
+
+
+def make_test_token(secret, user_id='benchmark-user', ttl=3600):
+    """An HS256 access token that authenticate() accepts with SUPABASE_JWT_SECRET=secret"""
+    def encode(part):
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b'=').decode()
+
+    signing_input = f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode({'sub': user_id, 'role': 'authenticated', 'exp': time.time() + ttl})}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f'{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b"=").decode()}'
+
+
+@contextlib.contextmanager
+def stubbed_service(events, hotels, halls):
+    """Serve the synthetic catalog through the service's Supabase access and verify tokens locally.
+
+    Yields a function that performs one GET /api/recommendations through the
+    Flask test client. The module's caches are cleared on entry and exit, and
+    its sampled request logging is muted.
+    """
+    tables = {'events': events, 'hotels': hotels, 'hotel_halls': halls, 'invites': []}
+    saved = (supabase_rest.supabase_query, supabase_rest.supabase_table_version, auth.SUPABASE_JWT_SECRET, logger.disabled)
+    supabase_rest.supabase_query = lambda table, select='*', filters=None: tables[table]
+    supabase_rest.supabase_table_version = lambda table, version_column: (str(len(tables[table])), None)
+    auth.SUPABASE_JWT_SECRET = 'benchmark-secret'
+    logger.disabled = True
+    for cache in (caches.catalog_cache, caches.result_cache):
+        cache.invalidate()
+
+    client = app.app.test_client()
+    headers = {'Authorization': f'Bearer {make_test_token(auth.SUPABASE_JWT_SECRET)}'}
+
+    def request(query=''):
+        response = client.get(f'/api/recommendations{query}', headers=headers)
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f'GET /api/recommendations returned {response.status_code}')
+
+    try:
+        yield request
+    finally:
+        supabase_rest.supabase_query, supabase_rest.supabase_table_version, auth.SUPABASE_JWT_SECRET, logger.disabled = saved
+        for cache in (caches.catalog_cache, caches.result_cache):
+            cache.invalidate()
+
+
+def run_suite(sizes, num_events, halls_per_hotel, iterations, max_seconds, query=''):
+    """Measure every path at every catalog size; returns one result dict per (path, size)"""
+    results = []
+    engines = [('recommend_venues[python]', VenueRecommendationEngine())]
+    if np is not None:
+        engines.append(('recommend_venues[numpy]', VectorizedVenueRecommendationEngine()))
+
+    for size in sizes:
+        events, hotels, halls = generate_catalog(size, halls_per_hotel, num_events)
+        paths = []
+        for name, engine in engines:
+            engine.get_catalog_indexes(hotels, halls)  # indexes are built once per catalog load
+            paths.append((name, lambda engine=engine: engine.recommend_venues(events, hotels, halls)))
+
+        with stubbed_service(events, hotels, halls) as request:
+            request(query)  # warm the catalog cache, catalog indexes and token cache
+            # Rescore on every request, as for a user whose events changed
+            paths.append((f'GET /api/recommendations{query}',
+                          lambda: (caches.result_cache.invalidate(), request(query))))
+            for name, fn in paths:
+                stats = measure(fn, iterations, max_seconds)
+                results.append(dict(stats, path=name, halls=size, hotels=len(hotels), events=num_events))
+                yield results[-1]
+
+
+def load_baseline(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    return {(result['path'], result['halls'], result['events']): result for result in baseline['results']}
+
+
+def save_baseline(path, results, args):
+    with open(path, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'numpy': np.__version__ if np is not None else None,
+            'scoring_backend': config.SCORING_BACKEND,
+            'args': {'events': args.events, 'halls_per_hotel': args.halls_per_hotel, 'iterations': args.iterations},
+            'results': results,
+        }, f, indent=2)
+
+
+def suite_main(args):
+    """Print the suite results; with a baseline, returns 1 if any p50 regressed past args.max_regression"""
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+    results = []
+    regressions = []
+
+    print(f"{'path':<36} {'halls':>7} {'runs':>5} {'p50':>10} {'p99':>10} {'per sec':>9} {'peak mem':>9}"
+          + (f" {'vs baseline':>12}" if baseline else ''))
+    for result in run_suite(args.sizes, args.events, args.halls_per_hotel, args.iterations, args.max_seconds,
+                            args.query):
+        results.append(result)
+        line = (f"{result['path']:<36} {result['halls']:>7} {result['samples']:>5} {result['p50_ms']:>8.2f}ms "
+                f"{result['p99_ms']:>8.2f}ms {result['throughput_per_s']:>9.1f} {result['peak_mb']:>7.1f}MB")
+        previous = baseline.get((result['path'], result['halls'], result['events']))
+        if previous is not None:
+            change = result['p50_ms'] / previous['p50_ms'] - 1 if previous['p50_ms'] else 0.0
+            line += f' {change:>+11.1%}'
+            if change > args.max_regression and result['p50_ms'] - previous['p50_ms'] > args.min_regression_ms:
+                regressions.append(result)
+                line += '  REGRESSION'
+        elif baseline:
+            line += f" {'-':>12}"
+        print(line)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, args)
+        print(f'Saved baseline to {args.save_baseline}')
+    if regressions:
+        print(f'{len(regressions)} result(s) regressed by more than {args.max_regression:.0%} '
+              f'and {args.min_regression_ms}ms (p50)', file=sys.stderr)
+        return 1
+    return 0
+
+
+def traced_size(fn):
+    """Call fn() and return its result with the bytes still allocated by the call"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def memory_main(args):
+    """Catalog memory as row dicts vs compact and mapped tables, and index size per backend.
+
+    Mapped tables are measured as the memory each process allocates; the
+    mapped file itself is page cache, shared by every process that maps it.
+    """
+    engines = [('python', VenueRecommendationEngine)]
+    if np is not None:
+        engines.append(('numpy', VectorizedVenueRecommendationEngine))
+
+    print(f"{'halls':>8} {'row dicts':>10} {'tables':>9} {'saved':>6} {'mapped':>9} {'file':>9} " +
+          ' '.join(f"{f'indexes[{name}]':>16}" for name, _ in engines))
+    for size in args.sizes:
+        _, hotels, halls = generate_catalog(size, args.halls_per_hotel)
+        # Parsed from JSON, as the rows arrive from Supabase
+        text = json.dumps([hotels, halls])
+        _, rows_size = traced_size(lambda: json.loads(text))
+        tables, tables_size = traced_size(lambda: [CatalogTable.from_rows(table) for table in json.loads(text)])
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'catalog.bin')
+            write_snapshot(path, {'hotels': ('*', tables[0], None), 'hotel_halls': ('*', tables[1], None)})
+            _, mapped_size = traced_size(lambda: read_snapshot(path))
+            file_size = os.path.getsize(path)
+        index_sizes = [traced_size(lambda: engine().build_catalog_indexes(*tables))[1] for _, engine in engines]
+        print(f'{size:>8} {rows_size / 2 ** 20:>8.1f}MB {tables_size / 2 ** 20:>7.1f}MB '
+              f'{1 - tables_size / rows_size:>6.0%} {mapped_size / 2 ** 20:>7.1f}MB {file_size / 2 ** 20:>7.1f}MB ' +
+              ' '.join(f'{index_size / 2 ** 20:>14.1f}MB' for index_size in index_sizes))
+
+
+def reverse_main(args, num_halls=5000, num_hotels=20, limit=20):
+    """Per-hotel reverse query latency: indexed top 20, indexed all matches, and every event scored"""
+    _, hotels, halls = generate_catalog(num_halls, args.halls_per_hotel)
+    engine, exhaustive_engine = VenueRecommendationEngine(), VenueRecommendationEngine(prefilter=False)
+    print(f'{num_halls} halls; median over {num_hotels} hotels')
+    print(f"{'events':>8} {'index build':>12} {f'top {limit}':>9} {'all matches':>12} {'scan all':>9} {'speedup':>8}")
+    for size in args.sizes:
+        events = CatalogTable.from_rows(generate_catalog(0, num_events=size)[0])
+        engine.get_catalog_indexes(hotels, halls)
+        exhaustive_engine.get_catalog_indexes(hotels, halls)
+        _, build_time = timed(engine.get_event_indexes, events)
+        exhaustive_engine.get_event_indexes(events)
+
+        top_times, all_times, scan_times = [], [], []
+        for hotel in hotels[:num_hotels]:
+            top, top_time = timed(engine.recommend_events, events, hotels, halls, hotel['id'], None, limit)
+            _, all_time = timed(engine.recommend_events, events, hotels, halls, hotel['id'])
+            scanned, scan_time = timed(exhaustive_engine.recommend_events, events, hotels, halls, hotel['id'])
+            assert json.dumps(top) == json.dumps(scanned[:limit])
+            top_times.append(top_time)
+            all_times.append(all_time)
+            scan_times.append(scan_time)
+        top_time, all_time, scan_time = (statistics.median(times) for times in (top_times, all_times, scan_times))
+        print(f'{size:>8} {build_time * 1000:>10.1f}ms {top_time * 1000:>7.2f}ms {all_time * 1000:>10.2f}ms '
+              f'{scan_time * 1000:>7.2f}ms {scan_time / top_time:>7.1f}x')
+
+
+def profile_calls(fn):
+    """Run fn under cProfile; returns (pstats.Stats, python function calls, builtin calls)"""
+    profiler = cProfile.Profile()
+    profiler.runcall(fn)
+    stats = pstats.Stats(profiler)
+    builtin_calls = sum(entry[1] for (filename, _, _), entry in stats.stats.items() if filename == '~')
+    return stats, stats.total_calls - builtin_calls, builtin_calls
+
+
+def profile_main(args, top=12):
+    """Function calls per request on each scoring path, and the most-called functions at the largest size"""
+    engine = VenueRecommendationEngine()
+    profiles = {}
+    print(f"{'path':<28} {'halls':>8} {'matches':>8} {'python calls':>13} {'builtin calls':>14} {'calls/match':>12}")
+    for size in args.sizes:
+        events, hotels, halls = generate_catalog(size, args.halls_per_hotel, args.events)
+        open_events = CatalogTable.from_rows(generate_catalog(0, num_events=size, seed=1)[0])
+        engine.get_catalog_indexes(hotels, halls)  # indexes are built once per catalog load
+        engine.get_event_indexes(open_events)
+        with stubbed_service(events, hotels, halls) as request:
+            request()  # warm the catalog cache, catalog indexes and token cache
+            matches = len(engine.recommend_venues(events, hotels, halls))
+            paths = [
+                ('recommend_venues', matches, lambda: engine.recommend_venues(events, hotels, halls)),
+                ('recommend_venues(limit=10)', matches, lambda: engine.recommend_venues(events, hotels, halls, limit=10)),
+                ('GET /api/recommendations', matches, lambda: (caches.result_cache.invalidate(), request())),
+                ('recommend_events', len(engine.recommend_events(open_events, hotels, halls, hotels[0]['id'])),
+                 lambda: engine.recommend_events(open_events, hotels, halls, hotels[0]['id'])),
+            ]
+            for name, path_matches, fn in paths:
+                profiles[name], python_calls, builtin_calls = profile_calls(fn)
+                per_match = f'{(python_calls + builtin_calls) / path_matches:.1f}' if path_matches else '-'
+                print(f'{name:<28} {size:>8} {path_matches:>8} {python_calls:>13} {builtin_calls:>14} {per_match:>12}')
+
+    print(f'\nMost-called functions, GET /api/recommendations at {args.sizes[-1]} halls:')
+    profiles['GET /api/recommendations'].sort_stats('ncalls').print_stats(top)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help='number of halls per run')
+    parser.add_argument('--events', type=int, default=5)
+    parser.add_argument('--halls-per-hotel', type=int, default=4)
+    parser.add_argument('--suite', action='store_true', help='measure latency percentiles, throughput and peak memory')
+    parser.add_argument('--memory', action='store_true', help='measure catalog and index memory')
+    parser.add_argument('--reverse', action='store_true', help='measure reverse (events for a hotel) query latency')
+    parser.add_argument('--profile', action='store_true', help='count function calls per request on each path')
+    parser.add_argument('--iterations', type=int, default=50, help='suite: timed runs per path and size')
+    parser.add_argument('--max-seconds', type=float, default=10, help='suite: time budget per path and size')
+    parser.add_argument('--query', default='', help='suite: query string for the request path, e.g. "?limit=50"')
+    parser.add_argument('--save-baseline', metavar='PATH', help='suite: write the results to PATH')
+    parser.add_argument('--baseline', metavar='PATH', help='suite: compare against results saved with --save-baseline')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='suite: exit with status 1 if a p50 is this much slower than the baseline')
+    parser.add_argument('--min-regression-ms', type=float, default=1.0,
+                        help='suite: ignore p50 changes smaller than this (timer noise on tiny catalogs)')
+    args = parser.parse_args()
+
+    if args.suite:
+        sys.exit(suite_main(args))
+    if args.memory:
+        memory_main(args)
+        return
+    if args.reverse:
+        reverse_main(args)
+        return
+    if args.profile:
+        profile_main(args)
+        return
+
+    engine = VenueRecommendationEngine()
+    numpy_engine = VectorizedVenueRecommendationEngine() if np is not None else None
+
+    print(f"{'halls':>8} {'hotels':>8} {'naive join':>12} {'indexed join':>13} {'speedup':>9} "
+          f"{'python backend':>15} {'numpy backend':>14}")
+    for size in args.sizes:
+        events, hotels, halls = generate_catalog(size, args.halls_per_hotel, args.events)
+
+        naive_count, naive_time = timed(naive_join, events, hotels, halls)
+        indexed_count, indexed_time = timed(indexed_join, engine, events, hotels, halls)
+        assert naive_count == indexed_count
+
+        engine.get_catalog_indexes(hotels, halls)  # indexes are built once per catalog load
+        _, recommend_time = timed(engine.recommend_venues, events, hotels, halls)
+        numpy_column = '-'
+        if numpy_engine is not None:
+            numpy_engine.get_catalog_indexes(hotels, halls)  # columns are built once per catalog load
+            _, numpy_time = timed(numpy_engine.recommend_venues, events, hotels, halls)
+            numpy_column = f'{numpy_time * 1000:.1f}ms'
+
+        speedup = naive_time / indexed_time if indexed_time else float('inf')
+        print(f"{size:>8} {len(hotels):>8} {naive_time * 1000:>10.1f}ms {indexed_time * 1000:>11.1f}ms "
+              f"{speedup:>8.1f}x {recommend_time * 1000:>13.1f}ms {numpy_column:>14}")
+
+
+if __name__ == '__main__':
+    main()
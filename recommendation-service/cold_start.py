@@ -0,0 +1,153 @@
+"""Measure cold-start and warm-invocation latency of the Vercel function.
+
+Each run starts a fresh interpreter (a new serverless instance), imports
+api/recommendations.py and serves GET /api/recommendations from it on a local
+port: once cold, then --warm-requests more times from the same process.
+Supabase is stubbed with the synthetic catalog from synthetic.py, and every
+query sleeps for --latency-ms plus its payload size at --download-mbps.
+Runs are repeated without a catalog snapshot and with a JSON and a binary
+snapshot (CATALOG_SNAPSHOT_PATH), and the medians are reported. Interpreter startup is not included.
+
+Usage:
+    python cold_start.py
+    python cold_start.py --halls 10000 --runs 10 --latency-ms 80 --query '?limit=10'
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPOSITORY_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+class StubResponse:
+    status_code = 200
+    text = ''
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def run_instance(args):
+    """One simulated instance: import the handler, then time a cold request and warm requests"""
+    with open(args.tables) as f:
+        tables = json.load(f)
+    payload_seconds = {table: len(json.dumps(rows)) * 8 / (args.download_mbps * 1e6) for table, rows in tables.items()}
+    round_trip = args.latency_ms / 1000
+
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.join(REPOSITORY_ROOT, 'api'))
+    sys.path.insert(0, REPOSITORY_ROOT)
+    from recommender import supabase_rest
+
+    class StubSession:
+        def get(self, url, headers=None, timeout=None):
+            time.sleep(round_trip)
+            return StubResponse({'id': 'cold-start-user'})
+
+    def supabase_query(table, select='*', filters=None):
+        time.sleep(round_trip + payload_seconds[table])
+        return tables[table]
+
+    def supabase_table_version(table, version_column):
+        time.sleep(round_trip)
+        return str(len(tables[table])), None
+
+    supabase_rest.supabase_query = supabase_query
+    supabase_rest.supabase_table_version = supabase_table_version
+    supabase_rest.get_http_session = StubSession
+
+    import recommendations
+    imported = time.perf_counter()
+
+    from http.client import HTTPConnection
+    from http.server import HTTPServer
+    server = HTTPServer(('127.0.0.1', 0), recommendations.handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request():
+        request_start = time.perf_counter()
+        connection = HTTPConnection(*server.server_address)
+        connection.request('GET', f'/api/recommendations{args.query}', headers={'Authorization': 'Bearer cold-start-token'})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        if response.status != 200:
+            raise RuntimeError(f'GET /api/recommendations returned {response.status}')
+        return time.perf_counter() - request_start
+
+    first = request()
+    warm = [request() for _ in range(args.warm_requests)]
+    server.shutdown()
+    print(json.dumps({'import': imported - start, 'first': first, 'warm': statistics.median(warm)}))
+
+
+def measure_mode(args, tables_path, snapshot_path=None):
+    """Median import, first-request and warm-request seconds over args.runs fresh instances"""
+    env = dict(os.environ)
+    env.pop('CATALOG_SNAPSHOT_PATH', None)
+    env.pop('SUPABASE_JWT_SECRET', None)
+    if snapshot_path:
+        env['CATALOG_SNAPSHOT_PATH'] = snapshot_path
+    command = [sys.executable, os.path.abspath(__file__), '--instance', '--tables', tables_path,
+               '--latency-ms', str(args.latency_ms), '--download-mbps', str(args.download_mbps),
+               '--warm-requests', str(args.warm_requests), '--query', args.query]
+    runs = [json.loads(subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout)
+            for _ in range(args.runs)]
+    return {key: statistics.median(run[key] for run in runs) for key in ('import', 'first', 'warm')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--halls', type=int, default=5000, help='catalog size')
+    parser.add_argument('--events', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=5, help='fresh instances per mode')
+    parser.add_argument('--warm-requests', type=int, default=20, help='requests after the first, per instance')
+    parser.add_argument('--latency-ms', type=float, default=50, help='simulated Supabase round trip')
+    parser.add_argument('--download-mbps', type=float, default=100, help='simulated Supabase download speed')
+    parser.add_argument('--query', default='', help='query string for every request, e.g. "?limit=10"')
+    parser.add_argument('--instance', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--tables', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.instance:
+        run_instance(args)
+        return
+
+    sys.path.insert(0, REPOSITORY_ROOT)
+    from synthetic import generate_catalog
+    from recommender.config import HALL_COLUMNS, HOTEL_COLUMNS
+    from recommender.snapshot import write_snapshot
+
+    events, hotels, halls = generate_catalog(args.halls, num_events=args.events)
+    with tempfile.TemporaryDirectory() as workdir:
+        tables_path = os.path.join(workdir, 'tables.json')
+        with open(tables_path, 'w') as f:
+            json.dump({'events': events, 'hotels': hotels, 'hotel_halls': halls, 'invites': []}, f)
+        snapshot_paths = {}
+        for mode, name in (('json', 'catalog_snapshot.json.gz'), ('binary', 'catalog_snapshot.bin')):
+            snapshot_paths[mode] = os.path.join(workdir, name)
+            write_snapshot(snapshot_paths[mode], {
+                'hotels': (HOTEL_COLUMNS, hotels, (str(len(hotels)), None)),
+                'hotel_halls': (HALL_COLUMNS, halls, (str(len(halls)), None))
+            })
+
+        print(f'{len(halls)} halls, {len(hotels)} hotels, {len(events)} events; Supabase stubbed at '
+              f'{args.latency_ms:g}ms + {args.download_mbps:g} Mbit/s; median of {args.runs} instances')
+        print(f"{'mode':<12} {'import':>9} {'first request':>14} {'cold total':>11} {'warm request':>13}")
+        for mode, path in (('no snapshot', None), ('json', snapshot_paths['json']), ('binary', snapshot_paths['binary'])):
+            result = measure_mode(args, tables_path, path)
+            print(f"{mode:<12} {result['import'] * 1000:>7.1f}ms {result['first'] * 1000:>12.1f}ms "
+                  f"{(result['import'] + result['first']) * 1000:>9.1f}ms {result['warm'] * 1000:>11.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Compare concurrent-request capacity of app.py and async_app.py.
+
+Each app runs in its own process against a local fake Supabase that serves
+the synthetic catalog from synthetic.py and answers every call after
+--latency-ms. app.py is served by --threads worker threads (like
+`gunicorn --threads`), async_app.py by its event loop. --concurrency clients
+then send --requests GET /api/recommendations for --users users, starting
+from cold caches, and the throughput, latency and the upstream calls the
+fake Supabase received are reported.
+
+Usage:
+    python concurrency.py
+    python concurrency.py --concurrency 200 --requests 2000 --users 50 --latency-ms 100
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+
+class FakeSupabase:
+    """Supabase's REST and auth endpoints over in-memory tables, each call delayed by latency"""
+
+    def __init__(self, tables, latency):
+        self.tables = tables
+        self.latency = latency
+        self.calls = collections.Counter()
+
+    async def query(self, request):
+        await asyncio.sleep(self.latency)
+        table = request.match_info['table']
+        rows = self.tables[table]
+        for name, value in request.query.items():
+            if name not in ('select', 'order', 'limit', 'or') and value.startswith('eq.'):
+                rows = [row for row in rows if str(row.get(name)) == value[3:]]
+        if request.headers.get('Prefer') == 'count=exact':
+            self.calls[f'{table} version'] += 1
+            return web.json_response([], headers={'Content-Range': f'*/{len(rows)}'})
+        self.calls[table] += 1
+        select = request.query.get('select', '*')
+        if select != '*':
+            rows = [{name: row.get(name) for name in select.split(',')} for row in rows]
+        return web.json_response(rows)
+
+    async def user(self, request):
+        await asyncio.sleep(self.latency)
+        self.calls['auth'] += 1
+        return web.json_response({'id': request.headers['Authorization'].split(' ')[1]})
+
+    def start(self):
+        """Serve on a background thread; returns the base URL"""
+        app = web.Application()
+        app.router.add_get('/rest/v1/{table}', self.query)
+        app.router.add_get('/auth/v1/user', self.user)
+        started = threading.Event()
+        address = []
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            runner = web.AppRunner(app, access_log=None)
+            loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            loop.run_until_complete(site.start())
+            address.append(runner.addresses[0])
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=serve, daemon=True).start()
+        started.wait()
+        return f'http://{address[0][0]}:{address[0][1]}'
+
+
+def serve_app(args):
+    """Child process: serve app.py or async_app.py on args.port"""
+    if args.serve == 'async':
+        import async_app
+        web.run_app(async_app.create_app(), host='127.0.0.1', port=args.port, access_log=None, print=None)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+    import app
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """Handles each connection on one of a fixed number of threads, like a threaded gunicorn worker"""
+        pool = ThreadPoolExecutor(args.threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+        def process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer('127.0.0.1', args.port, app.app, handler=QuietRequestHandler).serve_forever()
+
+
+async def send_requests(args, base_url):
+    """Send args.requests requests from args.concurrency clients; returns (seconds, latencies, statuses)"""
+    latencies = []
+    statuses = collections.Counter()
+    queue = asyncio.Queue()
+    for index in range(args.requests):
+        queue.put_nowait(f'user-{index % args.users}')
+
+    async def client(session):
+        while not queue.empty():
+            user = queue.get_nowait()
+            start = time.perf_counter()
+            async with session.get(f'{base_url}/api/recommendations{args.query}',
+                                   headers={'Authorization': f'Bearer {user}'}) as response:
+                await response.read()
+                statuses[response.status] += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=600)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(args.concurrency)))
+        return time.perf_counter() - start, latencies, statuses
+
+
+def wait_until_up(base_url, process, timeout=30):
+    from urllib.error import URLError
+    from urllib.request import urlopen
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'the server exited with status {process.returncode}')
+        try:
+            with urlopen(f'{base_url}/health'):
+                return
+        except (URLError, ConnectionError):
+            time.sleep(0.1)
+    raise RuntimeError(f'{base_url} did not come up')
+
+
+def measure(args, mode, supabase, supabase_url, port):
+    env = dict(os.environ, SUPABASE_URL=supabase_url, SUPABASE_KEY='concurrency', LOG_LEVEL='WARNING',
+               REQUEST_CONCURRENCY=str(args.threads))
+    for name in ('SUPABASE_JWT_SECRET', 'CATALOG_SNAPSHOT_PATH', 'SHARED_CATALOG_PATH'):
+        env.pop(name, None)
+    command = [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port),
+               '--threads', str(args.threads)]
+    process = subprocess.Popen(command, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_up(base_url, process)
+        supabase.calls.clear()
+        seconds, latencies, statuses = asyncio.run(send_requests(args, base_url))
+    finally:
+        process.terminate()
+        process.wait()
+    latencies.sort()
+    return {
+        'seconds': seconds,
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'statuses': dict(statuses),
+        'calls': dict(supabase.calls)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--halls', type=int, default=2000, help='catalog size')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--events-per-user', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100, help='clients with a request in flight')
+    parser.add_argument('--threads', type=int, default=8, help="app.py's worker threads")
+    parser.add_argument('--latency-ms', type=float, default=50, help='simulated Supabase round trip')
+    parser.add_argument('--query', default='?limit=10', help='query string for every request')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--serve', choices=['flask', 'async'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    if args.serve:
+        serve_app(args)
+        return
+
+    from synthetic import generate_catalog
+    events, hotels, halls = generate_catalog(args.halls, num_events=args.users * args.events_per_user)
+    for index, event in enumerate(events):
+        event['user_id'] = f'user-{index % args.users}'
+    supabase = FakeSupabase({'events': events, 'hotels': hotels, 'hotel_halls': halls, 'invites': []},
+                            args.latency_ms / 1000)
+    supabase_url = supabase.start()
+
+    print(f'{len(halls)} halls, {args.users} users x {args.events_per_user} events; {args.requests} requests from '
+          f'{args.concurrency} clients; Supabase at {args.latency_ms:g}ms; app.py on {args.threads} threads')
+    print(f"{'app':<14} {'req/s':>8} {'p50':>9} {'p99':>9}  upstream calls")
+    for mode, name in (('flask', 'app.py'), ('async', 'async_app.py')):
+        result = measure(args, mode, supabase, supabase_url, args.port)
+        calls = ', '.join(f'{table} {count}' for table, count in sorted(result['calls'].items()))
+        errors = {status: count for status, count in result['statuses'].items() if status != 200}
+        print(f"{name:<14} {args.requests / result['seconds']:>8.1f} {result['p50'] * 1000:>7.1f}ms "
+              f"{result['p99'] * 1000:>7.1f}ms  {calls}" + (f'  errors: {json.dumps(errors)}' if errors else ''))
+
+
+if __name__ == '__main__':
+    main()
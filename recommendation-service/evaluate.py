@@ -0,0 +1,184 @@
+"""Offline A/B evaluation of scoring plans.
+
+Replays a recorded set of events against a catalog snapshot under several
+scoring plans and reports how each plan's rankings differ from the
+baseline's, and how fast each plan scores. The baseline is the configured
+plan (SCORING_WEIGHTS, MIN_MATCH_SCORE); each --plan is NAME:SPEC, where SPEC
+is in the SCORING_WEIGHTS format and may also set min_score. Fields left out
+keep the defaults.
+
+Events are grouped into requests by user_id, the way GET /api/recommendations
+scores a user's events, and each request keeps its top --limit
+recommendations. The plans are scored in parallel, one worker process per
+plan (up to --workers). Nothing is read from Supabase: without --snapshot or
+--events, the synthetic catalog and events from synthetic.py are used.
+
+Usage:
+    python evaluate.py --plan budget:location=0.3,budget=0.3 --plan strict:min_score=55
+    python evaluate.py --snapshot ../recommender/catalog_snapshot.json.gz --events events.json \\
+        --plan location:location=0.55,capacity=0.25,budget=0.15,event_type=0.05 --output report.json
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommender.catalog import CatalogTable
+from recommender.config import SCORING_BACKEND
+from recommender.engine import ScoringPlan
+from recommender.service import create_engine, scoring_plan
+from recommender.snapshot import read_snapshot
+
+replay_state = None
+
+
+def init_replay_worker(backend, hotels, halls, requests, limit, repeat):
+    """Process pool initializer: each worker gets the catalog and the requests once"""
+    global replay_state
+    replay_state = (backend, hotels, halls, requests, limit, repeat)
+
+
+def replay(plan):
+    """Score every request under one plan; returns its rankings, timings and match count"""
+    backend, hotels, halls, requests, limit, repeat = replay_state
+    engine = create_engine(backend, plan)
+    start = time.perf_counter()
+    indexes = engine.get_catalog_indexes(hotels, halls)
+    index_seconds = time.perf_counter() - start
+
+    passes = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rankings = [engine.recommend_venues(events, hotels, halls, limit=limit) for events in requests]
+        passes.append(time.perf_counter() - start)
+
+    return {
+        'indexSeconds': index_seconds,
+        'seconds': statistics.median(passes),
+        'matches': sum(1 for events in requests for _ in engine.iter_matches(events, hotels, indexes)),
+        'rankings': [
+            [[rec['event']['id'], rec['hotel']['id'], rec['hall']['id'] if rec['hall'] else None, rec['matchScore']]
+             for rec in recommendations]
+            for recommendations in rankings
+        ]
+    }
+
+
+def compare_rankings(baseline, candidate):
+    """How one plan's rankings differ from the baseline's, over all requests"""
+    same_top, overlaps, shifts = 0, [], []
+    for base, other in zip(baseline, candidate):
+        base_keys = [tuple(rec[:3]) for rec in base]
+        other_keys = [tuple(rec[:3]) for rec in other]
+        same_top += base_keys[:1] == other_keys[:1]
+        common = set(base_keys) & set(other_keys)
+        overlaps.append(len(common) / max(len(base_keys), len(other_keys)) if base_keys or other_keys else 1)
+        other_ranks = {key: rank for rank, key in enumerate(other_keys)}
+        shifts.extend(abs(rank - other_ranks[key]) for rank, key in enumerate(base_keys) if key in common)
+    return {
+        'sameTop': same_top / len(baseline) if baseline else 1,
+        'overlap': statistics.mean(overlaps) if overlaps else 1,
+        'rankShift': statistics.mean(shifts) if shifts else 0,
+        'empty': sum(not recommendations for recommendations in candidate)
+    }
+
+
+def parse_plan(value):
+    """argparse type for --plan NAME:SPEC"""
+    name, separator, spec = value.partition(':')
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f'expected NAME:SPEC, got {value!r}')
+    try:
+        return name, ScoringPlan.parse(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def load_events(path):
+    """Event rows from a JSON array or NDJSON file"""
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def group_requests(events):
+    """One request per user (events without a user_id are a request each), in first-seen order"""
+    requests = {}
+    for index, event in enumerate(events):
+        user_id = event.get('user_id')
+        requests.setdefault(user_id if user_id is not None else ('event', index), []).append(event)
+    return list(requests.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plan', type=parse_plan, action='append', default=[], metavar='NAME:SPEC',
+                        help='a plan to compare with the baseline; repeat for more')
+    parser.add_argument('--snapshot', help='catalog snapshot (snapshot.py); default: synthetic catalog')
+    parser.add_argument('--events', help='recorded events, a JSON array or NDJSON; default: synthetic events')
+    parser.add_argument('--halls', type=int, default=2000, help='synthetic catalog size')
+    parser.add_argument('--synthetic-events', type=int, default=300)
+    parser.add_argument('--limit', type=int, default=10, help='recommendations kept per request')
+    parser.add_argument('--backend', choices=['python', 'numpy'], default=SCORING_BACKEND)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='plans scored at once (1 gives throughput free of contention)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed passes per plan (the median is reported)')
+    parser.add_argument('--output', help='write every plan\'s rankings and the comparison as JSON')
+    args = parser.parse_args()
+    if not args.plan:
+        parser.error('pass at least one --plan to compare with the baseline')
+
+    if args.snapshot is None or args.events is None:
+        from synthetic import generate_catalog
+        synthetic_events, hotels, halls = generate_catalog(args.halls, num_events=args.synthetic_events)
+        for index, event in enumerate(synthetic_events):
+            event['user_id'] = f'user-{index % max(1, args.synthetic_events // 3)}'
+    if args.snapshot is not None:
+        tables = read_snapshot(args.snapshot)[1]
+        hotels, halls = tables['hotels'][1], tables['hotel_halls'][1]
+    # Compact tables are also what each worker process receives
+    hotels, halls = CatalogTable.from_rows(hotels), CatalogTable.from_rows(halls)
+    events = load_events(args.events) if args.events is not None else synthetic_events
+    requests = group_requests(events)
+
+    plans = [('baseline', scoring_plan)] + args.plan
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(plans))), initializer=init_replay_worker,
+                             initargs=(args.backend, hotels, halls, requests, args.limit, args.repeat)) as pool:
+        results = list(pool.map(replay, [plan for _, plan in plans]))
+
+    print(f'{len(halls)} halls, {len(hotels)} hotels; {len(events)} events in {len(requests)} requests; '
+          f'top {args.limit} per request; {args.backend} backend; {min(args.workers, len(plans))} plans at a time')
+    for name, plan in plans:
+        weights = ', '.join(f'{field}={value:g}' for field, value in plan.as_dict().items() if field != 'version')
+        print(f'  {name}: {weights}')
+    print(f"\n{'plan':<16} {'req/s':>9} {'events/s':>10} {'matches':>9} {'empty':>6} "
+          f"{'same top':>9} {f'overlap@{args.limit}':>11} {'rank shift':>11}")
+    report = []
+    for (name, plan), result in zip(plans, results):
+        comparison = compare_rankings(results[0]['rankings'], result['rankings'])
+        matches_change = (f"{(result['matches'] / results[0]['matches'] - 1) * 100:+.1f}%"
+                          if results[0]['matches'] and result is not results[0] else '')
+        print(f"{name:<16} {len(requests) / result['seconds']:>9.1f} {len(events) / result['seconds']:>10.1f} "
+              f"{result['matches']:>9} {comparison['empty']:>6} {comparison['sameTop'] * 100:>8.1f}% "
+              f"{comparison['overlap'] * 100:>10.1f}% {comparison['rankShift']:>11.2f}  {matches_change}")
+        report.append(dict(result, name=name, plan=plan.as_dict(), comparison=comparison))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'limit': args.limit, 'backend': args.backend, 'requests': len(requests), 'plans': report}, f)
+
+
+if __name__ == '__main__':
+    main()
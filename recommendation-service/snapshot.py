@@ -0,0 +1,38 @@
+"""Download the catalog tables and write a snapshot for CATALOG_SNAPSHOT_PATH
+or SHARED_CATALOG_PATH.
+
+A process started with CATALOG_SNAPSHOT_PATH pointing at the file loads the
+catalog and builds its indexes at import; the first request then only checks
+each table's version with Supabase. A .bin file is written in the binary
+format, which is memory-mapped instead of parsed. Uses the same environment
+as app.py.
+
+Usage:
+    python snapshot.py ../recommender/catalog_snapshot.json.gz
+    python snapshot.py /var/cache/festivisa/catalog.bin
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommender.service import CATALOG_COLUMNS
+from recommender.snapshot import build_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='snapshot file; binary when the name ends in .bin, gzipped JSON for .gz')
+    args = parser.parse_args()
+
+    tables = build_snapshot(os.path.abspath(args.output), CATALOG_COLUMNS)
+    counts = ', '.join(f'{table}: {len(rows)} rows' for table, (_, rows, _) in tables.items())
+    print(f'Wrote {args.output} ({counts})', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Seeded synthetic catalogs, events and bookings shaped like the Supabase rows.
+
+Used by the benchmarks, evaluate.py and the tests; no Supabase connection needed.
+"""
+import collections
+import random
+
+CITIES = ['Lahore', 'Karachi', 'Islamabad', 'Rawalpindi', 'Faisalabad', 'Multan', 'Peshawar', 'Quetta',
+          'DHA Lahore', 'Lahore Cantt', 'karachi ', 'Gulshan Karachi', 'Islamabad Capital Territory']
+EVENT_TYPES = ['Wedding', 'Birthday', 'Corporate', 'Conference', 'Mehndi', 'Walima', 'Engagement']
+
+
+def generate_catalog(num_halls, halls_per_hotel=4, num_events=5, seed=42):
+    """Generate a synthetic events/hotels/halls catalog"""
+    rng = random.Random(seed)
+    num_hotels = max(1, num_halls // halls_per_hotel)
+
+    hotels = [{
+        'id': f'hotel-{i}',
+        'name': f'Hotel {i}',
+        'city': rng.choice(CITIES),
+        'description': rng.choice([
+            None,
+            f'Elegant venue for {rng.choice(EVENT_TYPES).lower()} and {rng.choice(EVENT_TYPES).lower()} events',
+            f'{rng.choice(EVENT_TYPES)}s and celebrations in the heart of the city',
+        ]),
+    } for i in range(num_hotels)]
+
+    halls = [{
+        'id': f'hall-{i}',
+        'hotel_id': f'hotel-{rng.randrange(num_hotels)}',
+        'name': f'Hall {i}',
+        'capacity': rng.choice([None, rng.randint(50, 1000)] + [rng.randint(50, 1000)] * 8),
+        'price_per_event': rng.choice([None, rng.randint(50, 1000) * 1000] + [rng.randint(50, 1000) * 1000] * 8),
+    } for i in range(num_halls)]
+
+    events = [{
+        'id': f'event-{i}',
+        'event_name': f'{rng.choice(EVENT_TYPES)} Celebration',
+        'event_type': rng.choice(EVENT_TYPES),
+        'guest_count': rng.randint(50, 800),
+        'budget': rng.choice([None] + [rng.randint(100, 800) * 1000] * 8),
+        'location': rng.choice(CITIES),
+        'event_date': f'2026-{i % 12 + 1:02d}-{i % 7 + 1:02d}',
+    } for i in range(num_events)]
+
+    return events, hotels, halls
+
+
+def generate_bookings(events, hotels, halls, rng, num_bookings):
+    """Accepted invites on the events' dates, shaped like the BOOKING_COLUMNS select.
+
+    About half take every hall of their hotel on the date, which books it out,
+    and some are the events' own bookings, which must not count against them.
+    """
+    dates = sorted({event['event_date'] for event in events}) or ['2026-01-01']
+    hall_counts = collections.Counter(hall['hotel_id'] for hall in halls)
+    bookings = []
+    for i in range(num_bookings if hotels else 0):
+        hotel_id = rng.choice(hotels)['id']
+        event_date = rng.choice(dates)
+        for j in range(max(1, hall_counts[hotel_id]) if rng.random() < 0.5 else 1):
+            event_id = rng.choice(events)['id'] if events and rng.random() < 0.2 else f'booked-{i}-{j}'
+            bookings.append({'hotel_id': hotel_id, 'event_id': event_id, 'events': {'event_date': event_date}})
+    return bookings
@@ -0,0 +1,111 @@
+"""Random catalogs, bookings, catalog changes and scoring plans for the tests, and the
+scan-based reference results the engine's indexed paths are checked against"""
+import json
+import random
+
+from recommender.engine import ScoringPlan, VenueRecommendationEngine
+from recommender.vectorized import VectorizedVenueRecommendationEngine, np
+from synthetic import CITIES, EVENT_TYPES, generate_catalog
+
+# Catalogs every equivalence test runs on
+SEEDS = range(30)
+
+# limit / per_event_limit pairs the top-K and streaming tests run with
+LIMITS = [(None, None), (1, None), (10, None), (None, 3), (5, 2)]
+
+# Capacity / guest count ratios on and around the capacity score's band edges
+BOUNDARY_RATIOS = [0.5, 0.8, 1.0, 1.2, 1.5, 4.5, 5]
+
+
+def random_catalog(seed):
+    """A random (events, hotels, halls) catalog of 0-400 halls, with some halls exactly on
+    the capacity score's band edges for one of the events"""
+    rng = random.Random(seed)
+    events, hotels, halls = generate_catalog(rng.randint(0, 400), rng.randint(1, 6), rng.randint(1, 5), seed=seed)
+    for hall, event in zip(halls, events * len(halls)):
+        if hall['capacity'] is not None and rng.random() < 0.3:
+            hall['capacity'] = int(event['guest_count'] * rng.choice(BOUNDARY_RATIOS))
+    return events, hotels, halls
+
+
+def exhaustive_engine(plan=None):
+    """The reference: python scoring of every hall, without candidate pre-filtering"""
+    return VenueRecommendationEngine(prefilter=False, plan=plan)
+
+
+def engines(plan=None):
+    """Every scoring path that must match exhaustive_engine exactly"""
+    paths = [VenueRecommendationEngine(plan=plan)]
+    if np is not None:
+        paths += [VectorizedVenueRecommendationEngine(plan=plan), VectorizedVenueRecommendationEngine(False, plan)]
+    return paths
+
+
+def engine_ids(engine):
+    """Which scoring path an assertion failed on"""
+    return f'{type(engine).__name__}(prefilter={engine.prefilter})'
+
+
+def as_json(recommendations):
+    """Recommendations as the response serializes them, so 85 and 85.0 differ"""
+    return json.dumps(list(recommendations))
+
+
+def pushed_down_halls(halls, bounds):
+    """The halls a hall_fetch_filters query returns for these hall_fetch_bounds"""
+    capacity_low, capacity_high, hotel_ids = bounds
+    hotel_ids = set(hotel_ids)
+    return [
+        hall for hall in halls
+        if hall['hotel_id'] in hotel_ids or (
+            capacity_low is not None and hall['capacity'] is not None
+            and capacity_low <= hall['capacity'] <= capacity_high
+        )
+    ]
+
+
+def booked_out(bookings, halls, hotel_id, event):
+    """Whether other events' bookings take every hall of the hotel on the event's date, by a scan"""
+    booked = {
+        booking['event_id'] for booking in bookings
+        if booking['hotel_id'] == hotel_id and booking['events']['event_date'] == event['event_date']
+    }
+    booked.discard(event['id'])
+    return len(booked) >= max(1, sum(hall['hotel_id'] == hotel_id for hall in halls))
+
+
+def random_catalog_change(rng, hotels, halls):
+    """A random INSERT, UPDATE or DELETE on hotels or hotel_halls, shaped like a database webhook"""
+    table = rng.choice(['hotels', 'hotel_halls'])
+    rows = hotels if table == 'hotels' else halls
+    change_type = rng.choice(['INSERT', 'UPDATE', 'DELETE']) if rows else 'INSERT'
+    if change_type == 'DELETE':
+        return table, change_type, None, rng.choice(rows)
+
+    row_id = f'{table}-new-{rng.randrange(10 ** 9)}'
+    if table == 'hotels':
+        record = {
+            'id': row_id,
+            'name': 'New Hotel',
+            'city': rng.choice(CITIES),
+            'description': rng.choice([None, f'{rng.choice(EVENT_TYPES)} venue with garden']),
+        }
+    else:
+        record = {
+            'id': row_id,
+            'hotel_id': rng.choice(hotels)['id'] if hotels else 'hotel-0',
+            'name': 'New Hall',
+            'capacity': rng.choice([None, rng.randint(50, 1000)]),
+            'price_per_event': rng.choice([None, rng.randint(50, 1000) * 1000]),
+        }
+    if change_type == 'UPDATE':
+        old_record = rng.choice(rows)
+        record['id'] = old_record['id']
+        return table, change_type, record, old_record
+    return table, change_type, record, None
+
+
+def random_scoring_plan(rng):
+    """A random ScoringPlan, with some zero weights and thresholds from 0 to 100"""
+    weights = [rng.choice([0, rng.random(), rng.random(), rng.uniform(0, 2)]) for _ in range(4)]
+    return ScoringPlan(*weights, min_score=rng.choice([0, 10, 25, 40, 40, 55, 70, 90, 100, rng.uniform(0, 100)]))
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The tests import the service modules (app.py, synthetic.py) and the recommender
+# package at the repository root, as the scripts in recommendation-service do
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(SERVICE_DIR, '..'))
+sys.path.insert(0, SERVICE_DIR)
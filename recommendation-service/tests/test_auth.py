@@ -0,0 +1,82 @@
+"""Local JWT verification accepts only well-formed HS256 tokens signed with the secret,
+and a malformed token is a 401, never a 500"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from recommender import auth, supabase_rest
+
+SECRET = 'test-secret'
+
+
+def encode(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b'=').decode()
+
+
+def token(claims, header=None, secret=SECRET):
+    signed = f"{encode(header or {'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}"
+    signature = hmac.new(secret.encode(), signed.encode(), hashlib.sha256).digest()
+    return f"{signed}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+
+
+def claims(**overrides):
+    return {'sub': 'user-1', 'role': 'authenticated', 'exp': time.time() + 600, **overrides}
+
+
+def test_valid_token():
+    assert auth.jwt_claims(token(claims()), SECRET)['sub'] == 'user-1'
+    assert auth.jwt_claims(token(claims()))['sub'] == 'user-1'
+
+
+@pytest.mark.parametrize('header', [[1], 1, 'HS256', None, True])
+@pytest.mark.parametrize('secret', [SECRET, None])
+def test_header_that_is_not_an_object(header, secret):
+    signed = f'{encode(header)}.{encode(claims())}'
+    signature = hmac.new(SECRET.encode(), signed.encode(), hashlib.sha256).digest()
+    assert auth.jwt_claims(f"{signed}.{base64.urlsafe_b64encode(signature).decode()}", secret) is None
+
+
+@pytest.mark.parametrize('payload', [[1], 1, 'user-1', None])
+@pytest.mark.parametrize('secret', [SECRET, None])
+def test_payload_that_is_not_an_object(payload, secret):
+    assert auth.jwt_claims(token(payload), secret) is None
+
+
+@pytest.mark.parametrize('malformed', ['W1sxXQ.e30.abc', 'e30.W1sxXQ.abc', 'a.b', 'a.b.c.d', '!!.e30.abc', ''])
+def test_malformed_tokens(malformed):
+    assert auth.jwt_claims(malformed, SECRET) is None
+
+
+@pytest.mark.parametrize('bad_token', [
+    token(claims(), header={'alg': 'none'}),
+    token(claims(), secret='other-secret'),
+    token(claims(exp=time.time() - 1)),
+    token(claims(exp='never')),
+])
+def test_unverified_tokens(bad_token):
+    assert auth.jwt_claims(bad_token, SECRET) is None
+
+
+class RejectingSession:
+    """Supabase's /auth/v1/user turning every token down"""
+
+    class Response:
+        status_code = 401
+        text = 'invalid JWT'
+
+    def get(self, url, **kwargs):
+        return self.Response()
+
+
+@pytest.mark.parametrize('path', ['/api/recommendations', '/api/organizer/events?hotel_id=hotel-1'])
+@pytest.mark.parametrize('bad_token', ['W1sxXQ.e30.abc', f"e30.{encode([1])}.abc", f"{encode('x')}.{encode(3)}.abc"])
+def test_malformed_token_is_unauthorized(path, bad_token, monkeypatch):
+    import app
+    monkeypatch.setattr(auth, 'SUPABASE_JWT_SECRET', SECRET)
+    monkeypatch.setattr(supabase_rest, 'get_http_session', RejectingSession)
+    response = app.app.test_client().get(path, headers={'Authorization': f'Bearer {bad_token}'})
+    assert response.status_code == 401
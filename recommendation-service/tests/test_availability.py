@@ -0,0 +1,81 @@
+"""Bookings drop exactly the hotels booked out on each event's date, in every scoring path"""
+import base64
+import json
+import random
+
+import pytest
+
+from catalogs import SEEDS, as_json, booked_out, engine_ids, engines, exhaustive_engine, random_catalog
+from recommender.caches import RecommendationCache
+from recommender.catalog import CatalogTable
+from synthetic import generate_bookings
+
+
+def catalog_with_bookings(seed):
+    rng = random.Random(seed)
+    events, hotels, halls = random_catalog(seed)
+    bookings = generate_bookings(events, hotels, halls, rng, rng.randint(0, 30))
+    expected = exhaustive_engine().recommend_venues(events, hotels, halls)
+    available = [rec for rec in expected if not booked_out(bookings, halls, rec['hotel']['id'], rec['event'])]
+    return rng, events, hotels, halls, bookings, available
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_booked_out_hotels_are_dropped(seed):
+    _, events, hotels, halls, bookings, available = catalog_with_bookings(seed)
+    tables = CatalogTable.from_rows(hotels), CatalogTable.from_rows(halls)
+    for engine in engines():
+        for limit in (None, 5):
+            actual = engine.recommend_venues(events, *tables, limit=limit, bookings=CatalogTable.from_rows(bookings))
+            assert as_json(actual) == as_json(available[:limit]), (engine_ids(engine), limit)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_result_cache_applies_bookings(seed):
+    _, events, hotels, halls, bookings, available = catalog_with_bookings(seed)
+    engine = engines()[0]
+    result_cache = RecommendationCache()
+    result_cache.recommend(engine, 'user', events, hotels, halls)
+    actual = result_cache.recommend(engine, 'user', events, hotels, halls, bookings=bookings)
+    assert as_json(actual) == as_json(available)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_reverse_queries_apply_bookings(seed):
+    rng, events, hotels, halls, bookings, available = catalog_with_bookings(seed)
+    for hotel in rng.sample(hotels, min(2, len(hotels))):
+        hotel_available = [rec for rec in available if rec['hotel']['id'] == hotel['id']]
+        for engine in engines():
+            actual = engine.recommend_events(events, hotels, halls, hotel['id'], bookings=bookings)
+            assert as_json(actual) == as_json(hotel_available), engine_ids(engine)
+
+
+def test_own_booking_does_not_count():
+    events, hotels, halls = random_catalog(1)
+    hotel_id = halls[0]['hotel_id']
+    event = events[0]
+    own = [{'event_id': event['id'], 'hotel_id': hotel_id, 'events': {'event_date': event['event_date']}}]
+    assert not booked_out(own, halls, hotel_id, event)
+    for engine in engines():
+        assert as_json(engine.recommend_venues([event], hotels, halls, bookings=own)) == \
+            as_json(exhaustive_engine().recommend_venues([event], hotels, halls)), engine_ids(engine)
+
+
+def legacy_key(role):
+    """Shaped like a Supabase legacy API key: a JWT carrying the key's role"""
+    def encode(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b'=').decode()
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode({'iss': 'supabase', 'role': role})}.c2lnbmF0dXJl"
+
+
+@pytest.mark.parametrize('key, readable', [
+    (legacy_key('service_role'), True),
+    ('sb_secret_abc123', True),
+    (legacy_key('anon'), False),
+    ('sb_publishable_abc123', False),
+    ('your_supabase_anon_key_here', False),
+    (None, False),
+])
+def test_bookings_need_a_service_role_key(key, readable):
+    from recommender.service import bookings_readable
+    assert bookings_readable(key) is readable
@@ -0,0 +1,13 @@
+"""Candidate pre-filtering by location and capacity only skips halls that could not
+have matched"""
+import pytest
+
+from catalogs import SEEDS, as_json, exhaustive_engine, random_catalog
+from recommender.engine import VenueRecommendationEngine
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_prefilter_matches_exhaustive_scoring(seed):
+    events, hotels, halls = random_catalog(seed)
+    expected = exhaustive_engine().recommend_venues(events, hotels, halls)
+    assert as_json(VenueRecommendationEngine().recommend_venues(events, hotels, halls)) == as_json(expected)
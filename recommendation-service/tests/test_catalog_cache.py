@@ -0,0 +1,53 @@
+"""The catalog cache keeps an expired table only while its probed version is unchanged"""
+from recommender.caches import CatalogCache
+from recommender.config import CATALOG_VERSION_COLUMNS
+
+
+class Table:
+    """A table whose rows and version a test changes, counting the loads and probes"""
+
+    def __init__(self, rows, version):
+        self.rows, self.version = rows, version
+        self.loads = self.probes = 0
+
+    def load(self, version):
+        self.loads += 1
+        return list(self.rows)
+
+    def probe(self):
+        self.probes += 1
+        return self.version
+
+
+def test_fresh_entries_are_not_probed():
+    table = Table([{'id': 1}], ('1', 'v1'))
+    cache = CatalogCache(ttl=300)
+    for _ in range(3):
+        assert cache.get(('hotel_halls', '*'), table.load, table.probe) == [{'id': 1}]
+    assert (table.loads, table.probes) == (1, 1)
+
+
+def test_expired_entry_is_kept_until_the_version_changes():
+    table = Table([{'id': 1, 'capacity': 100}], ('1', 'v1'))
+    cache = CatalogCache(ttl=0)
+    cache.get(('hotel_halls', '*'), table.load, table.probe)
+    assert cache.get(('hotel_halls', '*'), table.load, table.probe) == [{'id': 1, 'capacity': 100}]
+    assert (table.loads, cache.revalidations) == (1, 1)
+
+    # An edited hall bumps the table's newest updated_at, but not its row count
+    table.rows, table.version = [{'id': 1, 'capacity': 150}], ('1', 'v2')
+    assert cache.get(('hotel_halls', '*'), table.load, table.probe) == [{'id': 1, 'capacity': 150}]
+    assert table.loads == 2
+
+
+def test_version_columns_change_on_update():
+    assert CATALOG_VERSION_COLUMNS['hotel_halls'] == 'updated_at'
+    assert set(CATALOG_VERSION_COLUMNS.values()) == {'updated_at'}
+
+
+def test_invalidate_drops_one_table():
+    cache = CatalogCache()
+    cache.replace(('hotels', '*'), ['hotel'])
+    cache.replace(('hotel_halls', '*'), ['hall'])
+    assert cache.invalidate('hotel_halls') == 1
+    assert (cache.peek(('hotels', '*')), cache.peek(('hotel_halls', '*'))) == (['hotel'], None)
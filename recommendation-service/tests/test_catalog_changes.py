@@ -0,0 +1,160 @@
+"""Row changes patched into a loaded catalog and its indexes give what rebuilding
+them gives, and the webhook endpoint rejects malformed payloads"""
+import asyncio
+import json
+import random
+
+import pytest
+
+from catalogs import SEEDS, as_json, engines, exhaustive_engine, random_catalog, random_catalog_change
+from recommender.catalog import CatalogTable
+from recommender.engine import VenueRecommendationEngine
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_patched_indexes_match_rebuilt_ones(seed):
+    rng = random.Random(seed)
+    events, hotels, halls = random_catalog(seed)
+    original = json.dumps([hotels, halls])
+    for patch_engine in engines()[:2]:
+        patched_hotels, patched_halls = hotels, halls
+        patch_engine.get_catalog_indexes(hotels, halls)
+        table_engine = type(patch_engine)()
+        patched_tables = CatalogTable.from_rows(hotels), CatalogTable.from_rows(halls)
+        table_engine.get_catalog_indexes(*patched_tables)
+        for _ in range(rng.randint(1, 6)):
+            change = random_catalog_change(rng, patched_hotels, patched_halls)
+            patched_hotels, patched_halls = patch_engine.apply_catalog_change(patched_hotels, patched_halls, *change)
+            patched_tables = table_engine.apply_catalog_change(*patched_tables, *change)
+
+        assert [list(table) for table in patched_tables] == [patched_hotels, patched_halls]
+        patched = patch_engine.get_catalog_indexes(patched_hotels, patched_halls)
+        rebuilt = type(patch_engine)().build_catalog_indexes(patched_hotels, patched_halls)
+        assert table_engine.get_catalog_indexes(*patched_tables)['version'] == patched['version'] == rebuilt['version']
+        assert patched['keywords'].texts == rebuilt['keywords'].texts
+        assert patched['keywords'].hotels_by_keyword == rebuilt['keywords'].hotels_by_keyword
+        expected = exhaustive_engine().recommend_venues(events, patched_hotels, patched_halls)
+        assert as_json(patch_engine.recommend_venues(events, patched_hotels, patched_halls)) == as_json(expected)
+    # The lists passed in are left as they were for requests still scoring against them
+    assert json.dumps([hotels, halls]) == original
+
+
+BAD_ROWS = [
+    ('hotels', 'INSERT', {'id': ['x']}, None),
+    ('hotels', 'INSERT', {'id': True, 'name': 'Hotel'}, None),
+    ('hotels', 'DELETE', None, {'id': {'x': 1}}),
+    ('hotels', 'UPDATE', {'id': 'hotel-0', 'description': ['wedding']}, None),
+    ('hotel_halls', 'INSERT', {'id': 'hall-new', 'hotel_id': ['hotel-0']}, None),
+    ('hotel_halls', 'UPDATE', {'id': 'hall-0', 'capacity': '200'}, None),
+    ('hotel_halls', 'INSERT', {'id': 'hall-new', 'price_per_event': False}, None),
+    ('hotel_halls', 'INSERT', {'name': 'No id'}, None),
+]
+
+
+@pytest.mark.parametrize('table, change_type, record, old_record', BAD_ROWS)
+def test_bad_rows_leave_the_indexes_alone(table, change_type, record, old_record):
+    events, hotels, halls = random_catalog(2)
+    engine = VenueRecommendationEngine()
+    indexes = engine.get_catalog_indexes(hotels, halls)
+    keywords = dict(indexes['keywords'].hotels_by_keyword)
+    with pytest.raises(ValueError):
+        engine.apply_catalog_change(hotels, halls, table, change_type, record, old_record)
+    assert engine.cached_catalog_indexes(hotels, halls) is indexes
+    assert indexes['keywords'].hotels_by_keyword == keywords
+
+
+def test_delete_ignores_the_record():
+    events, hotels, halls = random_catalog(2)
+    new_hotels, _ = VenueRecommendationEngine().apply_catalog_change(
+        hotels, halls, 'hotels', 'DELETE', {'id': ['ignored']}, hotels[0])
+    assert [hotel['id'] for hotel in new_hotels] == [hotel['id'] for hotel in hotels[1:]]
+
+
+BAD_PAYLOADS = [
+    {'table': 'hotel_halls', 'type': 'UPDATE', 'record': 'x'},
+    {'table': 'hotels', 'type': 'DELETE', 'old_record': [1]},
+    {'table': 'hotels', 'type': 'TRUNCATE', 'record': {'id': 'hotel-1'}},
+    {'table': 'events', 'type': 'INSERT', 'record': {'id': 'event-1'}},
+    [1, 2],
+    'x',
+] + [{'table': table, 'type': change_type, 'record': record, 'old_record': old_record}
+     for table, change_type, record, old_record in BAD_ROWS]
+
+
+@pytest.fixture(params=['cold', 'warm'])
+def catalog_state(request):
+    """The catalog cache without the catalog, or with it loaded; bad changes are
+    rejected either way and leave it as it was"""
+    from recommender.caches import catalog_cache
+    from recommender.service import CATALOG_COLUMNS
+    if request.param == 'warm':
+        _, hotels, halls = random_catalog(2)
+        catalog_cache.replace(('hotels', CATALOG_COLUMNS['hotels']), hotels)
+        catalog_cache.replace(('hotel_halls', CATALOG_COLUMNS['hotel_halls']), halls)
+    state = [catalog_cache.peek((table, select)) for table, select in CATALOG_COLUMNS.items()]
+    yield
+    assert [catalog_cache.peek((table, select)) for table, select in CATALOG_COLUMNS.items()] == state
+    catalog_cache.invalidate()
+
+
+@pytest.mark.parametrize('payload', BAD_PAYLOADS)
+def test_flask_webhook_rejects_malformed_payloads(payload, catalog_state, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'admin')
+    client = app.app.test_client()
+    response = client.post('/api/admin/catalog/changes', json=payload, headers={'X-Admin-Token': 'admin'})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('payload', BAD_PAYLOADS)
+def test_async_webhook_rejects_malformed_payloads(payload, catalog_state, monkeypatch):
+    aiohttp_test_utils = pytest.importorskip('aiohttp.test_utils')
+    import async_app
+    monkeypatch.setattr(async_app, 'ADMIN_TOKEN', 'admin')
+
+    async def post():
+        async with aiohttp_test_utils.TestClient(aiohttp_test_utils.TestServer(async_app.create_app())) as client:
+            response = await client.post('/api/admin/catalog/changes', json=payload, headers={'X-Admin-Token': 'admin'})
+            return response.status, await response.json()
+
+    status, body = asyncio.run(post())
+    assert status == 400
+    assert 'error' in body
+
+
+def test_other_workers_pick_up_a_hall_update(tmp_path, monkeypatch):
+    from recommender import caches, service, supabase_rest
+    from recommender.config import HALL_COLUMNS, HOTEL_COLUMNS
+    from recommender.snapshot import create_shared_catalog
+    shared_catalog = create_shared_catalog(str(tmp_path / 'catalog.bin'))
+    if shared_catalog is None:
+        pytest.skip('no file locking here')
+    _, hotels, halls = random_catalog(2)
+    halls = [service.project_row(hall, HALL_COLUMNS) for hall in halls]
+    downloads = []
+    versions = {'hotels': (str(len(hotels)), 't0'), 'hotel_halls': (str(len(halls)), 't0')}
+    monkeypatch.setattr(caches, 'shared_catalog', shared_catalog)
+    monkeypatch.setattr(supabase_rest, 'supabase_table_version', lambda table, column: versions[table])
+    monkeypatch.setattr(supabase_rest, 'supabase_query', lambda table, select: downloads.append(table) or halls)
+
+    # This worker gets the webhook; another one serves the halls it mapped from the shared file
+    caches.catalog_cache.replace(('hotels', HOTEL_COLUMNS), hotels, versions['hotels'])
+    caches.catalog_cache.replace(('hotel_halls', HALL_COLUMNS), halls, versions['hotel_halls'])
+    other_worker = caches.CatalogCache(ttl=0)
+
+    def other_worker_halls():
+        return list(other_worker.get(
+            ('hotel_halls', HALL_COLUMNS), lambda version: shared_catalog.load('hotel_halls', HALL_COLUMNS, version),
+            lambda: versions['hotel_halls']))
+
+    try:
+        assert other_worker_halls() == halls
+        # The trigger moves the table's newest updated_at with the edit
+        edited = dict(halls[0], capacity=12345)
+        versions['hotel_halls'] = (str(len(halls)), 't1')
+        assert service.apply_catalog_change('hotel_halls', 'UPDATE', edited, halls[0])
+        assert other_worker_halls() == [edited] + halls[1:]
+        assert downloads == ['hotel_halls']
+    finally:
+        caches.catalog_cache.invalidate()
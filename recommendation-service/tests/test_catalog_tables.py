@@ -0,0 +1,60 @@
+"""Compact catalog tables, and tables memory-mapped from a binary snapshot, hold the
+same rows as the row dicts, pickle, and score exactly like them"""
+import os
+import pickle
+
+import pytest
+
+from catalogs import SEEDS, as_json, engines, exhaustive_engine, random_catalog
+from recommender.catalog import CatalogTable
+from recommender.snapshot import read_snapshot, write_snapshot
+
+
+@pytest.fixture(params=['compact', 'mapped'])
+def table_kind(request):
+    return request.param
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_tables_round_trip_and_score_like_rows(seed, table_kind, tmp_path):
+    events, hotels, halls = random_catalog(seed)
+    tables = CatalogTable.from_rows(hotels), CatalogTable.from_rows(halls)
+    if table_kind == 'mapped':
+        path = os.path.join(tmp_path, 'catalog.bin')
+        write_snapshot(path, {'hotels': ('*', hotels, None), 'hotel_halls': ('*', tables[1], None)})
+        tables = tuple(entry[1] for entry in read_snapshot(path)[1].values())
+
+    assert [list(table) for table in tables] == [hotels, halls]
+    assert list(pickle.loads(pickle.dumps(tables[1]))) == halls
+    expected = exhaustive_engine().recommend_venues(events, hotels, halls)
+    for engine in [exhaustive_engine()] + engines():
+        assert as_json(engine.recommend_venues(events, *tables)) == as_json(expected)
+
+
+def test_missing_values_and_big_ints():
+    rows = [{'id': 1, 'capacity': None, 'price': 2.5}, {'id': 2 ** 70, 'capacity': 10, 'name': 'x'}]
+    table = CatalogTable.from_rows(rows)
+    # A row without a column reads it as None
+    assert list(table) == [{'id': 1, 'capacity': None, 'price': 2.5, 'name': None},
+                           {'id': 2 ** 70, 'capacity': 10, 'price': None, 'name': 'x'}]
+    assert table.column('missing') == [None, None]
+
+
+def test_shared_catalog_is_downloaded_once(tmp_path, monkeypatch):
+    from recommender import supabase_rest
+    from recommender.snapshot import create_shared_catalog
+    path = str(tmp_path / 'catalog.bin')
+    workers = [create_shared_catalog(path), create_shared_catalog(path)]
+    if workers[0] is None:
+        pytest.skip('no file locking here')
+    _, _, halls = random_catalog(6)
+    downloads = []
+    monkeypatch.setattr(supabase_rest, 'supabase_query', lambda table, select: downloads.append(table) or halls)
+
+    assert list(workers[0].load('hotel_halls', '*', ('1', 't0'))) == halls
+    assert list(workers[1].load('hotel_halls', '*', ('1', 't0'))) == halls
+    assert downloads == ['hotel_halls']
+    # A newer version than the file's is downloaded again and replaces it for both
+    assert list(workers[1].load('hotel_halls', '*', ('1', 't1'))) == halls
+    assert workers[0].current_rows('hotel_halls', '*', ('1', 't1')) is not None
+    assert downloads == ['hotel_halls', 'hotel_halls']
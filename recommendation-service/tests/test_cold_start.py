@@ -0,0 +1,18 @@
+"""cold_start.py runs as a script, from any working directory"""
+import os
+import subprocess
+import sys
+
+from conftest import SERVICE_DIR
+
+
+def test_cold_start_script_runs(tmp_path):
+    # A fresh interpreter, so the script has to find the recommender package itself
+    command = [sys.executable, os.path.join(SERVICE_DIR, 'cold_start.py'), '--halls', '50', '--events', '2',
+               '--runs', '1', '--warm-requests', '1', '--latency-ms', '0']
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONPATH'}
+    result = subprocess.run(command, cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert lines[0].startswith('50 halls')
+    assert [line.split()[0] for line in lines[2:]] == ['no', 'json', 'binary']
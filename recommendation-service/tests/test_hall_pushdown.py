@@ -0,0 +1,62 @@
+"""The hall filter pushdown only leaves out halls that could not have matched, and a
+per-request halls list reuses the indexes of the cached hotels"""
+import pytest
+
+from catalogs import SEEDS, as_json, engines, exhaustive_engine, pushed_down_halls, random_catalog
+from recommender.catalog import CatalogTable
+from recommender.engine import VenueRecommendationEngine
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_pushed_down_halls_give_the_same_recommendations(seed):
+    events, hotels, halls = random_catalog(seed)
+    expected = exhaustive_engine().recommend_venues(events, hotels, halls)
+    bounds = VenueRecommendationEngine().hall_fetch_bounds(events, hotels)
+    if bounds is None:
+        pytest.skip('no bound for these events')
+    for engine in engines():
+        assert as_json(engine.recommend_venues(events, hotels, pushed_down_halls(halls, bounds))) == as_json(expected)
+
+
+def test_hall_fetch_filters():
+    events, hotels, halls = random_catalog(3)
+    engine = VenueRecommendationEngine()
+    capacity_low, capacity_high, hotel_ids = engine.hall_fetch_bounds(events, hotels)
+    filters = engine.hall_fetch_filters(events, hotels)
+    assert f'capacity.gte.{capacity_low}' in filters['or'] and f'capacity.lte.{capacity_high}' in filters['or']
+    assert all(hotel_id in filters['or'] for hotel_id in hotel_ids)
+
+
+@pytest.mark.parametrize('tables', [False, True])
+def test_new_halls_list_reuses_hotel_indexes(tables):
+    events, hotels, halls = random_catalog(5)
+    bookings = [{'hotel_id': hotels[0]['id'], 'event_id': 'other', 'events': {'event_date': events[0]['event_date']}}]
+    if tables:
+        hotels, halls = CatalogTable.from_rows(hotels), CatalogTable.from_rows(halls)
+    engine = VenueRecommendationEngine(catalog_slots=3)
+    cached = engine.get_catalog_indexes(hotels, halls)
+    booking_index = engine.get_booking_index(bookings, cached)
+
+    request_halls = list(halls)[::2]
+    indexes = engine.get_catalog_indexes(hotels, request_halls)
+    assert indexes is not cached
+    assert indexes['keywords'] is cached['keywords'] and indexes['hotels'] is cached['hotels']
+    assert engine.get_booking_index(bookings, indexes) is booking_index
+    assert indexes['version'] == VenueRecommendationEngine().build_catalog_indexes(hotels, request_halls)['version']
+    # The cached catalog's indexes are still there for the requests that use it
+    assert engine.get_catalog_indexes(hotels, halls) is cached
+
+
+def test_catalog_slots_are_bounded_and_reloaded_hotels_drop_old_catalogs():
+    events, hotels, halls = random_catalog(5)
+    engine = VenueRecommendationEngine(catalog_slots=2)
+    hall_lists = [list(halls) for _ in range(3)]
+    first, second, third = (engine.get_catalog_indexes(hotels, hall_list) for hall_list in hall_lists)
+    assert engine.get_catalog_indexes(hotels, hall_lists[2]) is third
+    assert engine.get_catalog_indexes(hotels, hall_lists[1]) is second
+    assert engine.get_catalog_indexes(hotels, hall_lists[0]) is not first  # least recently used, evicted
+
+    reloaded_hotels = list(hotels)
+    reloaded = engine.get_catalog_indexes(reloaded_hotels, hall_lists[0])
+    assert engine.cached_catalog_indexes(hotels, hall_lists[1]) is None
+    assert engine.cached_catalog_indexes(reloaded_hotels, hall_lists[0]) is reloaded
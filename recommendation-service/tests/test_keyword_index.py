@@ -0,0 +1,18 @@
+"""The keyword index, tokenized once per catalog, scores event types exactly like the
+per-hotel scoring function"""
+import pytest
+
+from catalogs import SEEDS, exhaustive_engine, random_catalog
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_indexed_event_type_scores(seed):
+    events, hotels, halls = random_catalog(seed)
+    engine = exhaustive_engine()
+    keyword_index = engine.get_catalog_indexes(hotels, halls)['keywords']
+    for event in events:
+        indexed_scores = engine.score_event_types(event, keyword_index)
+        for hotel in hotels:
+            scalar_score = engine.calculate_event_type_score(
+                event['event_type'], event['event_name'], hotel.get('description', ''))
+            assert repr(indexed_scores[hotel['id']]) == repr(scalar_score), hotel['id']
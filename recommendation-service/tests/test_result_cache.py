@@ -0,0 +1,29 @@
+"""The result cache rescores only new or changed events, which must not change the result"""
+import pytest
+
+from catalogs import SEEDS, as_json, exhaustive_engine, random_catalog
+from recommender.caches import RecommendationCache
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_changed_event_is_rescored(seed):
+    events, hotels, halls = random_catalog(seed)
+    engine = exhaustive_engine()
+    result_cache = RecommendationCache()
+    result_cache.recommend(engine, 'user', events, hotels, halls)
+
+    changed_events = [dict(event) for event in events]
+    changed_events[0]['guest_count'] += 50
+    actual = result_cache.recommend(engine, 'user', changed_events, hotels, halls, limit=25)
+    assert as_json(actual) == as_json(engine.recommend_venues(changed_events, hotels, halls, limit=25))
+
+
+def test_catalog_change_rescores_everything():
+    events, hotels, halls = random_catalog(4)
+    engine = exhaustive_engine()
+    result_cache = RecommendationCache()
+    result_cache.recommend(engine, 'user', events, hotels, halls)
+
+    halls = [dict(hall, capacity=events[0]['guest_count']) for hall in halls]
+    actual = result_cache.recommend(engine, 'user', events, hotels, halls)
+    assert as_json(actual) == as_json(engine.recommend_venues(events, hotels, halls))
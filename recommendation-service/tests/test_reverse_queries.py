@@ -0,0 +1,43 @@
+"""A reverse query returns exactly a hotel's (or hall's) share of the forward result"""
+import random
+
+import pytest
+
+from catalogs import SEEDS, as_json, engine_ids, engines, exhaustive_engine, random_catalog
+from recommender.catalog import CatalogTable
+from synthetic import generate_catalog
+
+
+def open_events(seed, rng):
+    """Events of many users, a few with a negative budget"""
+    events = generate_catalog(0, num_events=rng.randint(1, 80), seed=seed)[0]
+    for event in events:
+        if rng.random() < 0.1:
+            event['budget'] = -event['guest_count']
+    return events
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_reverse_queries_match_forward_results(seed):
+    rng = random.Random(seed)
+    _, hotels, halls = random_catalog(seed)
+    events = open_events(seed, rng)
+    expected = exhaustive_engine().recommend_venues(events, hotels, halls)
+    for hotel in rng.sample(hotels, min(3, len(hotels))):
+        hall_id = next((hall['id'] for hall in halls if hall['hotel_id'] == hotel['id']), None)
+        for query_hall_id in {None, hall_id}:
+            hotel_expected = [
+                rec for rec in expected if rec['hotel']['id'] == hotel['id']
+                and (query_hall_id is None or rec['hall']['id'] == query_hall_id)
+            ]
+            for engine in engines():
+                for limit in (None, 1, 5):
+                    actual = engine.recommend_events(
+                        CatalogTable.from_rows(events), hotels, halls, hotel['id'], query_hall_id, limit)
+                    assert as_json(actual) == as_json(hotel_expected[:limit]), (engine_ids(engine), limit)
+
+
+def test_unknown_hotel_has_no_events():
+    events, hotels, halls = random_catalog(0)
+    for engine in engines():
+        assert list(engine.recommend_events(events, hotels, halls, 'no-such-hotel')) == []
@@ -0,0 +1,55 @@
+"""Pruning, the hall filter pushdown, the numpy backend and reverse queries stay exact
+under scoring plans other than the default"""
+import random
+
+import pytest
+
+from catalogs import (
+    SEEDS, as_json, engine_ids, engines, exhaustive_engine, pushed_down_halls, random_catalog, random_scoring_plan,
+)
+from recommender.engine import ScoringPlan
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_random_plans_match_exhaustive_scoring(seed):
+    rng = random.Random(seed)
+    events, hotels, halls = random_catalog(seed)
+    plan = random_scoring_plan(rng)
+    expected = exhaustive_engine(plan).recommend_venues(events, hotels, halls)
+    for engine in engines(plan):
+        assert as_json(engine.recommend_venues(events, hotels, halls)) == as_json(expected), (engine_ids(engine), plan)
+
+    engine = engines(plan)[0]
+    for hotel in rng.sample(hotels, min(2, len(hotels))):
+        hotel_expected = [rec for rec in expected if rec['hotel']['id'] == hotel['id']]
+        for limit in (None, 1, 3):
+            actual = engine.recommend_events(events, hotels, halls, hotel['id'], None, limit)
+            assert as_json(actual) == as_json(hotel_expected[:limit]), (plan, limit)
+
+    bounds = engine.hall_fetch_bounds(events, hotels)
+    if bounds is not None:
+        assert as_json(engine.recommend_venues(events, hotels, pushed_down_halls(halls, bounds))) == as_json(expected)
+
+
+def test_parse_keeps_defaults_for_fields_left_out():
+    plan = ScoringPlan.parse(' location=0.5, min_score=45 ,', budget=0.1)
+    assert plan.version == ScoringPlan(0.5, budget=0.1, min_score=45).version
+    assert (plan.location_weight, plan.capacity_weight, plan.budget_weight, plan.min_score) == (0.5, 0.30, 0.1, 45)
+    assert ScoringPlan.parse('').version == ScoringPlan().version
+
+
+def test_version_follows_values():
+    assert ScoringPlan(location=0.4).version == ScoringPlan(location=0.40000).version
+    assert ScoringPlan(location=0.5).version != ScoringPlan().version
+
+
+@pytest.mark.parametrize('spec', ['weight=1', 'location=high', 'location=-1', 'min_score=101', 'budget=inf'])
+def test_parse_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        ScoringPlan.parse(spec)
+
+
+@pytest.mark.parametrize('value', [True, None, '0.5', -0.1, float('nan')])
+def test_weights_must_be_non_negative_numbers(value):
+    with pytest.raises(ValueError):
+        ScoringPlan(location=value)
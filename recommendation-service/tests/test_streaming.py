@@ -0,0 +1,14 @@
+"""Streaming yields the recommendations the ranked response holds, in the same order"""
+import pytest
+
+from catalogs import LIMITS, SEEDS, as_json, exhaustive_engine, random_catalog
+
+
+@pytest.mark.parametrize('limit, per_event_limit', LIMITS)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_streaming_matches_ranking(seed, limit, per_event_limit):
+    events, hotels, halls = random_catalog(seed)
+    engine = exhaustive_engine()
+    indexes = engine.get_catalog_indexes(hotels, halls)
+    streamed = engine.iter_ranked(engine.iter_matches(events, hotels, indexes), limit, per_event_limit)
+    assert as_json(streamed) == as_json(engine.recommend_venues(events, hotels, halls, limit, per_event_limit))
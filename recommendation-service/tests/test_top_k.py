@@ -0,0 +1,26 @@
+"""limit / per_event_limit select a prefix of the fully sorted recommendations"""
+import pytest
+
+from catalogs import LIMITS, SEEDS, as_json, engines, exhaustive_engine, random_catalog
+
+
+def capped(recommendations, limit, per_event_limit):
+    """The top-K the limits select, by a scan of the fully sorted list"""
+    seen = {}
+    kept = []
+    for rec in recommendations:
+        seen[rec['event']['id']] = seen.get(rec['event']['id'], 0) + 1
+        if per_event_limit is None or seen[rec['event']['id']] <= per_event_limit:
+            kept.append(rec)
+    return kept[:limit]
+
+
+@pytest.mark.parametrize('limit, per_event_limit', LIMITS)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_top_k_is_a_prefix_of_the_sorted_list(seed, limit, per_event_limit):
+    events, hotels, halls = random_catalog(seed)
+    expected = capped(exhaustive_engine().recommend_venues(events, hotels, halls), limit, per_event_limit)
+    for engine in engines():
+        actual = engine.recommend_venues(events, hotels, halls, limit=limit, per_event_limit=per_event_limit)
+        assert as_json(actual) == as_json(expected)
+
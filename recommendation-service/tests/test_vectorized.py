@@ -0,0 +1,97 @@
+"""The numpy backend must return exactly what the python backend returns: the same
+recommendations in the same order, with the same scores down to int vs float"""
+import pytest
+
+from catalogs import SEEDS, as_json, exhaustive_engine, random_catalog
+from recommender.engine import VenueRecommendationEngine
+from recommender.vectorized import VectorizedVenueRecommendationEngine, np
+
+pytestmark = pytest.mark.skipif(np is None, reason='numpy is not installed')
+
+python_engine = VenueRecommendationEngine(prefilter=False)
+
+
+def hall(hall_id, hotel_id, capacity, price):
+    return {'id': hall_id, 'hotel_id': hotel_id, 'name': f'Hall {hall_id}', 'capacity': capacity,
+            'price_per_event': price}
+
+
+def event(event_id, guests, budget, location='Lahore', event_type='Wedding'):
+    return {'id': event_id, 'event_name': f'{event_type} Celebration', 'event_type': event_type,
+            'guest_count': guests, 'budget': budget, 'location': location, 'event_date': '2026-05-01'}
+
+
+HOTELS = [
+    {'id': 'hotel-1', 'name': 'Hotel 1', 'city': 'Lahore', 'description': 'Elegant venue for wedding events'},
+    {'id': 'hotel-2', 'name': 'Hotel 2', 'city': 'Karachi', 'description': None},
+    {'id': 'hotel-3', 'name': 'Hotel 3', 'city': 'DHA Lahore', 'description': 'Birthdays and celebrations'},
+]
+
+
+@pytest.mark.parametrize('prefilter', [True, False])
+@pytest.mark.parametrize('seed', SEEDS)
+def test_random_catalogs(seed, prefilter):
+    events, hotels, halls = random_catalog(seed)
+    expected = exhaustive_engine().recommend_venues(events, hotels, halls)
+    actual = VectorizedVenueRecommendationEngine(prefilter=prefilter).recommend_venues(events, hotels, halls)
+    assert as_json(actual) == as_json(expected)
+
+
+@pytest.mark.parametrize('guests', [1, 3, 7, 100, 333, 800])
+@pytest.mark.parametrize('ratio', [0.0, 0.5, 0.79, 0.8, 0.99, 1.0, 1.2, 1.21, 1.5, 1.51, 2.0, 4.5, 5, 6.5, 20])
+def test_capacity_score_boundaries(ratio, guests):
+    capacity = round(guests * ratio)
+    engine = VectorizedVenueRecommendationEngine()
+    scores, is_float = engine.score_capacity_batch(guests, np.array([float(capacity)]), np.array([True]))
+    expected = python_engine.calculate_capacity_score(guests, capacity)
+    assert scores[0] == expected
+    assert bool(is_float[0]) == isinstance(expected, float)
+
+
+@pytest.mark.parametrize('budget', [1, 7, 100000, 333333])
+@pytest.mark.parametrize('ratio', [0.0, 0.5, 0.7, 0.71, 0.85, 0.86, 1.0, 1.01, 1.15, 1.16, 1.3, 1.31, 3])
+def test_budget_score_boundaries(ratio, budget):
+    price = round(budget * ratio)
+    scores = VectorizedVenueRecommendationEngine().score_budget_batch(budget, np.array([float(price)]))
+    assert scores[0] == python_engine.calculate_budget_score(budget, price)
+
+
+@pytest.mark.parametrize('prefilter', [True, False])
+def test_missing_capacity_price_and_budget(prefilter):
+    halls = [
+        hall('no-capacity', 'hotel-1', None, 250000),
+        hall('no-price', 'hotel-1', 120, None),
+        hall('neither', 'hotel-2', None, None),
+        hall('both', 'hotel-3', 110, 90000),
+    ]
+    # hotel-2 also has a hall; a hotel without halls gets a hotel-level recommendation
+    hotels = HOTELS + [{'id': 'hotel-4', 'name': 'Hotel 4', 'city': 'Lahore', 'description': 'Wedding lawn'}]
+    events = [event('with-budget', 100, 300000), event('no-budget', 100, None), event('karachi', 90, None, 'Karachi')]
+    expected = exhaustive_engine().recommend_venues(events, hotels, halls)
+    actual = VectorizedVenueRecommendationEngine(prefilter=prefilter).recommend_venues(events, hotels, halls)
+    assert expected
+    assert as_json(actual) == as_json(expected)
+
+
+def test_score_types():
+    # A ratio above 1.5 gives a float capacity score, the bands give ints; both reach the response
+    halls = [hall('exact', 'hotel-1', 100, 100000), hall('large', 'hotel-1', 170, 100000),
+             hall('small', 'hotel-3', 77, 100000), hall('floor', 'hotel-3', 3000, 100000)]
+    events = [event('wedding', 100, 150000)]
+    expected = exhaustive_engine().recommend_venues(events, HOTELS, halls)
+    actual = VectorizedVenueRecommendationEngine().recommend_venues(events, HOTELS, halls)
+    assert {type(rec['scores']['capacity']) for rec in expected} == {int, float}
+    for expected_rec, actual_rec in zip(expected, actual, strict=True):
+        assert type(actual_rec['matchScore']) is type(expected_rec['matchScore'])
+        assert {name: type(score) for name, score in actual_rec['scores'].items()} == \
+            {name: type(score) for name, score in expected_rec['scores'].items()}
+    assert as_json(actual) == as_json(expected)
+
+
+@pytest.mark.parametrize('bad_event', [event('no-guests', 0, 100000), event('zero-budget', 100, 0)])
+def test_zero_guests_or_budget_raise_like_python(bad_event):
+    halls = [hall('h', 'hotel-1', 100, 100000)]
+    with pytest.raises(ZeroDivisionError):
+        python_engine.recommend_venues([bad_event], HOTELS, halls)
+    with pytest.raises(ZeroDivisionError):
+        VectorizedVenueRecommendationEngine().recommend_venues([bad_event], HOTELS, halls)
@@ -0,0 +1,21 @@
+"""Venue recommendation core shared by the Flask service (recommendation-service/app.py),
+its asyncio variant (recommendation-service/async_app.py) and the Vercel functions
+(api/recommendations.py, api/organizer_events.py).
+
+Importing the package is free. The modules are imported as needed:
+
+- engine: VenueRecommendationEngine and its catalog indexes (standard library only)
+- catalog: compact column-stored catalog tables
+- vectorized: the numpy scoring backend
+- config: environment configuration
+- supabase_rest: pooled Supabase REST access
+- async_rest: Supabase REST access over aiohttp, and single-flight call merging
+- caches: catalog, token and result caches
+- snapshot: prebuilt catalog snapshot files
+- auth: bearer token verification
+- responses: query parameters and response formats
+- service: the shared engine and the request pipeline
+- async_service: the request pipeline over async_rest
+- batch: multi-process batch scoring
+- metrics: logging, histograms and timing spans
+"""
@@ -0,0 +1,116 @@
+"""Supabase REST access for the asyncio serving mode (recommendation-service/async_app.py):
+an aiohttp session, and single-flight merging of identical in-flight calls"""
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:  # Only needed for the asyncio serving mode
+    aiohttp = None
+
+from .config import HTTP_POOL_SIZE, SUPABASE_KEY, SUPABASE_TIMEOUT, SUPABASE_URL
+from .metrics import SUPABASE_SECONDS, logger
+
+class SingleFlight:
+    """Merges concurrent calls with the same key into one.
+    
+    The first caller starts the call; callers that arrive while it is in
+    flight await the same result (or exception) instead of starting their
+    own. A caller that is cancelled doesn't cancel the call for the others.
+    """
+    
+    def __init__(self):
+        self.calls = 0
+        self.merged = 0
+        self._in_flight = {}  # key -> asyncio.Task
+    
+    async def do(self, key, fn, *args):
+        """Await fn(*args), or the in-flight call for key if there is one"""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn(*args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._finish(key, task))
+        else:
+            self.merged += 1
+        return await asyncio.shield(task)
+    
+    def _finish(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, even if every caller was cancelled
+    
+    def stats(self):
+        return {'calls': self.calls, 'merged': self.merged, 'inFlight': len(self._in_flight)}
+
+_session = None
+
+def get_session():
+    """The event loop's aiohttp session, created on first use (inside the running loop)"""
+    global _session
+    if _session is None or _session.closed:
+        if aiohttp is None:
+            raise RuntimeError('The asyncio serving mode needs aiohttp (pip install aiohttp)')
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(total=SUPABASE_TIMEOUT)
+        )
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+async def supabase_query(table: str, select: str = '*', filters: dict = None):
+    """supabase_rest.supabase_query over the async session"""
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    headers = {
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}'
+    }
+    params = {'select': select}
+    if filters:
+        params.update(filters)
+    
+    start = time.perf_counter()
+    async with get_session().get(url, headers=headers, params=params) as response:
+        body = await response.read()
+        elapsed = time.perf_counter() - start
+        SUPABASE_SECONDS.observe(elapsed, table=table)
+        logger.debug('Query %s %s -> %s (%d bytes, %.1fms)', table, params, response.status, len(body), elapsed * 1000)
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+async def supabase_table_version(table: str, version_column: str):
+    """supabase_rest.supabase_table_version over the async session"""
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    headers = {
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}',
+        'Prefer': 'count=exact'
+    }
+    params = {
+        'select': version_column,
+        'order': f'{version_column}.desc.nullslast',
+        'limit': 1
+    }
+    
+    async with get_session().get(url, headers=headers, params=params) as response:
+        response.raise_for_status()
+        rows = await response.json(content_type=None)
+        row_count = response.headers.get('Content-Range', '*/*').split('/')[-1]
+    latest = rows[0].get(version_column) if rows else None
+    return row_count, latest
+
+async def fetch_auth_user(token: str):
+    """GET /auth/v1/user for a bearer token; returns (status, body text)"""
+    headers = {
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {token}'
+    }
+    async with get_session().get(f"{SUPABASE_URL}/auth/v1/user", headers=headers) as response:
+        return response.status, await response.text()
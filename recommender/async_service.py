@@ -0,0 +1,111 @@
+"""The request-level pipeline of service.py for the asyncio serving mode
+(recommendation-service/async_app.py).
+
+Supabase is called through async_rest, and identical calls in flight at the
+same time are merged: requests that miss the catalog cache together share
+one version probe and one download, and a user's concurrent requests share
+one events query and one token check.
+"""
+import asyncio
+import json
+
+from . import async_rest
+from . import caches
+from .auth import authenticate_locally, remember_verified_user
+from .caches import catalog_cache
+from .catalog import CatalogTable
+from .config import (AVAILABILITY_FILTER, BOOKING_COLUMNS, CATALOG_VERSION_COLUMNS, EVENT_COLUMNS, HALL_COLUMNS,
+                     HALL_FILTER_PUSHDOWN, HOTEL_COLUMNS)
+from .metrics import StageTimings
+from .service import engine
+
+# Keyed by what is fetched, e.g. ('events', user_id); /health reports its counters
+single_flight = async_rest.SingleFlight()
+
+async def authenticate(token):
+    """auth.authenticate without blocking the event loop"""
+    user_id = authenticate_locally(token)
+    if user_id is not None:
+        return user_id, None
+    
+    status, body = await single_flight.do(('auth', token), async_rest.fetch_auth_user, token)
+    if status != 200:
+        return None, body
+    
+    user_id = json.loads(body).get('id')
+    if user_id:
+        remember_verified_user(token, user_id)
+    return user_id, None
+
+async def query_table(table, select, filters=None):
+    return CatalogTable.from_rows(await async_rest.supabase_query(table, select, filters))
+
+async def fetch_catalog_table(table: str, select: str = '*', filters=None):
+    """caches.fetch_catalog_table over the async client"""
+    version_column = CATALOG_VERSION_COLUMNS.get(table)
+    version_probe = None
+    if version_column:
+        version_probe = lambda: single_flight.do(
+            ('version', table), async_rest.supabase_table_version, table, version_column)
+    if caches.shared_catalog is not None and version_probe is not None and filters is None:
+        # The file lock and the download behind it block, so they run on a thread
+        loader = lambda version: single_flight.do(
+            ('load', table, select, version), asyncio.to_thread, caches.shared_catalog.load, table, select, version)
+    else:
+        loader = lambda version: single_flight.do(('load', table, select, version), query_table, table, select, filters)
+    return await catalog_cache.get_async((table, select), loader, version_probe=version_probe)
+
+async def fetch_open_events():
+    """caches.fetch_open_events over the async client"""
+    return await fetch_catalog_table('events', EVENT_COLUMNS, {'status': 'eq.open'})
+
+async def fetch_bookings():
+    """caches.fetch_bookings over the async client, or None with AVAILABILITY_FILTER off"""
+    if not AVAILABILITY_FILTER:
+        return None
+    return await fetch_catalog_table('invites', BOOKING_COLUMNS, {'status': 'eq.accepted'})
+
+async def fetch_user_events(user_id):
+    # All statuses, not just open
+    return await single_flight.do(
+        ('events', user_id), async_rest.supabase_query, 'events', EVENT_COLUMNS, {'user_id': f'eq.{user_id}'})
+
+async def fetch_recommendation_inputs(user_id, timings=None):
+    """service.fetch_recommendation_inputs over the async client"""
+    timings = timings or StageTimings()
+    fetches = [
+        timings.call_async('fetch_events', fetch_user_events(user_id)),
+        timings.call_async('fetch_hotels', fetch_catalog_table('hotels', HOTEL_COLUMNS)),
+        timings.call_async('fetch_bookings', fetch_bookings())
+    ]
+    if not HALL_FILTER_PUSHDOWN:
+        fetches.append(timings.call_async('fetch_hotel_halls', fetch_catalog_table('hotel_halls', HALL_COLUMNS)))
+        events, hotels, bookings, halls = await asyncio.gather(*fetches)
+        return events, hotels, halls, bookings
+    
+    # The hall filter depends on the user's events, so it runs after them and skips the catalog cache
+    events, hotels, bookings = await asyncio.gather(*fetches)
+    if not events:
+        return events, hotels, [], bookings
+    filters = engine.hall_fetch_filters(events, hotels)
+    if filters is None:
+        halls = await timings.call_async('fetch_hotel_halls', fetch_catalog_table('hotel_halls', HALL_COLUMNS))
+    else:
+        halls = await timings.call_async('fetch_hotel_halls', single_flight.do(
+            ('hotel_halls', tuple(sorted(filters.items()))), async_rest.supabase_query, 'hotel_halls', HALL_COLUMNS,
+            filters))
+    return events, hotels, halls, bookings
+
+async def fetch_organizer_inputs(user_id, hotel_id, timings=None):
+    """service.fetch_organizer_inputs over the async client"""
+    timings = timings or StageTimings()
+    owned, events, hotels, halls, bookings = await asyncio.gather(
+        timings.call_async('fetch_owner', single_flight.do(
+            ('owner', hotel_id, user_id), async_rest.supabase_query, 'hotels', 'id',
+            {'id': f'eq.{hotel_id}', 'organizer_id': f'eq.{user_id}'})),
+        timings.call_async('fetch_events', fetch_open_events()),
+        timings.call_async('fetch_hotels', fetch_catalog_table('hotels', HOTEL_COLUMNS)),
+        timings.call_async('fetch_hotel_halls', fetch_catalog_table('hotel_halls', HALL_COLUMNS)),
+        timings.call_async('fetch_bookings', fetch_bookings())
+    )
+    return bool(owned), events, hotels, halls, bookings
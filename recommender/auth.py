@@ -0,0 +1,89 @@
+"""Bearer token verification"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+
+from . import supabase_rest
+from .caches import token_cache
+from .config import SUPABASE_JWT_SECRET, SUPABASE_KEY, SUPABASE_TIMEOUT, SUPABASE_URL
+
+def decode_jwt_part(part):
+    """Decode one base64url JSON part of a JWT"""
+    return json.loads(base64.urlsafe_b64decode(part + '=' * (-len(part) % 4)))
+
+def jwt_claims(token, secret=None):
+    """Claims of a JWT, or None if it is malformed.
+    
+    With a secret, the HS256 signature and exp are checked too and None is
+    returned unless both are valid.
+    """
+    try:
+        header_part, payload_part, signature_part = token.split('.')
+        header, claims = decode_jwt_part(header_part), decode_jwt_part(payload_part)
+        # Both parts decode to any JSON value; only objects are a JWT
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            return None
+        if secret is None:
+            return claims
+        
+        if header.get('alg') != 'HS256':
+            return None
+        expected = hmac.new(secret.encode(), f'{header_part}.{payload_part}'.encode(), hashlib.sha256).digest()
+        signature = base64.urlsafe_b64decode(signature_part + '=' * (-len(signature_part) % 4))
+    except (ValueError, binascii.Error):
+        return None
+    
+    if not hmac.compare_digest(expected, signature):
+        return None
+    if not isinstance(claims.get('exp'), (int, float)) or claims['exp'] <= time.time():
+        return None
+    return claims
+
+def authenticate_locally(token):
+    """The user id for a token from the verified-token cache or local JWT
+    verification (when SUPABASE_JWT_SECRET is set), or None"""
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+    
+    if SUPABASE_JWT_SECRET:
+        claims = jwt_claims(token, SUPABASE_JWT_SECRET)
+        if claims and claims.get('sub') and claims.get('role') == 'authenticated':
+            token_cache.put(token, claims['sub'], claims['exp'])
+            return claims['sub']
+    return None
+
+def remember_verified_user(token, user_id):
+    """Cache a user id Supabase's /auth/v1/user returned for token"""
+    # Already verified by Supabase, so the unverified exp claim is only used to expire the entry
+    claims = jwt_claims(token)
+    token_expires_at = claims.get('exp') if isinstance(claims, dict) else None
+    token_cache.put(token, user_id, token_expires_at if isinstance(token_expires_at, (int, float)) else None)
+
+def authenticate(token):
+    """Resolve a bearer token to a user id.
+    
+    Tries the verified-token cache, then local JWT verification (when
+    SUPABASE_JWT_SECRET is set), then Supabase's /auth/v1/user.
+    Returns (user_id, None) or (None, error details).
+    """
+    user_id = authenticate_locally(token)
+    if user_id is not None:
+        return user_id, None
+    
+    # Verify token with Supabase - use the anon key in apikey header
+    headers = {
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {token}'
+    }
+    user_response = supabase_rest.get_http_session().get(f"{SUPABASE_URL}/auth/v1/user", headers=headers, timeout=SUPABASE_TIMEOUT)
+    if user_response.status_code != 200:
+        return None, user_response.text
+    
+    user_id = user_response.json().get('id')
+    if user_id:
+        remember_verified_user(token, user_id)
+    return user_id, None
@@ -0,0 +1,107 @@
+"""Scoring many events against one catalog load, spread over a process pool"""
+import itertools
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import service, supabase_rest
+from .config import BATCH_CHUNK_SIZE, BATCH_MAX_RUNS, BATCH_WORKERS, EVENT_COLUMNS, SCORING_BACKEND
+from .responses import compact_recommendations
+from .service import create_engine
+
+BATCH_EVENT_COLUMNS = EVENT_COLUMNS + ',user_id'
+BATCH_IDS_PER_QUERY = 100  # keeps the in.(...) filters well under URL length limits
+
+# Workers are never forked from the server process: its other threads (request
+# handlers, Supabase fetches) may hold locks a forked child would inherit held.
+# A fork server forks them from a single-threaded process that has imported the
+# entry point and this module once; where there is none, they are spawned.
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    batch_mp_context = multiprocessing.get_context('forkserver')
+    batch_mp_context.set_forkserver_preload(['__main__', __name__])
+else:
+    batch_mp_context = multiprocessing.get_context('spawn')
+
+# Batch runs the endpoint serves at once; a request finding none free gets 429
+batch_run_slots = threading.BoundedSemaphore(BATCH_MAX_RUNS)
+
+def fetch_batch_events(user_ids=None, event_ids=None, status=None, page_size=1000):
+    """Yield the events selected for a batch run, fetched a page at a time"""
+    if user_ids and event_ids:
+        raise ValueError('Pass user_ids or event_ids, not both')
+    
+    column, ids = ('user_id', user_ids) if user_ids else ('id', event_ids)
+    id_groups = [None]
+    if ids:
+        id_groups = [ids[i:i + BATCH_IDS_PER_QUERY] for i in range(0, len(ids), BATCH_IDS_PER_QUERY)]
+    
+    for id_group in id_groups:
+        filters = {'order': 'id', 'limit': page_size}
+        if status:
+            filters['status'] = f'eq.{status}'
+        if id_group is not None:
+            filters[column] = f'in.({",".join(str(value) for value in id_group)})'
+        
+        offset = 0
+        while True:
+            page = supabase_rest.supabase_query('events', BATCH_EVENT_COLUMNS, dict(filters, offset=offset))
+            yield from page
+            if len(page) < page_size:
+                break
+            offset += page_size
+
+def batch_result(engine, event, hotels, halls, per_event_limit=None, compact=False, bookings=None):
+    """Recommendations for one event, as one NDJSON line of a batch run"""
+    recommendations = engine.recommend_venues([event], hotels, halls, limit=per_event_limit, bookings=bookings)
+    result = {'eventId': event['id'], 'userId': event.get('user_id')}
+    if compact:
+        result.update(compact_recommendations(recommendations))
+    else:
+        result.update({'recommendations': recommendations, 'count': len(recommendations)})
+    return result
+
+batch_worker_state = None
+
+def init_batch_worker(backend, hotels, halls, bookings=None, plan=None):
+    """Process pool initializer: each worker gets the catalog once and indexes it once,
+    and scores with the parent's scoring plan"""
+    global batch_worker_state
+    worker_engine = create_engine(backend, plan)
+    worker_engine.get_catalog_indexes(hotels, halls)
+    batch_worker_state = (worker_engine, hotels, halls, bookings)
+
+def score_batch_chunk(events, per_event_limit=None, compact=False):
+    """Score a chunk of events in a batch worker"""
+    worker_engine, hotels, halls, bookings = batch_worker_state
+    return [batch_result(worker_engine, event, hotels, halls, per_event_limit, compact, bookings) for event in events]
+
+def iter_batch_recommendations(events, hotels, halls, per_event_limit=None, compact=False,
+                               workers=BATCH_WORKERS, chunk_size=BATCH_CHUNK_SIZE, bookings=None):
+    """Score any number of events against one catalog load (and bookings, see recommend_venues).
+    
+    events may be a lazy iterable. Results are yielded per event as their
+    chunk finishes, so they are not in input order. At most two chunks per
+    worker are in flight, which keeps memory flat for large runs.
+    """
+    events = iter(events)
+    chunks = iter(lambda: list(itertools.islice(events, chunk_size)), [])
+    
+    if workers <= 1:
+        for chunk in chunks:
+            for event in chunk:
+                yield batch_result(service.engine, event, hotels, halls, per_event_limit, compact, bookings)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=batch_mp_context, initializer=init_batch_worker,
+                             initargs=(SCORING_BACKEND, hotels, halls, bookings, service.engine.plan)) as pool:
+        pending = set()
+        for chunk in chunks:
+            pending.add(pool.submit(score_batch_chunk, chunk, per_event_limit, compact))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
@@ -0,0 +1,316 @@
+"""Catalog, verified-token and per-user result caches, one instance of each per process"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from . import supabase_rest
+from .catalog import CatalogTable
+from .config import (AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL, BOOKING_COLUMNS, CATALOG_CACHE_MAX_ENTRIES,
+                     CATALOG_CACHE_TTL, CATALOG_VERSION_COLUMNS, EVENT_COLUMNS, RESULT_CACHE_MAX_USERS,
+                     SHARED_CATALOG_PATH)
+from .engine import fingerprint
+from .snapshot import create_shared_catalog
+
+class CatalogCache:
+    """In-process TTL cache for the rarely-changing catalog tables"""
+    
+    def __init__(self, ttl=300, max_entries=8):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (table, select) -> {'value', 'version', 'expires_at'}
+        self._lock = threading.Lock()
+    
+    def get(self, key, loader, version_probe=None):
+        """Return the cached value for key, calling loader(version) on a miss.
+        
+        When a TTL runs out and a version_probe is given, the probe is called
+        first and the cached value is kept if the version has not changed.
+        The loader gets the probed version (None without a probe).
+        """
+        now = time.monotonic()
+        entry = self._lookup(key, now)
+        if entry is not None and now < entry['expires_at']:
+            return entry['value']
+        
+        version = None
+        if version_probe is not None:
+            version = version_probe()
+            if self._revalidate(entry, version, now):
+                return entry['value']
+        
+        value = loader(version)
+        self._store(key, value, version, now)
+        return value
+    
+    async def get_async(self, key, loader, version_probe=None):
+        """get() with a coroutine loader and version_probe, for the asyncio serving mode"""
+        now = time.monotonic()
+        entry = self._lookup(key, now)
+        if entry is not None and now < entry['expires_at']:
+            return entry['value']
+        
+        version = None
+        if version_probe is not None:
+            version = await version_probe()
+            if self._revalidate(entry, version, now):
+                return entry['value']
+        
+        value = await loader(version)
+        self._store(key, value, version, now)
+        return value
+    
+    def _lookup(self, key, now):
+        """The entry for key (counting a hit if it is fresh), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now < entry['expires_at']:
+                    self.hits += 1
+            return entry
+    
+    def _revalidate(self, entry, version, now):
+        """Restart an expired entry's TTL if its version is unchanged; returns whether it was"""
+        if entry is None or entry['version'] != version:
+            return False
+        with self._lock:
+            entry['expires_at'] = now + self.ttl
+            self.hits += 1
+            self.revalidations += 1
+        return True
+    
+    def _store(self, key, value, version, now):
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = {'value': value, 'version': version, 'expires_at': now + self.ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, table=None):
+        """Drop the entries cached for one table, or the whole cache when table is None"""
+        with self._lock:
+            if table is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            keys = [key for key in self._entries if key[0] == table]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+    
+    def peek(self, key):
+        """Return the cached value for key without loading or revalidating, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['value'] if entry is not None else None
+    
+    def replace(self, key, value, version=None, ttl=None):
+        """Swap in a new value for key, e.g. one patched from a row change, and restart its TTL.
+        
+        ttl overrides the cache's TTL for this entry; ttl=0 keeps the value but
+        has the next get() revalidate it.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = {'value': value, 'version': version, 'expires_at': expires_at}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl
+            }
+
+catalog_cache = CatalogCache(ttl=CATALOG_CACHE_TTL, max_entries=CATALOG_CACHE_MAX_ENTRIES)
+
+# Versioned tables are loaded through the file shared with the other workers when configured
+shared_catalog = create_shared_catalog(SHARED_CATALOG_PATH) if SHARED_CATALOG_PATH else None
+
+def fetch_catalog_table(table: str, select: str = '*'):
+    """Fetch a catalog table through the shared catalog cache, stored as a compact CatalogTable"""
+    version_column = CATALOG_VERSION_COLUMNS.get(table)
+    version_probe = None
+    if version_column:
+        version_probe = lambda: supabase_rest.supabase_table_version(table, version_column)
+    if shared_catalog is not None and version_probe is not None:
+        loader = lambda version: shared_catalog.load(table, select, version)
+    else:
+        loader = lambda version: CatalogTable.from_rows(supabase_rest.supabase_query(table, select))
+    return catalog_cache.get((table, select), loader, version_probe=version_probe)
+
+def fetch_open_events():
+    """Fetch every open event (for reverse recommendations) through the catalog cache.
+    
+    The version probe covers all events, so any event change reloads them.
+    """
+    return catalog_cache.get(
+        ('events', EVENT_COLUMNS),
+        lambda version: CatalogTable.from_rows(supabase_rest.supabase_query('events', EVENT_COLUMNS, {'status': 'eq.open'})),
+        version_probe=lambda: supabase_rest.supabase_table_version('events', CATALOG_VERSION_COLUMNS['events'])
+    )
+
+def fetch_bookings():
+    """Fetch the accepted invites (see engine.build_booking_index) through the catalog cache"""
+    return catalog_cache.get(
+        ('invites', BOOKING_COLUMNS),
+        lambda version: CatalogTable.from_rows(supabase_rest.supabase_query('invites', BOOKING_COLUMNS, {'status': 'eq.accepted'})),
+        version_probe=lambda: supabase_rest.supabase_table_version('invites', CATALOG_VERSION_COLUMNS['invites'])
+    )
+
+class TokenCache:
+    """Bounded LRU cache of verified bearer tokens -> user ids.
+    
+    Entries expire at the token's own exp claim or after the configured TTL,
+    whichever comes first. Tokens are stored hashed.
+    """
+    
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # sha256(token) -> (user_id, expires_at)
+        self._lock = threading.Lock()
+    
+    def _key(self, token):
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, token, user_id, token_expires_at=None):
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        if expires_at <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl
+            }
+
+token_cache = TokenCache(ttl=AUTH_CACHE_TTL, max_entries=AUTH_CACHE_MAX_ENTRIES)
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value covers etag (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.replace('W/', '', 1) == etag.replace('W/', '', 1) for tag in tags)
+
+class RecommendationCache:
+    """Per-user LRU cache of scored matches.
+    
+    Matches are kept per event fingerprint and tied to a catalog version, so a
+    reload only rescores events that changed. A catalog change rescores
+    everything.
+    """
+    
+    def __init__(self, max_users=1000):
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user id -> {'catalog_version', 'events': {(fingerprint, unavailable hotels): matches}}
+        self._lock = threading.Lock()
+    
+    def etag(self, catalog_version, events, *params):
+        """Weak ETag for a response built from this catalog, these events and request params"""
+        return f'W/"{fingerprint([catalog_version, [fingerprint(event) for event in events], params])}"'
+    
+    def recommend(self, engine, user_id, events, hotels, halls, limit=None, per_event_limit=None, bookings=None):
+        """engine.recommend_venues, reusing cached matches for unchanged events"""
+        matches = self.matches(engine, user_id, events, hotels, halls, bookings)
+        return engine.rank_matches(matches, limit, per_event_limit)
+    
+    def matches(self, engine, user_id, events, hotels, halls, bookings=None):
+        """Matches for the user's events in generation order, scoring only events not cached.
+        
+        An event is also rescored when the hotels booked out on its date change.
+        """
+        indexes = engine.get_catalog_indexes(hotels, halls)
+        booking_index = engine.get_booking_index(bookings, indexes) if bookings is not None else None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry['catalog_version'] != indexes['version']:
+                entry = None
+        cached_matches = entry['events'] if entry is not None else {}
+        
+        matches_by_event = {}
+        matches = []
+        for event in events:
+            unavailable = engine.unavailable_hotels(event, indexes, booking_index)
+            key = (fingerprint(event), frozenset(unavailable))
+            event_matches = cached_matches.get(key)
+            if event_matches is None:
+                event_matches = list(engine.iter_matches([event], hotels, indexes, booking_index))
+                self.misses += 1
+            else:
+                self.hits += 1
+            matches_by_event[key] = event_matches
+            matches.extend(event_matches)
+        
+        with self._lock:
+            self._entries[user_id] = {'catalog_version': indexes['version'], 'events': matches_by_event}
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        
+        return matches
+    
+    def invalidate(self, user_id=None):
+        """Drop one user's cached matches, or everyone's when user_id is None"""
+        with self._lock:
+            if user_id is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            return 1 if self._entries.pop(user_id, None) is not None else 0
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'users': len(self._entries),
+                'maxUsers': self.max_users
+            }
+
+result_cache = RecommendationCache(max_users=RESULT_CACHE_MAX_USERS)
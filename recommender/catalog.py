@@ -0,0 +1,195 @@
+"""Compact catalog tables.
+
+A CatalogTable keeps a table's rows column by column: all-int and all-float
+columns in typed arrays, repeated strings in a column (hotel ids, cities)
+stored once, and no per-row dict. Row dicts are built on access, so only
+the rows a response needs are ever materialized. It reads like a list of
+row dicts, and the helpers below accept either.
+
+Tables read from a binary snapshot keep their columns in the memory map
+(memoryviews, and MappedStrings for strings) instead of copying them.
+"""
+from array import array
+from collections.abc import Sequence
+
+def compact_values(values):
+    """Store one column's values as compactly as their types allow.
+    
+    Returns (values, missing): an array('q') or array('d') with a bytearray
+    marking the None positions (or None when nothing is missing), or a list
+    when the column is not uniformly int or float.
+    """
+    types = {type(value) for value in values if value is not None}
+    if types == {int} or types == {float}:
+        missing = None
+        if None in values:
+            missing = bytearray(value is None for value in values)
+        try:
+            return array('q' if types == {int} else 'd', (0 if value is None else value for value in values)), missing
+        except OverflowError:
+            pass  # ints beyond 64 bits stay in a list
+    if types == {str}:
+        # Equal strings share one object, like interning but scoped to the column
+        pool = {}
+        return [value if value is None else pool.setdefault(value, value) for value in values], None
+    return list(values), None
+
+class MappedStrings(Sequence):
+    """A string column of a memory-mapped snapshot: one code per row into the
+    snapshot's table of distinct strings (-1 for None), decoded on access"""
+    
+    __slots__ = ('codes', 'offsets', 'data')
+    
+    def __init__(self, codes, offsets, data):
+        self.codes = codes      # int32 memoryview, one per row
+        self.offsets = offsets  # int64 memoryview, string i is data[offsets[i]:offsets[i + 1]]
+        self.data = data        # UTF-8 bytes of every distinct string
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def __getitem__(self, index):
+        code = self.codes[index]
+        if code < 0:
+            return None
+        return str(self.data[self.offsets[code]:self.offsets[code + 1]], 'utf-8')
+    
+    def tolist(self):
+        """Every value, each distinct string decoded once"""
+        decoded = {}
+        values = []
+        for code in self.codes:
+            if code < 0:
+                values.append(None)
+                continue
+            value = decoded.get(code)
+            if value is None:
+                value = decoded[code] = str(self.data[self.offsets[code]:self.offsets[code + 1]], 'utf-8')
+            values.append(value)
+        return values
+
+class CatalogTable(Sequence):
+    """Immutable catalog table stored as compact columns; indexing returns a new row dict"""
+    
+    __slots__ = ('names', 'columns', 'length')
+    
+    def __init__(self, names, columns, length):
+        self.names = names      # column names, in row key order
+        self.columns = columns  # one (values, missing) pair per name, see compact_values
+        self.length = length
+    
+    @classmethod
+    def from_columns(cls, names, values_by_name):
+        """Build a table from {name: list of values}, all lists the same length"""
+        length = len(values_by_name[names[0]]) if names else 0
+        return cls(list(names), [compact_values(values_by_name[name]) for name in names], length)
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a table from row dicts, e.g. a Supabase response"""
+        if isinstance(rows, CatalogTable):
+            return rows
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        return cls.from_columns(names, {name: [row.get(name) for row in rows] for name in names})
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(range(self.length)[index])
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('catalog table index out of range')
+        return {
+            name: None if missing is not None and missing[index] else values[index]
+            for name, (values, missing) in zip(self.names, self.columns)
+        }
+    
+    def __iter__(self):
+        for index in range(self.length):
+            yield self[index]
+    
+    def __repr__(self):
+        return f'<CatalogTable {len(self)} rows: {", ".join(self.names)}>'
+    
+    def __getstate__(self):
+        # Mapped columns are copied out, a memory map can't be pickled
+        columns = [
+            (values, missing) if isinstance(values, (list, array)) else compact_values(self.column(name))
+            for name, (values, missing) in zip(self.names, self.columns)
+        ]
+        return self.names, columns, self.length
+    
+    def __setstate__(self, state):
+        self.names, self.columns, self.length = state
+    
+    def column(self, name):
+        """One column's values as a list, None where missing (a row without the column counts as None).
+        
+        The list may be the table's own storage; don't modify it.
+        """
+        if name not in self.names:
+            return [None] * self.length
+        values, missing = self.columns[self.names.index(name)]
+        if isinstance(values, list):
+            return values
+        values = values.tolist()
+        if missing is not None:
+            for index in range(self.length):
+                if missing[index]:
+                    values[index] = None
+        return values
+    
+    def take(self, positions):
+        """New table of the rows at positions, in that order"""
+        positions = list(positions)
+        return CatalogTable.from_columns(self.names, {
+            name: [values[position] for position in positions]
+            for name, values in ((name, self.column(name)) for name in self.names)
+        })
+    
+    def replace_row(self, row_id, record):
+        """replace_row for a table: returns a new table and the list of rows replaced"""
+        ids = self.column('id')
+        position = next((index for index, value in enumerate(ids) if value == row_id), None)
+        replaced = [] if position is None else [self[position]]
+        names = self.names or list(record or {})
+        values_by_name = {}
+        for name in names:
+            values = list(self.column(name))
+            if position is not None:
+                del values[position]
+            if record is not None:
+                values.insert(len(values) if position is None else position, record.get(name))
+            values_by_name[name] = values
+        return CatalogTable.from_columns(names, values_by_name), replaced
+
+def column_values(rows, name):
+    """The values of one column of a table or a list of row dicts, None where missing"""
+    if isinstance(rows, CatalogTable):
+        return rows.column(name)
+    return [row.get(name) for row in rows]
+
+def replace_row(rows, row_id, record):
+    """Copy of rows with the row whose id is row_id replaced by record.
+    
+    A record None deletes the row and an unknown id is appended. Returns
+    the new rows and the list of rows that were replaced.
+    """
+    if isinstance(rows, CatalogTable):
+        return rows.replace_row(row_id, record)
+    for position, row in enumerate(rows):
+        if row['id'] == row_id:
+            return rows[:position] + ([] if record is None else [record]) + rows[position + 1:], [row]
+    return (list(rows) if record is None else rows + [record]), []
+
+def remove_rows(rows, name, value):
+    """Copy of rows without the rows whose column name equals value; returns (kept, removed)"""
+    keep, removed = [], []
+    for position, row_value in enumerate(column_values(rows, name)):
+        (removed if row_value == value else keep).append(position)
+    if isinstance(rows, CatalogTable):
+        return rows.take(keep), [rows[position] for position in removed]
+    return [rows[position] for position in keep], [rows[position] for position in removed]
@@ -0,0 +1,93 @@
+"""Environment configuration shared by the Flask service and the Vercel function.
+
+Read once at import time; the entry points load any .env file before
+importing the package.
+"""
+import os
+
+# Supabase configuration (the Vercel function is configured through the VITE_ names
+# the frontend build uses)
+SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_KEY') or os.getenv('VITE_SUPABASE_PUBLISHABLE_KEY')
+
+# Scoring backend: 'python' (per-hall scoring) or 'numpy' (vectorized batch scoring)
+SCORING_BACKEND = os.getenv('SCORING_BACKEND', 'python')
+
+# Scoring weights as 'location=0.4,capacity=0.3,budget=0.2,event_type=0.1' (weights left
+# out keep those defaults) and the minimum score a match needs. Compiled into the
+# engine's scoring plan (engine.ScoringPlan) once at startup.
+SCORING_WEIGHTS = os.getenv('SCORING_WEIGHTS', '')
+MIN_MATCH_SCORE = float(os.getenv('MIN_MATCH_SCORE', 40))
+
+# HTTP client configuration
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 10))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+# Requests one process serves at once (e.g. gunicorn --threads); the Supabase fetch
+# threads and kept connections are sized so that many requests fetch without queueing
+REQUEST_CONCURRENCY = int(os.getenv('REQUEST_CONCURRENCY', 8))
+
+# Only the columns the engine scores on and the frontend renders
+EVENT_COLUMNS = 'id,event_name,event_type,event_date,guest_count,budget,location,status'
+HOTEL_COLUMNS = 'id,name,city,address,description,image_url'
+HALL_COLUMNS = 'id,hotel_id,name,capacity,price_per_event'
+
+# Fetch only the halls that can match the user's events instead of the cached
+# full table (saves the download when the catalog cache is cold or disabled)
+HALL_FILTER_PUSHDOWN = os.getenv('HALL_FILTER_PUSHDOWN', 'false').lower() in ('1', 'true', 'yes')
+
+# Drop hotels that are booked out on an event's date before scoring. Bookings are
+# accepted invites, each taking one of the hotel's halls (invites don't name the hall)
+# on the invited event's date. Reading them needs a key the invites RLS policies let
+# through, e.g. the service role key; with the anon key they return no rows, hence off
+# by default.
+AVAILABILITY_FILTER = os.getenv('AVAILABILITY_FILTER', 'false').lower() in ('1', 'true', 'yes')
+BOOKING_COLUMNS = 'hotel_id,event_id,events(event_date)'
+
+# Auth configuration: verified tokens are cached for up to AUTH_CACHE_TTL seconds.
+# With SUPABASE_JWT_SECRET set, access tokens are verified locally (HS256) instead of
+# calling /auth/v1/user.
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_CACHE_MAX_ENTRIES', 10000))
+
+# Per-user result cache size (users kept, least recently used evicted first)
+RESULT_CACHE_MAX_USERS = int(os.getenv('RESULT_CACHE_MAX_USERS', 1000))
+
+# Catalog cache configuration (on Vercel the cache lives as long as the warm instance)
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', 300))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 8))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# Optional prebuilt catalog snapshot (snapshot.py) loaded at import, so a cold
+# instance starts with the catalog and its indexes instead of downloading them.
+# Relative paths are resolved against the repository root.
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH')
+
+# Binary catalog snapshot (a .bin path) shared by the worker processes on one host:
+# each worker memory-maps it, and a stale catalog is downloaded by one worker and
+# swapped in for all of them
+SHARED_CATALOG_PATH = os.getenv('SHARED_CATALOG_PATH')
+
+# Column used to detect changes once a cached table's TTL runs out. Each is kept
+# current on UPDATE by a trigger (hotel_halls.updated_at since migration
+# 20261017000000). The open events organizers are matched against, and the
+# bookings, are cached the same way.
+CATALOG_VERSION_COLUMNS = {
+    'hotels': 'updated_at',
+    'hotel_halls': 'updated_at',
+    'events': 'updated_at',
+    'invites': 'updated_at'
+}
+
+# Batch scoring (POST /api/admin/recommendations/batch and batch.py): worker
+# processes, events handed to a worker at a time, and batch runs the endpoint
+# serves at once (each starts its own BATCH_WORKERS processes)
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS') or os.cpu_count() or 1)
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 50))
+BATCH_MAX_RUNS = int(os.getenv('BATCH_MAX_RUNS', 1))
+
+# Logging: LOG_LEVEL=DEBUG logs every Supabase query. The one-line summary of a
+# recommendations request is logged at INFO for a LOG_SAMPLE_RATE fraction of requests
+# (Flask service); errors are always logged.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 0.1))
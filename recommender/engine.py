@@ -0,0 +1,1312 @@
+"""The venue recommendation engine.
+
+Pure Python with no third-party imports, so it loads quickly on its own.
+"""
+import bisect
+import functools
+import hashlib
+import heapq
+import json
+import math
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+from .catalog import CatalogTable, column_values, remove_rows, replace_row
+
+def fingerprint(value):
+    """Stable content hash of a JSON-serializable value"""
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+def catalog_row_hash(table, row):
+    """Hash of one catalog row; the catalog version is the sum of these,
+    so it can be updated one row change at a time"""
+    return int(fingerprint([table, row]), 16)
+
+def catalog_version(row_hashes):
+    return format(row_hashes % (1 << 160), '040x')
+
+# Types the engine can index and score for the catalog columns it reads (None is
+# allowed too, except for id); bool is rejected although it is an int
+CATALOG_COLUMN_TYPES = {
+    'id': (str, int),
+    'hotel_id': (str, int),
+    'capacity': (int, float),
+    'price_per_event': (int, float),
+    'name': (str,),
+    'city': (str,),
+    'address': (str,),
+    'description': (str,),
+    'image_url': (str,)
+}
+
+def check_catalog_change(table, change_type, record=None, old_record=None):
+    """Validate one row change for apply_catalog_change; returns the changed row's id.
+    
+    Raises ValueError for anything apply_catalog_change could not apply, so
+    nothing is patched for a change that would fail halfway.
+    """
+    if table not in ('hotels', 'hotel_halls') or change_type not in ('INSERT', 'UPDATE', 'DELETE'):
+        raise ValueError(f'Unsupported catalog change: {change_type} on {table}')
+    rows = (old_record,) if change_type == 'DELETE' else (record, old_record)
+    for row in rows:
+        if row is not None and not isinstance(row, dict):
+            raise ValueError(f'{change_type} on {table}: rows must be objects, got {type(row).__name__}')
+    row_id = ((record if change_type != 'DELETE' else None) or old_record or {}).get('id')
+    if row_id is None:
+        raise ValueError(f'{change_type} on {table} has no row id')
+    for row in rows:
+        for column, value in (row or {}).items():
+            types = CATALOG_COLUMN_TYPES.get(column)
+            if types is not None and value is not None and (isinstance(value, bool) or not isinstance(value, types)):
+                raise ValueError(f'{change_type} on {table}: {column} must be '
+                                 f'{" or ".join(t.__name__ for t in types)}, got {value!r}')
+    return row_id
+
+# Distinct hall rows whose hashes are remembered (see hall_row_hashes)
+ROW_HASH_MEMO_SIZE = 1 << 17
+
+class Memo(dict):
+    """dict that fills in a missing key with fn(key), so a hit is a plain lookup"""
+    
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+    
+    def __missing__(self, key):
+        value = self[key] = self.fn(key)
+        return value
+
+def cached_row(rows, position, built):
+    """rows[position], built once per position so matches share one row dict"""
+    row = built.get(position)
+    if row is None:
+        row = built[position] = rows[position]
+    return row
+
+# Common stop words ignored when matching event and hotel keywords
+STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+def extract_keywords(text):
+    """Lowercase word tokens of text, minus stop words"""
+    return set(re.findall(r'\w+', text.lower())) - STOP_WORDS
+
+@functools.lru_cache(maxsize=4096)
+def event_keywords(event_type, event_name):
+    """Keywords of an event's type and name, tokenized once per distinct pair across
+    requests, queries and engines"""
+    return frozenset(extract_keywords(f"{event_type} {event_name}"))
+
+def keyword_match_score(event_keywords, text, common_count):
+    """calculate_event_type_score from the event's keywords, the hotel's lowercased
+    description (None without one) and the number of keywords they have in common"""
+    if text is None:
+        return 50  # Neutral score if no description
+    if common_count:
+        return min(100, 60 + common_count / len(event_keywords) * 40)
+    # Check for semantic similarity using simple word containment
+    similarity_count = sum(1 for word in event_keywords if word in text)
+    if similarity_count > 0:
+        return min(100, 50 + (similarity_count / len(event_keywords)) * 30)
+    return 40
+
+class HotelKeywordIndex:
+    """Hotel description keywords, tokenized once per catalog load.
+    
+    Keeps an inverted index from keyword to hotel ids so event type scoring
+    is a lookup per event keyword instead of a tokenization per hall.
+    """
+    
+    def __init__(self, hotels):
+        self.texts = {}              # hotel id -> lowercased description (None scores neutral)
+        self.hotels_by_keyword = {}  # keyword -> set of hotel ids
+        for hotel in hotels:
+            self.add_hotel(hotel)
+    
+    def hotel_text(self, hotel):
+        description = hotel.get('description', '')
+        if description:
+            try:
+                return description.lower()
+            except AttributeError:
+                return None
+        return None
+    
+    def add_hotel(self, hotel):
+        text = self.hotel_text(hotel)
+        self.texts[hotel['id']] = text
+        if text is not None:
+            for keyword in extract_keywords(text):
+                self.hotels_by_keyword.setdefault(keyword, set()).add(hotel['id'])
+    
+    def copy(self):
+        """Shallow copy that replace_hotel can change without touching this index"""
+        clone = HotelKeywordIndex([])
+        clone.texts = dict(self.texts)
+        clone.hotels_by_keyword = dict(self.hotels_by_keyword)
+        return clone
+    
+    def replace_hotel(self, hotel_id, hotel):
+        """Re-index one hotel, or drop it when hotel is None.
+        
+        Keyword sets are replaced rather than modified, since they are shared
+        with the index this one was copied from.
+        """
+        old_text = self.texts.pop(hotel_id, None)
+        if old_text is not None:
+            for keyword in extract_keywords(old_text):
+                remaining = self.hotels_by_keyword[keyword] - {hotel_id}
+                if remaining:
+                    self.hotels_by_keyword[keyword] = remaining
+                else:
+                    del self.hotels_by_keyword[keyword]
+        if hotel is not None:
+            text = self.hotel_text(hotel)
+            self.texts[hotel_id] = text
+            if text is not None:
+                for keyword in extract_keywords(text):
+                    self.hotels_by_keyword[keyword] = self.hotels_by_keyword.get(keyword, set()) | {hotel_id}
+    
+    def event_type_scores(self, event_keywords):
+        """calculate_event_type_score for every indexed hotel, keyed by hotel id
+        (keyword_match_score, inlined: this runs for every hotel)"""
+        common_counts = {}
+        for keyword in event_keywords:
+            for hotel_id in self.hotels_by_keyword.get(keyword, ()):
+                common_counts[hotel_id] = common_counts.get(hotel_id, 0) + 1
+        
+        scores = {}
+        for hotel_id, text in self.texts.items():
+            if text is None:
+                scores[hotel_id] = 50  # Neutral score if no description
+            elif hotel_id in common_counts:
+                scores[hotel_id] = min(100, 60 + common_counts[hotel_id] / len(event_keywords) * 40)
+            else:
+                # Check for semantic similarity using simple word containment
+                similarity_count = sum(1 for word in event_keywords if word in text)
+                if similarity_count > 0:
+                    scores[hotel_id] = min(100, 50 + (similarity_count / len(event_keywords)) * 30)
+                else:
+                    scores[hotel_id] = 40
+        return scores
+
+class ScoringPlan:
+    """The scoring weights and the minimum match score, with the constants the
+    engine derives from them worked out once.
+    
+    An engine is built with one plan and keeps it; a different configuration
+    means a different engine. The defaults are the original weights and the
+    40-point threshold.
+    """
+    
+    FIELDS = ('location', 'capacity', 'budget', 'event_type', 'min_score')
+    
+    def __init__(self, location=0.40, capacity=0.30, budget=0.20, event_type=0.10, min_score=40):
+        values = dict(zip(self.FIELDS, (location, capacity, budget, event_type, min_score)))
+        for name, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value < float('inf'):
+                raise ValueError(f'Scoring plan {name} must be a non-negative number, got {value!r}')
+        if min_score > 100:
+            raise ValueError(f'Scoring plan min_score must be at most 100, got {min_score!r}')
+        
+        self.location_weight = location
+        self.capacity_weight = capacity
+        self.budget_weight = budget
+        self.event_type_weight = event_type
+        self.min_score = min_score
+        # Slack below the threshold covers round(..., 2) and float error when pruning
+        self.threshold = min_score - 0.01
+        # Hotel-level slots score a neutral 50 for capacity and budget
+        self.hotel_level_rest = 50 * capacity + 50 * budget
+        # Minimum scores a reverse query with a limit searches at first, highest first
+        self.reverse_min_scores = tuple(score for score in (95, 85, 70, 55) if score > min_score)
+        self.version = fingerprint({name: float(value) for name, value in values.items()})[:12]
+    
+    @classmethod
+    def parse(cls, spec, **defaults):
+        """Plan from a spec like 'location=0.5,budget=0.1,min_score=45'. Fields left out
+        keep the defaults passed in, or the class defaults."""
+        values = dict(defaults)
+        for part in filter(None, (part.strip() for part in (spec or '').split(','))):
+            name, _, value = part.partition('=')
+            name = name.strip()
+            if name not in cls.FIELDS:
+                raise ValueError(f'Unknown scoring plan field {name!r} (expected one of {", ".join(cls.FIELDS)})')
+            try:
+                values[name] = float(value)
+            except ValueError:
+                raise ValueError(f'Scoring plan {name} must be a number, got {value.strip()!r}') from None
+        return cls(**values)
+    
+    def as_dict(self):
+        return {
+            'location': self.location_weight,
+            'capacity': self.capacity_weight,
+            'budget': self.budget_weight,
+            'event_type': self.event_type_weight,
+            'min_score': self.min_score,
+            'version': self.version
+        }
+    
+    def __repr__(self):
+        return f"ScoringPlan({', '.join(f'{name}={value!r}' for name, value in self.as_dict().items() if name != 'version')})"
+
+class VenueRecommendationEngine:
+    def __init__(self, prefilter=True, plan=None, catalog_slots=1):
+        self.prefilter = prefilter
+        self.plan = plan or ScoringPlan()
+        self.location_weight = self.plan.location_weight
+        self.capacity_weight = self.plan.capacity_weight
+        self.budget_weight = self.plan.budget_weight
+        self.event_type_weight = self.plan.event_type_weight
+        # Catalogs whose indexes are kept: more than one when hall lists are fetched per
+        # request (HALL_FILTER_PUSHDOWN), so they don't evict the cached catalog's
+        self.catalog_slots = catalog_slots
+        self._hotel_indexes = None
+        self._hall_row_hashes = {}  # hall row contents -> catalog_row_hash
+        self._catalog_indexes = OrderedDict()  # (id(hotels), id(halls)) -> (hotels, halls, indexes)
+        self._catalog_indexes_lock = threading.Lock()
+        self._event_indexes = None
+        self._booking_index = None
+        self._reasons = {}  # score bands and quoted values -> reasons list, see generate_reasons
+    
+    def normalize_location(self, location):
+        """Normalize location string for better matching"""
+        return str(location).lower().strip()
+    
+    def calculate_location_score(self, event_location, hotel_city):
+        """Calculate location match score using string similarity"""
+        event_loc = self.normalize_location(event_location)
+        hotel_loc = self.normalize_location(hotel_city)
+        
+        # Exact match
+        if event_loc == hotel_loc:
+            return 100
+        
+        # Partial match
+        if event_loc in hotel_loc or hotel_loc in event_loc:
+            return 50
+        
+        # Check for common cities/regions
+        common_words = set(event_loc.split()) & set(hotel_loc.split())
+        if common_words:
+            return 30
+        
+        return 0
+    
+    def calculate_capacity_score(self, event_guests, hall_capacity):
+        """Calculate how well the hall capacity matches guest count"""
+        if hall_capacity is None:
+            return 25  # Some score for halls without specified capacity
+        
+        # Perfect fit (capacity is 100-120% of guest count)
+        ratio = hall_capacity / event_guests
+        
+        if 1.0 <= ratio <= 1.2:
+            return 100
+        elif 0.8 <= ratio < 1.0:
+            # Slightly small
+            return 70
+        elif 1.2 < ratio <= 1.5:
+            # Slightly large but acceptable
+            return 85
+        elif ratio > 1.5:
+            # Too large
+            return max(50 - (ratio - 1.5) * 10, 20)
+        else:
+            # Too small
+            return max(30 - (1.0 - ratio) * 50, 0)
+    
+    def calculate_budget_score(self, event_budget, hall_price):
+        """Calculate budget compatibility score"""
+        if event_budget is None or hall_price is None:
+            return 50  # Neutral score if budget info missing
+        
+        price_ratio = hall_price / event_budget
+        
+        if price_ratio <= 0.7:
+            # Excellent value
+            return 100
+        elif price_ratio <= 0.85:
+            # Good value
+            return 90
+        elif price_ratio <= 1.0:
+            # Within budget
+            return 80
+        elif price_ratio <= 1.15:
+            # Slightly over budget
+            return 50
+        elif price_ratio <= 1.3:
+            # Moderately over budget
+            return 30
+        else:
+            # Way over budget
+            return 10
+    
+    def calculate_event_type_score(self, event_type, event_name, hotel_description):
+        """Calculate event type matching using keyword analysis"""
+        if not hotel_description:
+            return 50  # Neutral score if no description
+        
+        try:
+            # Combine event info
+            event_text = f"{event_type} {event_name}".lower()
+            hotel_text = hotel_description.lower()
+            
+            # Extract keywords, minus common stop words
+            event_keywords = extract_keywords(event_text)
+            hotel_keywords = extract_keywords(hotel_text)
+            
+            # Find matches
+            common_keywords = event_keywords & hotel_keywords
+            
+            if len(common_keywords) > 0:
+                # Calculate match ratio
+                match_ratio = len(common_keywords) / len(event_keywords) if event_keywords else 0
+                return min(100, 60 + match_ratio * 40)
+            
+            # Check for semantic similarity using simple word containment
+            similarity_count = sum(1 for word in event_keywords if word in hotel_text)
+            if similarity_count > 0:
+                return min(100, 50 + (similarity_count / len(event_keywords)) * 30)
+            
+            return 40
+        except:
+            return 50
+    
+    def calculate_overall_score(self, scores):
+        """Calculate weighted overall match score"""
+        overall = (
+            scores['location'] * self.location_weight +
+            scores['capacity'] * self.capacity_weight +
+            scores['budget'] * self.budget_weight +
+            scores['event_type'] * self.event_type_weight
+        )
+        return round(overall, 2)
+    
+    def generate_reasons(self, scores, event, hotel, hall):
+        """Generate human-readable reasons for the match.
+        
+        Matches with the same reasons share one list (don't modify it): the
+        reasons are looked up by which band each score falls in, plus the
+        values the messages quote, and only built on a miss.
+        """
+        location, capacity, budget, event_type = (
+            scores['location'], scores['capacity'], scores['budget'], scores['event_type'])
+        hall_capacity = hall.get('capacity') if hall else None
+        key = (
+            0 if location >= 90 else 1 if location >= 50 else 2 if location >= 30 else 3,
+            3 if not hall_capacity else 0 if capacity >= 90 else 1 if capacity >= 70 else 2 if capacity >= 50 else 3,
+            0 if budget >= 90 else 1 if budget >= 80 else 2 if budget >= 50 else 3,
+            0 if event_type >= 70 else 1 if event_type >= 60 else 2
+        )
+        # The values quoted by the capacity and event type messages, as they are formatted
+        key += (
+            f"{event['guest_count']}" if key[1] < 2 else f"{hall_capacity}" if key[1] == 2 else None,
+            f"{event['event_type']}" if key[3] < 2 else None
+        )
+        reasons = self._reasons.get(key)
+        if reasons is None:
+            if len(self._reasons) >= 4096:
+                self._reasons.clear()
+            reasons = self._reasons[key] = self.build_reasons(*key)
+        return reasons
+    
+    def build_reasons(self, location_band, capacity_band, budget_band, event_type_band, count, event_type):
+        """The reasons for one combination of score bands (see generate_reasons)"""
+        reasons = []
+        
+        # Location
+        if location_band == 0:
+            reasons.append("Perfect location match")
+        elif location_band == 1:
+            reasons.append("Nearby location")
+        elif location_band == 2:
+            reasons.append("In the same region")
+        
+        # Capacity
+        if capacity_band == 0:
+            reasons.append(f"Ideal hall capacity for {count} guests")
+        elif capacity_band == 1:
+            reasons.append(f"Hall can accommodate {count} guests")
+        elif capacity_band == 2:
+            reasons.append(f"Hall available (capacity: {count})")
+        
+        # Budget
+        if budget_band == 0:
+            reasons.append("Excellent value - Great savings!")
+        elif budget_band == 1:
+            reasons.append("Within your budget")
+        elif budget_band == 2:
+            reasons.append("Slightly above budget")
+        
+        # Event Type
+        if event_type_band == 0:
+            reasons.append(f"Perfect for {event_type} events")
+        elif event_type_band == 1:
+            reasons.append(f"Suitable for {event_type}")
+        
+        return reasons
+    
+    def group_halls_by_hotel(self, halls):
+        """Index hall positions by hotel id so each hotel's halls are a single lookup"""
+        halls_by_hotel = {}
+        for position, hotel_id in enumerate(column_values(halls, 'hotel_id')):
+            halls_by_hotel.setdefault(hotel_id, []).append(position)
+        return halls_by_hotel
+    
+    def build_hotel_indexes(self, hotels):
+        """Build the indexes that only depend on the hotels: their row hashes and keywords"""
+        return {
+            'row_hashes': sum(catalog_row_hash('hotels', hotel) for hotel in hotels),
+            'keywords': HotelKeywordIndex(hotels)
+        }
+    
+    def get_hotel_indexes(self, hotels):
+        """Return the hotel indexes, rebuilding them only when different hotels are passed in.
+        
+        Cached apart from the hall layout, so a new halls list (as fetched per
+        request with HALL_FILTER_PUSHDOWN) doesn't re-tokenize the hotels.
+        """
+        cached = self._hotel_indexes
+        if cached is None or cached[0] is not hotels:
+            cached = (hotels, self.build_hotel_indexes(hotels))
+            self._hotel_indexes = cached
+        return cached[1]
+    
+    def hall_row_hashes(self, halls):
+        """Sum of the halls' row hashes. Each distinct row is hashed once: the hall lists
+        HALL_FILTER_PUSHDOWN fetches per request, and reloads, mostly repeat the same rows."""
+        memo = self._hall_row_hashes
+        if len(memo) > ROW_HASH_MEMO_SIZE:
+            memo.clear()
+        if isinstance(halls, CatalogTable):
+            names = tuple(halls.names)
+            keys = ((names, values) for values in zip(*(halls.column(name) for name in names)))
+        else:
+            keys = ((tuple(hall), tuple(hall.values())) for hall in halls)
+        
+        total = 0
+        for key in keys:
+            try:
+                row_hash = memo.get(key)
+            except TypeError:  # a list or dict value, e.g. with select=*
+                total += catalog_row_hash('hotel_halls', dict(zip(*key)))
+                continue
+            if row_hash is None:
+                row_hash = memo[key] = catalog_row_hash('hotel_halls', dict(zip(*key)))
+            total += row_hash
+        return total
+    
+    def build_catalog_indexes(self, hotels, halls):
+        """Build the indexes reused for every event scored against this catalog"""
+        return self.combine_catalog_indexes(hotels, halls, self.get_hotel_indexes(hotels), self.hall_row_hashes(halls))
+    
+    def combine_catalog_indexes(self, hotels, halls, hotel_indexes, hall_row_hashes):
+        row_hashes = hotel_indexes['row_hashes'] + hall_row_hashes
+        indexes = {
+            'hotels': hotel_indexes,
+            'hall_row_hashes': hall_row_hashes,
+            'row_hashes': row_hashes,
+            'version': catalog_version(row_hashes),
+            'keywords': hotel_indexes['keywords']
+        }
+        indexes.update(self.build_catalog_layout(hotels, halls))
+        return indexes
+    
+    def build_catalog_layout(self, hotels, halls):
+        """Build the position-based indexes.
+        
+        Hotels and halls are referred to by their position in the catalog
+        tables, and only the hall fields scored on are copied, into typed
+        arrays. No tokenization happens here, so this is cheap enough to
+        redo after every row change.
+        """
+        hotel_ids = column_values(hotels, 'id')
+        halls_by_hotel = self.group_halls_by_hotel(halls)
+        
+        # One slot per hall, plus a hotel-level slot (hall position -1) for each hotel
+        # without halls, in the order recommendations are generated
+        slot_hotels, slot_halls = [], []
+        slots_by_hotel = []
+        for hotel_index, hotel_id in enumerate(hotel_ids):
+            hall_positions = halls_by_hotel.get(hotel_id) or [-1]
+            slots_by_hotel.append(range(len(slot_halls), len(slot_halls) + len(hall_positions)))
+            slot_hotels.extend([hotel_index] * len(hall_positions))
+            slot_halls.extend(hall_positions)
+        
+        # Capacity and price per slot, NaN where the hall has none (or there is no hall)
+        capacities = column_values(halls, 'capacity')
+        prices = column_values(halls, 'price_per_event')
+        slot_capacity = array('d', (math.nan if hall < 0 or capacities[hall] is None else capacities[hall]
+                                    for hall in slot_halls))
+        slot_price = array('d', (math.nan if hall < 0 or prices[hall] is None else prices[hall]
+                                 for hall in slot_halls))
+        
+        hotels_by_city = {}
+        for hotel_index, city in enumerate(column_values(hotels, 'city')):
+            hotels_by_city.setdefault(self.normalize_location(city), []).append(hotel_index)
+        
+        # Halls sorted by capacity, so halls in a capacity range are found by bisection
+        sized = sorted(
+            (capacity, position) for position, capacity in enumerate(slot_capacity)
+            if capacity == capacity
+        )
+        
+        return {
+            'hotel_ids': hotel_ids,
+            'halls': halls,
+            'slot_hotels': array('q', slot_hotels),
+            'slot_halls': array('q', slot_halls),
+            'slot_capacity': slot_capacity,
+            'slot_price': slot_price,
+            'slots_by_hotel': slots_by_hotel,
+            'hotels_by_city': hotels_by_city,
+            'capacities': array('d', (capacity for capacity, _ in sized)),
+            'capacity_positions': array('q', (position for _, position in sized)),
+            'unsized_positions': array('q', (
+                position for position, hall in enumerate(slot_halls)
+                if hall >= 0 and slot_capacity[position] != slot_capacity[position]
+            ))
+        }
+    
+    def cached_catalog_indexes(self, hotels, halls):
+        """The indexes kept for these exact hotels and halls lists, or None"""
+        with self._catalog_indexes_lock:
+            cached = self._catalog_indexes.get((id(hotels), id(halls)))
+            if cached is None:
+                return None
+            self._catalog_indexes.move_to_end((id(hotels), id(halls)))
+            return cached[2]
+    
+    def store_catalog_indexes(self, hotels, halls, indexes, replaces=None):
+        """Keep the indexes for these lists, evicting the least recently used catalog
+        beyond catalog_slots, catalogs of other hotels lists (reloaded or changed
+        hotels) and the catalog replaces=(hotels, halls) patched into this one"""
+        with self._catalog_indexes_lock:
+            entries = self._catalog_indexes
+            if replaces is not None:
+                entries.pop((id(replaces[0]), id(replaces[1])), None)
+            for key, (cached_hotels, _, _) in list(entries.items()):
+                if cached_hotels is not hotels:
+                    del entries[key]
+            # The entry holds on to both lists, so their ids are not reused while it is kept
+            entries[(id(hotels), id(halls))] = (hotels, halls, indexes)
+            entries.move_to_end((id(hotels), id(halls)))
+            while len(entries) > self.catalog_slots:
+                entries.popitem(last=False)
+    
+    def get_catalog_indexes(self, hotels, halls):
+        """Return the catalog indexes, rebuilding them only when a different catalog
+        is passed in (the catalog cache hands out the same lists until it reloads).
+        
+        The last catalog_slots catalogs used are kept.
+        """
+        indexes = self.cached_catalog_indexes(hotels, halls)
+        if indexes is None:
+            indexes = self.build_catalog_indexes(hotels, halls)
+            self.store_catalog_indexes(hotels, halls, indexes)
+        return indexes
+    
+    def apply_catalog_change(self, hotels, halls, table, change_type, record=None, old_record=None):
+        """Apply one INSERT, UPDATE or DELETE on hotels or hotel_halls to a loaded catalog.
+        
+        Returns the new (hotels, halls) lists; the lists passed in are left as
+        they were for requests still scoring against them. When their indexes
+        are cached, the indexes are patched rather than rebuilt: only the
+        changed hotel is re-tokenized and only the changed rows are rehashed;
+        the positional layout is rebuilt. The catalog version changes with the
+        content, which retires the cached results scored against the old
+        catalog.
+        """
+        row_id = check_catalog_change(table, change_type, record, old_record)
+        if change_type == 'DELETE':
+            record = None
+        
+        if table == 'hotels':
+            new_hotels, replaced = replace_row(hotels, row_id, record)
+            removed = [('hotels', row) for row in replaced]
+            new_halls = halls
+            if record is None:
+                # Deleting a hotel cascades to its halls
+                new_halls, removed_halls = remove_rows(halls, 'hotel_id', row_id)
+                removed += [('hotel_halls', hall) for hall in removed_halls]
+        else:
+            new_hotels = hotels
+            new_halls, replaced = replace_row(halls, row_id, record)
+            removed = [('hotel_halls', row) for row in replaced]
+        
+        indexes = self.cached_catalog_indexes(hotels, halls)
+        if indexes is None:
+            return new_hotels, new_halls  # nothing to patch, built on first use
+        
+        row_hashes = {'hotels': indexes['hotels']['row_hashes'], 'hotel_halls': indexes['hall_row_hashes']}
+        for name, row in removed:
+            row_hashes[name] -= catalog_row_hash(name, row)
+        if record is not None:
+            row_hashes[table] += catalog_row_hash(table, record)
+        
+        hotel_indexes = indexes['hotels']
+        if table == 'hotels':
+            keywords = hotel_indexes['keywords'].copy()
+            keywords.replace_hotel(row_id, record)
+            hotel_indexes = {'row_hashes': row_hashes['hotels'], 'keywords': keywords}
+            self._hotel_indexes = (new_hotels, hotel_indexes)
+        
+        self.store_catalog_indexes(new_hotels, new_halls, self.combine_catalog_indexes(
+            new_hotels, new_halls, hotel_indexes, row_hashes['hotel_halls']), replaces=(hotels, halls))
+        return new_hotels, new_halls
+    
+    def build_booking_index(self, bookings, indexes):
+        """Index bookings (accepted invites, with their event's date embedded) by
+        date and by hotel, for the hotels in the catalog indexes.
+        
+        Both maps hold the ids of the events booked at a hotel on a date:
+        by_date is {event_date: {hotel_index: event ids}} and by_hotel is
+        {hotel_index: {event_date: event ids}}.
+        """
+        hotel_positions = {hotel_id: hotel_index for hotel_index, hotel_id in enumerate(indexes['hotel_ids'])}
+        by_date, by_hotel = {}, {}
+        for hotel_id, event_id, event in zip(column_values(bookings, 'hotel_id'), column_values(bookings, 'event_id'),
+                                             column_values(bookings, 'events')):
+            hotel_index = hotel_positions.get(hotel_id)
+            event_date = event.get('event_date') if isinstance(event, dict) else None
+            if hotel_index is None or event_date is None:
+                continue
+            event_ids = by_date.setdefault(event_date, {}).setdefault(hotel_index, set())
+            event_ids.add(event_id)
+            by_hotel.setdefault(hotel_index, {})[event_date] = event_ids
+        
+        return {
+            'by_date': by_date,
+            'by_hotel': by_hotel,
+            'version': fingerprint(sorted(
+                [event_date, indexes['hotel_ids'][hotel_index], sorted(event_ids, key=str)]
+                for event_date, hotels_booked in by_date.items() for hotel_index, event_ids in hotels_booked.items()
+            ))
+        }
+    
+    def get_booking_index(self, bookings, indexes):
+        """Return the booking index, rebuilding it only when different bookings or hotels are passed in
+        (it only refers to hotels, so a new halls list keeps it)"""
+        cached = self._booking_index
+        if cached is None or cached[0] is not bookings or cached[1] is not indexes['hotels']:
+            cached = (bookings, indexes['hotels'], self.build_booking_index(bookings, indexes))
+            self._booking_index = cached
+        return cached[2]
+    
+    def is_booked_out(self, event_ids, event_id, hotel_index, indexes):
+        """Whether other events' bookings on one date (event_ids) take every hall of the
+        hotel (a hotel without halls takes one booking). The event's own booking doesn't count."""
+        booked = len(event_ids) - (event_id in event_ids)
+        return booked >= len(indexes['slots_by_hotel'][hotel_index])
+    
+    def unavailable_hotels(self, event, indexes, booking_index):
+        """Hotel indexes booked out on the event's date"""
+        if booking_index is None:
+            return ()
+        hotels_booked = booking_index['by_date'].get(event.get('event_date'))
+        if not hotels_booked:
+            return ()
+        return {
+            hotel_index for hotel_index, event_ids in hotels_booked.items()
+            if self.is_booked_out(event_ids, event.get('id'), hotel_index, indexes)
+        }
+    
+    def scoring_version(self, hotels, halls, bookings=None):
+        """Version of what recommendations are scored with and against: the scoring plan,
+        the catalog, and the bookings when given"""
+        indexes = self.get_catalog_indexes(hotels, halls)
+        if bookings is None:
+            return f"{self.plan.version}:{indexes['version']}"
+        return f"{self.plan.version}:{indexes['version']}:{self.get_booking_index(bookings, indexes)['version']}"
+    
+    def score_event_types(self, event, keyword_index):
+        """Event type score against every hotel, keyed by hotel id"""
+        return keyword_index.event_type_scores(event_keywords(event['event_type'], event['event_name']))
+    
+    def score_locations(self, event, indexes):
+        """Location score against every hotel, as a list aligned with the hotels.
+        
+        The score only depends on the normalized city, so it is computed once per city.
+        """
+        location_by_hotel = [0] * len(indexes['slots_by_hotel'])
+        for city, hotel_indexes in indexes['hotels_by_city'].items():
+            location = self.calculate_location_score(event['location'], city)
+            for hotel_index in hotel_indexes:
+                location_by_hotel[hotel_index] = location
+        return location_by_hotel
+    
+    def capacity_ratio_range(self, min_score):
+        """Range of capacity/guests ratios whose capacity score can reach min_score.
+        
+        The capacity score rises up to the 1.0-1.2 band and falls after it, so
+        the ratios that reach any given score form a single range.
+        """
+        if min_score > 100:
+            return None
+        
+        if min_score > 70:
+            low = 1.0
+        elif min_score > 20:
+            low = 0.8
+        else:
+            low = 1.0 - (30 - min_score) / 50
+        
+        if min_score > 85:
+            high = 1.2
+        elif min_score > 50:
+            high = 1.5
+        elif min_score > 20:
+            high = 1.5 + (50 - min_score) / 10
+        else:
+            high = float('inf')
+        
+        return low, high
+    
+    def candidate_positions(self, event, location_by_hotel, indexes):
+        """Slot positions that can still clear the threshold, in generation order.
+        
+        A slot's overall score is at most its location score plus a capacity
+        score, a best-case budget score (100, or exactly 50 without an event
+        budget) and an event type score of 100. Slots whose capacity score cannot
+        make up the difference are skipped without being scored, so the result
+        set is the same as scoring every slot.
+        """
+        all_positions = range(len(indexes['slot_hotels']))
+        guests = event['guest_count']
+        # Zero guests/budget raise in the scalar functions; don't prune those away
+        if self.capacity_weight <= 0 or not guests or guests < 0 or event.get('budget') == 0:
+            return all_positions
+        
+        threshold = self.plan.threshold
+        best_budget = 50 if event.get('budget') is None else 100
+        
+        hotels_by_location = {}
+        for hotel_index, location in enumerate(location_by_hotel):
+            hotels_by_location.setdefault(location, []).append(hotel_index)
+        
+        positions = []
+        for location, hotel_indexes in hotels_by_location.items():
+            best_rest = location * self.location_weight + 100 * self.event_type_weight
+            min_capacity_score = (threshold - best_rest - best_budget * self.budget_weight) / self.capacity_weight
+            
+            if min_capacity_score <= 0:
+                for hotel_index in hotel_indexes:
+                    positions.extend(indexes['slots_by_hotel'][hotel_index])
+                continue
+            
+            if best_rest + self.plan.hotel_level_rest >= threshold:
+                positions.extend(
+                    position for hotel_index in hotel_indexes
+                    for position in indexes['slots_by_hotel'][hotel_index]
+                    if indexes['slot_halls'][position] < 0
+                )
+            
+            # Halls without a capacity score 25
+            if 25 >= min_capacity_score:
+                positions.extend(
+                    position for position in indexes['unsized_positions']
+                    if location_by_hotel[indexes['slot_hotels'][position]] == location
+                )
+            
+            ratio_range = self.capacity_ratio_range(min_capacity_score)
+            if ratio_range is None:
+                continue
+            low = ratio_range[0] * guests * (1 - 1e-9)
+            high = ratio_range[1] * guests * (1 + 1e-9)
+            start = bisect.bisect_left(indexes['capacities'], low)
+            end = bisect.bisect_right(indexes['capacities'], high)
+            positions.extend(
+                position for position in indexes['capacity_positions'][start:end]
+                if location_by_hotel[indexes['slot_hotels'][position]] == location
+            )
+        
+        positions.sort()
+        return positions
+    
+    def hall_fetch_bounds(self, events, hotels):
+        """Which halls can still match one of the events, for filtering hotel_halls server-side.
+        
+        Returns (capacity_low, capacity_high, hotel_ids): a hall can match if its
+        capacity is in the range, or it belongs to one of the hotel ids (hotels
+        with a non-zero location score, where capacity alone decides nothing).
+        capacity_low is None when no capacity qualifies on its own. Returns None
+        when no safe filter exists.
+        
+        Halls at the remaining hotels need the minimum capacity score worked out
+        in candidate_positions for a location score of 0. Those hotels also
+        cannot match at hotel level once their halls are filtered out.
+        """
+        threshold = self.plan.threshold
+        if self.capacity_weight <= 0:
+            return None
+        if self.plan.hotel_level_rest + 100 * self.event_type_weight >= threshold:
+            return None
+        
+        capacity_low, capacity_high = None, None
+        hotels_by_city = {}
+        for hotel_id, city in zip(column_values(hotels, 'id'), column_values(hotels, 'city')):
+            hotels_by_city.setdefault(self.normalize_location(city), []).append(hotel_id)
+        matched_cities = set()
+        
+        for event in events:
+            guests = event.get('guest_count')
+            if not guests or guests < 0 or event.get('budget') == 0:
+                return None
+            
+            best_budget = 50 if event.get('budget') is None else 100
+            min_capacity_score = (threshold - 100 * self.event_type_weight - best_budget * self.budget_weight) / self.capacity_weight
+            # Halls without a capacity score 25, and a capacity range can't keep them
+            if min_capacity_score <= 25:
+                return None
+            
+            ratio_range = self.capacity_ratio_range(min_capacity_score)
+            if ratio_range is not None:
+                low = math.floor(ratio_range[0] * guests * (1 - 1e-9))
+                high = ratio_range[1] * guests * (1 + 1e-9)
+                high = math.ceil(high) if high != float('inf') else high
+                capacity_low = low if capacity_low is None else min(capacity_low, low)
+                capacity_high = high if capacity_high is None else max(capacity_high, high)
+            
+            matched_cities.update(
+                city for city in hotels_by_city
+                if self.calculate_location_score(event['location'], city) > 0
+            )
+        
+        hotel_ids = [hotel_id for city in matched_cities for hotel_id in hotels_by_city[city]]
+        return capacity_low, capacity_high, hotel_ids
+    
+    def hall_fetch_filters(self, events, hotels, max_hotel_ids=100):
+        """PostgREST filters for hotel_halls built from hall_fetch_bounds, or None"""
+        bounds = self.hall_fetch_bounds(events, hotels)
+        if bounds is None:
+            return None
+        
+        capacity_low, capacity_high, hotel_ids = bounds
+        if len(hotel_ids) > max_hotel_ids:
+            return None  # Keep the request URL a sane length
+        
+        clauses = []
+        if capacity_low is not None:
+            clauses.append(f'capacity.gte.{capacity_low}')
+            if capacity_high != float('inf'):
+                clauses[-1] = f'and(capacity.gte.{capacity_low},capacity.lte.{capacity_high})'
+        if hotel_ids:
+            clauses.append(f"hotel_id.in.({','.join(hotel_ids)})")
+        
+        if not clauses:
+            return {'limit': 0}
+        return {'or': f"({','.join(clauses)})"}
+    
+    def iter_matches(self, events, hotels, indexes, booking_index=None):
+        """Yield (overall_score, event, hotel, hall, scores) for every pair that clears the threshold.
+        
+        Scoring reads the layout's arrays; hotel and hall rows are only built
+        for the pairs that clear it. With a booking index, hotels booked out on
+        an event's date are dropped before scoring.
+        
+        Location and event type scores are computed once per (event, hotel) and
+        shared by the hotel's halls. Capacity and budget scores are memoized per
+        event by capacity and price, and calculate_overall_score is inlined:
+        this runs for every candidate slot.
+        """
+        hotel_ids, halls = indexes['hotel_ids'], indexes['halls']
+        slot_hotels, slot_halls = indexes['slot_hotels'], indexes['slot_halls']
+        slot_capacity, slot_price = indexes['slot_capacity'], indexes['slot_price']
+        location_weight, capacity_weight = self.location_weight, self.capacity_weight
+        budget_weight, event_type_weight = self.budget_weight, self.event_type_weight
+        min_score = self.plan.min_score
+        hotel_rows, hall_rows = {}, {}
+        
+        for event in events:
+            # Hotel descriptions are pre-tokenized, so this is one index lookup per event
+            event_type_scores = self.score_event_types(event, indexes['keywords'])
+            event_type_by_hotel = [event_type_scores[hotel_id] for hotel_id in hotel_ids]
+            location_by_hotel = self.score_locations(event, indexes)
+            capacity_scores = Memo(functools.partial(self.calculate_capacity_score, event['guest_count']))
+            budget_scores = Memo(functools.partial(self.calculate_budget_score, event.get('budget')))
+            
+            if self.prefilter:
+                positions = self.candidate_positions(event, location_by_hotel, indexes)
+            else:
+                positions = range(len(slot_hotels))
+            unavailable = self.unavailable_hotels(event, indexes, booking_index)
+            if unavailable:
+                positions = [position for position in positions if slot_hotels[position] not in unavailable]
+            
+            for position in positions:
+                hotel_index, hall_position = slot_hotels[position], slot_halls[position]
+                location, event_type = location_by_hotel[hotel_index], event_type_by_hotel[hotel_index]
+                
+                if hall_position < 0:
+                    # No halls, use hotel-level scoring
+                    capacity_score, budget_score = 50, 50  # Neutral
+                else:
+                    capacity, price = slot_capacity[position], slot_price[position]
+                    capacity_score = capacity_scores[None if capacity != capacity else capacity]
+                    budget_score = budget_scores[None if price != price else price]
+                
+                overall_score = round(
+                    location * location_weight +
+                    capacity_score * capacity_weight +
+                    budget_score * budget_weight +
+                    event_type * event_type_weight, 2
+                )
+                
+                if overall_score >= min_score:
+                    scores = {
+                        'location': location,
+                        'capacity': capacity_score,
+                        'budget': budget_score,
+                        'event_type': event_type
+                    }
+                    hall = cached_row(halls, hall_position, hall_rows) if hall_position >= 0 else None
+                    yield overall_score, event, cached_row(hotels, hotel_index, hotel_rows), hall, scores
+    
+    def build_recommendation(self, overall_score, event, hotel, hall, scores):
+        """Build the response dict for a single match"""
+        return {
+            'hotel': hotel,
+            'hall': hall,
+            'event': event,
+            'matchScore': overall_score,
+            'reasons': self.generate_reasons(scores, event, hotel, hall),
+            'confidence': overall_score / 100,
+            'scores': scores
+        }
+    
+    def select_top_matches(self, matches, limit=None, per_event_limit=None):
+        """Keep only the best matches using bounded heaps, best first.
+        
+        Ties keep the order they were generated in, same as the stable sort
+        used when no limit is given.
+        """
+        size = per_event_limit if per_event_limit is not None else limit
+        if size <= 0:
+            return []
+        
+        heaps = {}
+        for seq, match in enumerate(matches):
+            key = match[1]['id'] if per_event_limit is not None else None
+            heap = heaps.setdefault(key, [])
+            item = (match[0], -seq, match)
+            if len(heap) < size:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        
+        survivors = [item for heap in heaps.values() for item in heap]
+        survivors.sort(key=lambda item: (-item[0], -item[1]))
+        if limit is not None:
+            survivors = survivors[:limit]
+        return [item[2] for item in survivors]
+    
+    def rank_matches(self, matches, limit=None, per_event_limit=None):
+        """Turn matches, in generation order, into recommendations sorted by score.
+        
+        With limit and/or per_event_limit only the top matches (overall and per
+        event) are kept, and reasons are generated for those alone.
+        """
+        if limit is not None or per_event_limit is not None:
+            top_matches = self.select_top_matches(matches, limit, per_event_limit)
+            return [self.build_recommendation(*match) for match in top_matches]
+        
+        recommendations = [self.build_recommendation(*match) for match in matches]
+        
+        # Sort by match score
+        recommendations.sort(key=lambda x: x['matchScore'], reverse=True)
+        
+        return recommendations
+    
+    def iter_ranked(self, matches, limit=None, per_event_limit=None):
+        """Yield the recommendations rank_matches returns, in the same order, one at a time.
+        
+        Matches are heapified in linear time and popped in score order, and each
+        recommendation is built when it is reached, so the first one is ready
+        without sorting or building the rest.
+        """
+        if limit is not None or per_event_limit is not None:
+            for match in self.select_top_matches(matches, limit, per_event_limit):
+                yield self.build_recommendation(*match)
+            return
+        
+        # Generation order breaks ties, like the stable sort in rank_matches
+        heap = [(-match[0], seq, match) for seq, match in enumerate(matches)]
+        heapq.heapify(heap)
+        while heap:
+            yield self.build_recommendation(*heapq.heappop(heap)[2])
+    
+    def recommend_venues(self, events, hotels, halls, limit=None, per_event_limit=None, bookings=None):
+        """Generate recommendations for all events (see rank_matches for the limits), leaving
+        out hotels booked out on an event's date when bookings are given"""
+        # Catalog indexes are built once per catalog load and reused for every event
+        indexes = self.get_catalog_indexes(hotels, halls)
+        booking_index = self.get_booking_index(bookings, indexes) if bookings is not None else None
+        return self.rank_matches(self.iter_matches(events, hotels, indexes, booking_index), limit, per_event_limit)
+    
+    def build_event_indexes(self, events):
+        """Build the indexes reverse queries (recommend_events) search the events with.
+        
+        Events are grouped by normalized location, so location scores are
+        computed once per distinct location, and sorted by guest count and by
+        budget, so the events a hall can match are found by bisection. Events
+        without a positive guest count or with a zero budget can't be bounded
+        (the scalar functions divide by them) and are always scored.
+        """
+        guest_counts = column_values(events, 'guest_count')
+        budgets = column_values(events, 'budget')
+        keywords = [
+            event_keywords(event_type, event_name)
+            for event_type, event_name in zip(column_values(events, 'event_type'), column_values(events, 'event_name'))
+        ]
+        
+        codes_by_location = {}
+        location_codes = array('q', (
+            codes_by_location.setdefault(self.normalize_location(location), len(codes_by_location))
+            for location in column_values(events, 'location')
+        ))
+        
+        unpruned, positions_by_location = [], [[] for _ in codes_by_location]
+        sized, budgeted, unbudgeted, negative_budget = [], [], [], []
+        for position, (guests, budget) in enumerate(zip(guest_counts, budgets)):
+            if not guests or guests < 0 or budget == 0:
+                unpruned.append(position)
+                continue
+            positions_by_location[location_codes[position]].append(position)
+            sized.append((guests, position))
+            if budget is None:
+                unbudgeted.append(position)
+            elif budget < 0:
+                negative_budget.append(position)  # Any positive price is under budget
+            else:
+                budgeted.append((budget, position))
+        sized.sort()
+        budgeted.sort()
+        
+        return {
+            'events': events,
+            'ids': column_values(events, 'id'),
+            'dates': column_values(events, 'event_date'),
+            'guest_counts': guest_counts,
+            'budgets': budgets,
+            'keywords': keywords,
+            'locations': list(codes_by_location),
+            'location_codes': location_codes,
+            'positions_by_location': [array('q', positions) for positions in positions_by_location],
+            'unpruned': array('q', unpruned),
+            'guests': array('d', (guests for guests, _ in sized)),
+            'guest_positions': array('q', (position for _, position in sized)),
+            'sorted_budgets': array('d', (budget for budget, _ in budgeted)),
+            'budget_positions': array('q', (position for _, position in budgeted)),
+            'unbudgeted': array('q', unbudgeted),
+            'negative_budget': array('q', negative_budget)
+        }
+    
+    def get_event_indexes(self, events):
+        """Return the event indexes, rebuilding them only when a different events table is passed in"""
+        cached = self._event_indexes
+        if cached is None or cached[0] is not events:
+            cached = (events, self.build_event_indexes(events))
+            self._event_indexes = cached
+        return cached[1]
+    
+    def event_candidate_positions(self, capacity, price, location_levels, event_indexes, min_score=None):
+        """Event positions a hall (or a hotel without halls, capacity 'hotel') can
+        still score min_score (the plan's by default) with, in no particular order.
+        
+        The reverse of candidate_positions: per location score, the capacity and
+        budget scores needed to reach the threshold, assuming the best case for
+        the other two, bound the guest count and the budget. Only the narrower of
+        the two sorted ranges (or the location's own events) is scanned, and the
+        other bound is checked per event.
+        """
+        threshold = (self.plan.min_score if min_score is None else min_score) - 0.01
+        guest_counts, budgets = event_indexes['guest_counts'], event_indexes['budgets']
+        location_codes = event_indexes['location_codes']
+        best_capacity = 50 if capacity == 'hotel' else 25 if capacity is None else 100
+        best_budget = 50 if capacity == 'hotel' or price is None else 100
+        
+        positions = list(event_indexes['unpruned'])
+        for level, location_codes_at_level in location_levels.items():
+            best_rest = level * self.location_weight + 100 * self.event_type_weight
+            if best_rest + best_capacity * self.capacity_weight + best_budget * self.budget_weight < threshold:
+                continue
+            # Guest counts whose capacity score can make up the difference
+            guest_range = None
+            if capacity not in ('hotel', None) and self.capacity_weight > 0:
+                min_capacity_score = (threshold - best_rest - best_budget * self.budget_weight) / self.capacity_weight
+                if min_capacity_score > 0:
+                    ratio_range = self.capacity_ratio_range(min_capacity_score)
+                    if ratio_range is None or capacity <= 0:
+                        continue  # A hall without room scores 0 for capacity
+                    guest_range = (capacity / ratio_range[1] * (1 - 1e-9), capacity / ratio_range[0] * (1 + 1e-9))
+            
+            # Budgets whose budget score can make up the difference: budget >= price / max price ratio
+            budget_floor, allow_unbudgeted = None, True
+            if capacity != 'hotel' and price is not None and price > 0 and self.budget_weight > 0:
+                min_budget_score = (threshold - best_rest - best_capacity * self.capacity_weight) / self.budget_weight
+                if min_budget_score > 10:
+                    max_ratio = (0.7 if min_budget_score > 90 else 0.85 if min_budget_score > 80 else
+                                 1.0 if min_budget_score > 50 else 1.15 if min_budget_score > 30 else 1.3)
+                    budget_floor = price / max_ratio * (1 - 1e-9)
+                    allow_unbudgeted = 50 >= min_budget_score
+            
+            # Each scan is a list of (positions, start, end) slices
+            scans = [[(event_indexes['positions_by_location'][code], 0, None) for code in location_codes_at_level]]
+            if guest_range is not None:
+                start = bisect.bisect_left(event_indexes['guests'], guest_range[0])
+                end = bisect.bisect_right(event_indexes['guests'], guest_range[1])
+                scans.append([(event_indexes['guest_positions'], start, end)])
+            if budget_floor is not None:
+                start = bisect.bisect_left(event_indexes['sorted_budgets'], budget_floor)
+                scans.append([(event_indexes['budget_positions'], start, None), (event_indexes['negative_budget'], 0, None)])
+                if allow_unbudgeted:
+                    scans[-1].append((event_indexes['unbudgeted'], 0, None))
+            scan = min(scans, key=lambda scan: sum(len(range(len(part))[start:end]) for part, start, end in scan))
+            
+            codes = set(location_codes_at_level)
+            for position in (position for part, start, end in scan for position in part[start:end]):
+                if location_codes[position] not in codes:
+                    continue
+                if guest_range is not None and not guest_range[0] <= guest_counts[position] <= guest_range[1]:
+                    continue
+                if budget_floor is not None:
+                    budget = budgets[position]
+                    if budget is None:
+                        if not allow_unbudgeted:
+                            continue
+                    elif 0 < budget < budget_floor:
+                        continue
+                positions.append(position)
+        return positions
+    
+    def iter_event_matches(self, events, hotels, indexes, event_indexes, hotel_index, hall_position=None,
+                           min_score=None, booking_index=None):
+        """Yield (overall_score, event, hotel, hall, scores) for every event scoring at least
+        min_score (never below the plan's) at one hotel, or one of its halls, in the order
+        iter_matches would.
+        
+        With a booking index, events on dates the hotel is booked out are dropped before scoring.
+        """
+        min_score = self.plan.min_score if min_score is None else max(min_score, self.plan.min_score)
+        hotel_id, halls = indexes['hotel_ids'][hotel_index], indexes['halls']
+        hotel = hotels[hotel_index]
+        guest_counts, budgets = event_indexes['guest_counts'], event_indexes['budgets']
+        location_codes, keywords_by_position = event_indexes['location_codes'], event_indexes['keywords']
+        
+        # Location scores per distinct event location, grouped by score
+        location_scores = [
+            self.calculate_location_score(location, hotel.get('city')) for location in event_indexes['locations']
+        ]
+        location_levels = {}
+        for code, location in enumerate(location_scores):
+            location_levels.setdefault(location, []).append(code)
+        
+        text = indexes['keywords'].texts.get(hotel_id)
+        hotel_keywords = extract_keywords(text) if text is not None else set()
+        
+        slots = []
+        for position in indexes['slots_by_hotel'][hotel_index]:
+            slot_hall = indexes['slot_halls'][position]
+            if hall_position is not None and slot_hall != hall_position:
+                continue
+            if slot_hall < 0:
+                slots.append((slot_hall, 'hotel', None))
+            else:
+                capacity, price = indexes['slot_capacity'][position], indexes['slot_price'][position]
+                slots.append((slot_hall, None if capacity != capacity else capacity, None if price != price else price))
+        
+        # Events in table order, then the hotel's halls in slot order, like iter_matches
+        pairs = []
+        for slot_index, (_, capacity, price) in enumerate(slots):
+            if self.prefilter:
+                positions = self.event_candidate_positions(capacity, price, location_levels, event_indexes, min_score)
+            else:
+                positions = range(len(location_codes))
+            pairs.extend((position, slot_index) for position in positions)
+        pairs.sort()
+        
+        booked_dates = booking_index['by_hotel'].get(hotel_index) if booking_index is not None else None
+        if booked_dates:
+            ids, dates = event_indexes['ids'], event_indexes['dates']
+            booked_out = {
+                position for position in {position for position, _ in pairs}
+                if dates[position] in booked_dates
+                and self.is_booked_out(booked_dates[dates[position]], ids[position], hotel_index, indexes)
+            }
+            pairs = [pair for pair in pairs if pair[0] not in booked_out]
+        
+        # Event type scores are shared by the hotel's halls, and capacity and budget
+        # scores are memoized per slot, as in iter_matches
+        event_type_scores = Memo(lambda position: keyword_match_score(
+            keywords_by_position[position], text, len(keywords_by_position[position] & hotel_keywords)))
+        capacity_scores = [
+            Memo(lambda guests, capacity=capacity: self.calculate_capacity_score(guests, capacity))
+            for _, capacity, _ in slots
+        ]
+        budget_scores = [Memo(lambda budget, price=price: self.calculate_budget_score(budget, price)) for _, _, price in slots]
+        event_rows, hall_rows = {}, {}
+        for position, slot_index in pairs:
+            slot_hall = slots[slot_index][0]
+            location, event_type = location_scores[location_codes[position]], event_type_scores[position]
+            if slot_hall < 0:
+                capacity_score, budget_score = 50, 50  # Neutral
+            else:
+                capacity_score = capacity_scores[slot_index][guest_counts[position]]
+                budget_score = budget_scores[slot_index][budgets[position]]
+            
+            overall_score = round(
+                location * self.location_weight +
+                capacity_score * self.capacity_weight +
+                budget_score * self.budget_weight +
+                event_type * self.event_type_weight, 2
+            )
+            if overall_score >= min_score:
+                scores = {
+                    'location': location,
+                    'capacity': capacity_score,
+                    'budget': budget_score,
+                    'event_type': event_type
+                }
+                hall = cached_row(halls, slot_hall, hall_rows) if slot_hall >= 0 else None
+                yield overall_score, cached_row(events, position, event_rows), hotel, hall, scores
+    
+    def recommend_events(self, events, hotels, halls, hotel_id, hall_id=None, limit=None, bookings=None):
+        """Rank open events for one hotel, or one of its halls: the reverse of recommend_venues.
+        
+        Same scores and order as the hotel's (or hall's) entries in
+        recommend_venues(events, hotels, halls, bookings=bookings). Empty when
+        the hotel or hall is not in the catalog.
+        
+        With a limit, events are first searched at higher minimum scores, which
+        prune far more: once a search finds limit matches, it has every match
+        that can make the top limit.
+        """
+        indexes = self.get_catalog_indexes(hotels, halls)
+        try:
+            hotel_index = indexes['hotel_ids'].index(hotel_id)
+        except ValueError:
+            return []
+        
+        hall_position = None
+        if hall_id is not None:
+            hall_position = next((
+                indexes['slot_halls'][position] for position in indexes['slots_by_hotel'][hotel_index]
+                if indexes['slot_halls'][position] >= 0 and halls[indexes['slot_halls'][position]]['id'] == hall_id
+            ), None)
+            if hall_position is None:
+                return []
+        
+        event_indexes = self.get_event_indexes(events)
+        booking_index = self.get_booking_index(bookings, indexes) if bookings is not None else None
+        if limit is not None and self.prefilter:
+            for min_score in self.plan.reverse_min_scores:
+                matches = list(self.iter_event_matches(
+                    events, hotels, indexes, event_indexes, hotel_index, hall_position, min_score, booking_index))
+                if len(matches) >= limit:
+                    return self.rank_matches(matches, limit)
+        matches = self.iter_event_matches(
+            events, hotels, indexes, event_indexes, hotel_index, hall_position, booking_index=booking_index)
+        return self.rank_matches(matches, limit)
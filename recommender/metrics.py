@@ -0,0 +1,78 @@
+"""Logging, latency histograms and per-request timing spans"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('recommender')
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label set"""
+    
+    def __init__(self, name, help_text, buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # sorted label items -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+    
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+    
+    def render(self):
+        """Lines of the Prometheus text exposition format"""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = [(key, list(series)) for key, series in sorted(self._series.items())]
+        for key, series in series_items:
+            labels = ','.join(f'{name}="{value}"' for name, value in key)
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+REQUEST_SECONDS = Histogram('recommendation_http_request_duration_seconds',
+                            'Time to produce a response (streamed bodies excluded), by endpoint and status')
+STAGE_SECONDS = Histogram('recommendation_stage_duration_seconds',
+                          'Time spent in each stage of a recommendations request')
+SUPABASE_SECONDS = Histogram('recommendation_supabase_query_duration_seconds',
+                             'Supabase REST query time by table (catalog cache hits make no query)')
+
+class StageTimings:
+    """Timing spans for one request; each span is also observed in STAGE_SECONDS"""
+    
+    def __init__(self):
+        self.durations = {}
+    
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[stage] = self.durations.get(stage, 0) + elapsed
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+    
+    def call(self, stage, fn, *args):
+        with self.span(stage):
+            return fn(*args)
+    
+    async def call_async(self, stage, awaitable):
+        with self.span(stage):
+            return await awaitable
+    
+    def summary(self):
+        return ' '.join(f'{stage}={duration * 1000:.1f}ms' for stage, duration in self.durations.items())
@@ -0,0 +1,79 @@
+"""Request parameters and response formats shared by both entry points"""
+import json
+
+def parse_limit(value, name):
+    """Parse an optional positive integer query parameter"""
+    if value is None or value == '':
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a positive integer')
+    if limit < 1:
+        raise ValueError(f'{name} must be a positive integer')
+    return limit
+
+COMPACT_MEDIA_TYPE = 'application/vnd.festivisa.compact+json'
+
+def wants_compact_format(format_param, accept_header):
+    """Compact format is opt-in through ?format=compact or the Accept header"""
+    return format_param == 'compact' or COMPACT_MEDIA_TYPE in (accept_header or '')
+
+STREAM_MODES = ('ndjson', 'json')
+
+def wants_stream(stream_param, accept_header):
+    """Streaming is opt-in: ?stream=ndjson (or Accept: application/x-ndjson) sends one
+    recommendation per line, ?stream=json sends the usual JSON body in chunks"""
+    if stream_param:
+        if stream_param not in STREAM_MODES:
+            raise ValueError(f'stream must be one of: {", ".join(STREAM_MODES)}')
+        return stream_param
+    if 'application/x-ndjson' in (accept_header or ''):
+        return 'ndjson'
+    return None
+
+def iter_stream_chunks(recommendations, mode, **fields):
+    """Serialize recommendations (an iterable, consumed lazily) one at a time.
+    
+    'json' produces the same body as the non-streamed response, with fields
+    added after the recommendations array and count.
+    """
+    if mode == 'ndjson':
+        for recommendation in recommendations:
+            yield json.dumps(recommendation) + '\n'
+        return
+    
+    yield '{"recommendations": ['
+    count = 0
+    for recommendation in recommendations:
+        yield (', ' if count else '') + json.dumps(recommendation)
+        count += 1
+    yield '], "count": ' + json.dumps(count)
+    for name, value in fields.items():
+        yield ', ' + json.dumps(name) + ': ' + json.dumps(value)
+    yield '}'
+
+def compact_recommendations(recommendations):
+    """Normalize recommendations into id-keyed hotels/halls/events maps plus
+    slim (event_id, hotel_id, hall_id, score, reasons) rows, so each row is
+    serialized once no matter how many recommendations reference it"""
+    hotels, halls, events, rows = {}, {}, {}, []
+    for rec in recommendations:
+        hotel, hall, event = rec['hotel'], rec['hall'], rec['event']
+        hotels[hotel['id']] = hotel
+        events[event['id']] = event
+        hall_id = None
+        if hall is not None:
+            hall_id = hall['id']
+            halls[hall_id] = hall
+        rows.append([event['id'], hotel['id'], hall_id, rec['matchScore'], rec['reasons']])
+    
+    return {
+        'format': 'compact',
+        'fields': ['eventId', 'hotelId', 'hallId', 'matchScore', 'reasons'],
+        'recommendations': rows,
+        'hotels': hotels,
+        'halls': halls,
+        'events': events,
+        'count': len(rows)
+    }
@@ -0,0 +1,171 @@
+"""The request-level pipeline both entry points share: the process-wide engine,
+fetching a user's (or an organizer's) inputs and applying catalog row changes"""
+import threading
+
+from . import snapshot, supabase_rest
+from . import caches
+from .caches import catalog_cache, fetch_bookings, fetch_catalog_table, fetch_open_events
+from .auth import jwt_claims
+from .config import (AVAILABILITY_FILTER, CATALOG_SNAPSHOT_PATH, CATALOG_VERSION_COLUMNS, EVENT_COLUMNS,
+                     HALL_COLUMNS, HALL_FILTER_PUSHDOWN, HOTEL_COLUMNS, MIN_MATCH_SCORE, REQUEST_CONCURRENCY,
+                     SCORING_BACKEND, SCORING_WEIGHTS, SUPABASE_KEY)
+from .engine import ScoringPlan, VenueRecommendationEngine, check_catalog_change
+from .metrics import StageTimings, logger
+
+def compile_scoring_plan(weights=SCORING_WEIGHTS, min_score=MIN_MATCH_SCORE):
+    """The scoring plan for the configured weights and minimum match score"""
+    plan = ScoringPlan.parse(weights, min_score=min_score)
+    total = plan.location_weight + plan.capacity_weight + plan.budget_weight + plan.event_type_weight
+    if abs(total - 1) > 1e-9:
+        logger.warning('Scoring weights add up to %g, not 1, so match scores are not on a 0-100 scale', total)
+    return plan
+
+# Compiled once; a bad SCORING_WEIGHTS or MIN_MATCH_SCORE fails at startup
+scoring_plan = compile_scoring_plan()
+
+# With the hall filter pushdown every request brings its own halls list; keep the
+# indexes of the ones in flight next to the cached catalog's
+CATALOG_SLOTS = REQUEST_CONCURRENCY + 1 if HALL_FILTER_PUSHDOWN else 1
+
+def create_engine(backend=SCORING_BACKEND, plan=None, catalog_slots=CATALOG_SLOTS):
+    """Create the recommendation engine for the configured scoring backend and plan"""
+    plan = plan or scoring_plan
+    if backend == 'numpy':
+        from .vectorized import VectorizedVenueRecommendationEngine, np
+        if np is not None:
+            return VectorizedVenueRecommendationEngine(plan=plan, catalog_slots=catalog_slots)
+        logger.warning('SCORING_BACKEND=numpy but numpy is not installed, using the python backend')
+    return VenueRecommendationEngine(plan=plan, catalog_slots=catalog_slots)
+
+# Shared across requests so the catalog indexes (and numpy columns) are reused
+engine = create_engine()
+
+def bookings_readable(key=SUPABASE_KEY):
+    """Whether key gets past the invites RLS policies: a service role key (a legacy JWT
+    with role service_role, or a secret sb_secret_ key); anon and publishable keys don't"""
+    if not key:
+        return False
+    if key.startswith('sb_secret_'):
+        return True
+    claims = jwt_claims(key)
+    return claims is not None and claims.get('role') == 'service_role'
+
+if AVAILABILITY_FILTER and not bookings_readable():
+    logger.warning('AVAILABILITY_FILTER is on but SUPABASE_KEY is not a service role key; the invites '
+                   'RLS policies return no bookings to it, so no hotel is ever left out')
+
+def submit_bookings_fetch(timings):
+    """Start fetching the bookings, or return None with AVAILABILITY_FILTER off"""
+    if not AVAILABILITY_FILTER:
+        return None
+    return supabase_rest.fetch_executor.submit(timings.call, 'fetch_bookings', fetch_bookings)
+
+def fetch_recommendation_inputs(user_id, timings=None):
+    """Fetch the user's events, both catalog tables and the bookings concurrently.
+    
+    Returns (events, hotels, halls, bookings); bookings is None with AVAILABILITY_FILTER off.
+    """
+    timings = timings or StageTimings()
+    # All statuses, not just open
+    events_future = supabase_rest.fetch_executor.submit(
+        timings.call, 'fetch_events', supabase_rest.supabase_query, 'events', EVENT_COLUMNS, {'user_id': f'eq.{user_id}'})
+    hotels_future = supabase_rest.fetch_executor.submit(
+        timings.call, 'fetch_hotels', fetch_catalog_table, 'hotels', HOTEL_COLUMNS)
+    bookings_future = submit_bookings_fetch(timings)
+    if not HALL_FILTER_PUSHDOWN:
+        # On this thread, which would otherwise just wait for the others
+        halls = timings.call('fetch_hotel_halls', fetch_catalog_table, 'hotel_halls', HALL_COLUMNS)
+    elif not events_future.result():
+        halls = []
+    else:
+        # The hall filter depends on the user's events, so it runs after them and skips the catalog cache
+        filters = engine.hall_fetch_filters(events_future.result(), hotels_future.result())
+        if filters is None:
+            halls = timings.call('fetch_hotel_halls', fetch_catalog_table, 'hotel_halls', HALL_COLUMNS)
+        else:
+            halls = timings.call('fetch_hotel_halls', supabase_rest.supabase_query, 'hotel_halls', HALL_COLUMNS, filters)
+    bookings = bookings_future.result() if bookings_future is not None else None
+    return events_future.result(), hotels_future.result(), halls, bookings
+
+def fetch_organizer_inputs(user_id, hotel_id, timings=None):
+    """Fetch the open events, both catalog tables and the bookings concurrently, and check
+    that the user owns the hotel; returns (owned, events, hotels, halls, bookings)"""
+    timings = timings or StageTimings()
+    events_future = supabase_rest.fetch_executor.submit(timings.call, 'fetch_events', fetch_open_events)
+    hotels_future = supabase_rest.fetch_executor.submit(
+        timings.call, 'fetch_hotels', fetch_catalog_table, 'hotels', HOTEL_COLUMNS)
+    halls_future = supabase_rest.fetch_executor.submit(
+        timings.call, 'fetch_hotel_halls', fetch_catalog_table, 'hotel_halls', HALL_COLUMNS)
+    bookings_future = submit_bookings_fetch(timings)
+    owned = timings.call('fetch_owner', supabase_rest.supabase_query, 'hotels', 'id',
+                         {'id': f'eq.{hotel_id}', 'organizer_id': f'eq.{user_id}'})
+    bookings = bookings_future.result() if bookings_future is not None else None
+    return bool(owned), events_future.result(), hotels_future.result(), halls_future.result(), bookings
+
+CATALOG_COLUMNS = {'hotels': HOTEL_COLUMNS, 'hotel_halls': HALL_COLUMNS}
+catalog_change_lock = threading.Lock()
+
+def project_row(row, select):
+    """Keep only the selected columns of a full table row (anything but a row is left
+    for check_catalog_change to reject)"""
+    if not isinstance(row, dict) or select == '*':
+        return row
+    return {column: row.get(column) for column in select.split(',')}
+
+def apply_catalog_change(table, change_type, record=None, old_record=None):
+    """Patch the cached catalog with one row change instead of reloading it.
+    
+    Returns False when the catalog is not warm; the table's entries are then
+    just invalidated and the next request loads it. Raises ValueError for a
+    change that cannot be applied (see engine.check_catalog_change).
+    """
+    # Malformed changes are rejected even when there is no warm catalog to patch
+    select = CATALOG_COLUMNS.get(table, '*')
+    record, old_record = project_row(record, select), project_row(old_record, select)
+    check_catalog_change(table, change_type, record, old_record)
+    
+    hotels_key, halls_key = ('hotels', HOTEL_COLUMNS), ('hotel_halls', HALL_COLUMNS)
+    with catalog_change_lock:
+        hotels, halls = catalog_cache.peek(hotels_key), catalog_cache.peek(halls_key)
+        if hotels is None or halls is None:
+            catalog_cache.invalidate(table)
+            return False
+        
+        new_hotels, new_halls = engine.apply_catalog_change(hotels, halls, table, change_type, record, old_record)
+        
+        # Record the tables' current versions so the next revalidation keeps the patched lists
+        published = {}
+        for key, value in ((hotels_key, new_hotels), (halls_key, new_halls)):
+            version_column = CATALOG_VERSION_COLUMNS.get(key[0])
+            version = supabase_rest.supabase_table_version(key[0], version_column) if version_column else None
+            catalog_cache.replace(key, value, version)
+            published[key[0]] = (key[1], value, version)
+        
+        # The other workers map the patched tables once their own revalidation sees the new version
+        if caches.shared_catalog is not None:
+            caches.shared_catalog.publish(published)
+    return True
+
+def load_catalog_snapshot(path=CATALOG_SNAPSHOT_PATH):
+    """Seed the catalog cache from a prebuilt snapshot and build the engine's indexes for it.
+    
+    A missing or unreadable snapshot is logged and the catalog is fetched as usual.
+    """
+    try:
+        tables = snapshot.load_snapshot(path, CATALOG_COLUMNS)
+    except (OSError, ValueError) as e:
+        logger.warning('Could not load catalog snapshot %s: %s', path, e)
+        return False
+    
+    # Expired on arrival: the first request only probes each table's version and keeps
+    # the snapshot rows unless the table has changed since the snapshot was built
+    for table, (rows, version) in tables.items():
+        catalog_cache.replace((table, CATALOG_COLUMNS[table]), rows, version, ttl=0)
+    if 'hotels' in tables and 'hotel_halls' in tables:
+        engine.get_catalog_indexes(tables['hotels'][0], tables['hotel_halls'][0])
+    return True
+
+# Module scope outlives a single invocation on a warm serverless instance, so this
+# runs once per cold start
+if CATALOG_SNAPSHOT_PATH:
+    load_catalog_snapshot()
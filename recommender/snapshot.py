@@ -0,0 +1,281 @@
+"""Catalog snapshot files: the catalog tables written out, so a process can load
+them instead of downloading them.
+
+Two formats, chosen by the name when writing and by the first bytes when reading:
+
+- JSON, gzipped when the name ends in .gz
+- binary, for names ending in .bin: columnar, every distinct string stored
+  once, and memory-mapped read-only on load, so the processes on one host
+  that map the same file share one physical copy of the catalog
+"""
+import contextlib
+import gzip
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Only needed for SHARED_CATALOG_PATH (not available on Windows)
+    fcntl = None
+
+from . import supabase_rest
+from .catalog import CatalogTable, MappedStrings
+from .config import CATALOG_VERSION_COLUMNS
+from .metrics import logger
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Binary layout: magic, header size (uint64 LE), JSON header, then 8-byte aligned
+# buffers the header refers to as [offset, size] from the end of the header
+BINARY_MAGIC = b'RCATLG1\n'
+BINARY_PREAMBLE = len(BINARY_MAGIC) + 8
+
+def resolve_snapshot_path(path):
+    """Resolve a relative snapshot path against the repository root"""
+    return path if os.path.isabs(path) else os.path.join(REPOSITORY_ROOT, path)
+
+def open_snapshot(path, mode):
+    return gzip.open(path, mode + 't', encoding='utf-8') if path.endswith('.gz') else open(path, mode, encoding='utf-8')
+
+def aligned(offset):
+    return (offset + 7) & ~7
+
+def write_binary_snapshot(f, tables, built_at):
+    """Write {table: (select, rows, version)} to the binary file f"""
+    strings = {}  # distinct string -> code, shared by every table and column
+    buffers = []
+    size = 0
+    
+    def add(data):
+        nonlocal size
+        offset = size
+        buffers.append(data)
+        size = aligned(size + len(data))
+        return [offset, len(data)]
+    
+    header_tables = {}
+    for table, (select, rows, version) in tables.items():
+        rows = CatalogTable.from_rows(rows)
+        columns = []
+        for name, (values, missing) in zip(rows.names, rows.columns):
+            if isinstance(values, (array, memoryview)):
+                column = {
+                    'type': values.typecode if isinstance(values, array) else values.format,
+                    'values': add(values.tobytes()),
+                    'missing': add(bytes(missing)) if missing is not None else None
+                }
+            else:
+                values = rows.column(name)
+                if all(value is None or isinstance(value, str) for value in values):
+                    codes = array('i', (-1 if value is None else strings.setdefault(value, len(strings))
+                                        for value in values))
+                    column = {'type': 'str', 'values': add(codes.tobytes())}
+                else:
+                    column = {'type': 'json', 'values': add(json.dumps(values).encode())}
+            columns.append(dict(column, name=name))
+        header_tables[table] = {'select': select, 'version': version, 'length': len(rows), 'columns': columns}
+    
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = array('q', [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    header = json.dumps({
+        'builtAt': built_at,
+        'byteorder': sys.byteorder,
+        'strings': {'offsets': add(offsets.tobytes()), 'data': add(b''.join(encoded))},
+        'tables': header_tables
+    }).encode()
+    
+    f.write(BINARY_MAGIC + struct.pack('<Q', len(header)) + header)
+    f.write(bytes(aligned(BINARY_PREAMBLE + len(header)) - BINARY_PREAMBLE - len(header)))
+    for data in buffers:
+        f.write(data)
+        f.write(bytes(aligned(len(data)) - len(data)))
+
+def map_binary_snapshot(path):
+    """Memory-map a binary snapshot; returns (header, {table: CatalogTable over the mapping})"""
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    (header_size,) = struct.unpack_from('<Q', view, len(BINARY_MAGIC))
+    header = json.loads(bytes(view[BINARY_PREAMBLE:BINARY_PREAMBLE + header_size]))
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError(f'{path} was written on a {header["byteorder"]}-endian machine')
+    start = aligned(BINARY_PREAMBLE + header_size)
+    
+    def buffer(ref):
+        offset, size = ref
+        return view[start + offset:start + offset + size]
+    
+    string_offsets, string_data = buffer(header['strings']['offsets']).cast('q'), buffer(header['strings']['data'])
+    tables = {}
+    for table, entry in header['tables'].items():
+        columns = []
+        for column in entry['columns']:
+            if column['type'] == 'str':
+                columns.append((MappedStrings(buffer(column['values']).cast('i'), string_offsets, string_data), None))
+            elif column['type'] == 'json':
+                columns.append((json.loads(bytes(buffer(column['values']))), None))
+            else:
+                missing = buffer(column['missing']) if column['missing'] is not None else None
+                columns.append((buffer(column['values']).cast(column['type']), missing))
+        tables[table] = CatalogTable([column['name'] for column in entry['columns']], columns, entry['length'])
+    return header, tables
+
+def write_snapshot(path, tables):
+    """Write {table: (select, rows, version)} to path, replacing any existing file atomically"""
+    built_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    path = resolve_snapshot_path(path)
+    # Same suffix as path, so the partial file is written in the same format as the final one
+    partial_path = os.path.join(os.path.dirname(path), f'.{os.getpid()}.{threading.get_ident()}.{os.path.basename(path)}')
+    if path.endswith('.bin'):
+        with open(partial_path, 'wb') as f:
+            write_binary_snapshot(f, tables, built_at)
+    else:
+        snapshot = {
+            'builtAt': built_at,
+            'tables': {
+                table: {'select': select, 'version': version, 'rows': list(rows)}
+                for table, (select, rows, version) in tables.items()
+            }
+        }
+        with open_snapshot(partial_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(partial_path, path)
+
+def read_snapshot(path):
+    """Read a snapshot of either format; returns (built_at, {table: (select, rows, version)}).
+    
+    Binary snapshots are memory-mapped rather than read.
+    """
+    path = resolve_snapshot_path(path)
+    with open(path, 'rb') as f:
+        binary = f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    if binary:
+        header, tables = map_binary_snapshot(path)
+        return header['builtAt'], {
+            table: (entry['select'], tables[table], entry['version']) for table, entry in header['tables'].items()
+        }
+    with open_snapshot(path, 'r') as f:
+        snapshot = json.load(f)
+    return snapshot.get('builtAt'), {
+        table: (entry.get('select'), CatalogTable.from_rows(entry.get('rows', [])), entry.get('version'))
+        for table, entry in snapshot.get('tables', {}).items()
+    }
+
+def build_snapshot(path, columns):
+    """Download the catalog tables ({table: select}) from Supabase and write them to path.
+    
+    Each table's version is probed before its rows are fetched, so a change
+    made during the download shows up as a version mismatch on load.
+    Returns the tables written, as {table: (select, rows, version)}.
+    """
+    tables = {}
+    for table, select in columns.items():
+        version_column = CATALOG_VERSION_COLUMNS.get(table)
+        version = supabase_rest.supabase_table_version(table, version_column) if version_column else None
+        tables[table] = (select, supabase_rest.supabase_query(table, select), version)
+    write_snapshot(path, tables)
+    return tables
+
+def load_snapshot(path, columns):
+    """Read the tables of columns ({table: select}) from the snapshot at path.
+    
+    Returns {table: (rows, version)}. Tables whose snapshot was taken with a
+    different select, and unversioned tables, are skipped.
+    """
+    built_at, tables = read_snapshot(path)
+    loaded = {}
+    for table, select in columns.items():
+        entry = tables.get(table)
+        if entry is None or entry[0] != select or entry[2] is None:
+            logger.warning('Catalog snapshot %s has no usable %s table, it will be fetched', path, table)
+            continue
+        loaded[table] = (entry[1], tuple(entry[2]))
+    logger.info('Loaded catalog snapshot %s built at %s (%s)', path, built_at,
+                ', '.join(f'{table}: {len(rows)} rows' for table, (rows, _) in loaded.items()))
+    return loaded
+
+class SharedCatalog:
+    """A binary snapshot shared by the worker processes on one host.
+    
+    Every worker maps the same file read-only, so the catalog is in memory
+    once however many workers there are. A worker that finds a table in the
+    file older than the table's current version downloads it and swaps in a
+    new file. It does so under an exclusive file lock, so one worker downloads
+    while the others wait and then map its file.
+    """
+    
+    def __init__(self, path):
+        self.path = resolve_snapshot_path(path)
+        self.lock_path = self.path + '.lock'
+        self._mapped = None  # (file identity, {table: (select, rows, version)})
+        self._lock = threading.Lock()
+    
+    def tables(self):
+        """The current file's tables, remapped when the file has been swapped since the last call"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._mapped is None or self._mapped[0] != identity:
+                self._mapped = (identity, read_snapshot(self.path)[1])
+            return self._mapped[1]
+    
+    def current_rows(self, table, select, version):
+        """The table's rows from the file if they are at version, else None"""
+        entry = self.tables().get(table)
+        if entry is None or entry[0] != select or entry[2] is None or version is None:
+            return None
+        return entry[1] if tuple(entry[2]) == tuple(version) else None
+    
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Hold the file lock that serializes refreshes across processes"""
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def load(self, table, select, version):
+        """The table's rows at version: mapped from the file when it has them, else
+        downloaded by this worker and published to the file for the others"""
+        rows = self.current_rows(table, select, version)
+        if rows is not None:
+            return rows
+        with self.exclusive():
+            # Another worker may have refreshed the file while this one waited
+            rows = self.current_rows(table, select, version)
+            if rows is not None:
+                return rows
+            rows = supabase_rest.supabase_query(table, select)
+            self.write({table: (select, rows, version)})
+        return self.current_rows(table, select, version) or CatalogTable.from_rows(rows)
+    
+    def publish(self, changed):
+        """Swap in a file with changed ({table: (select, rows, version)}) replacing those tables"""
+        with self.exclusive():
+            self.write(changed)
+    
+    def write(self, changed):
+        tables = dict(self.tables())
+        tables.update(changed)
+        write_snapshot(self.path, tables)
+        logger.info('Published shared catalog %s (%s)', self.path, ', '.join(changed))
+
+def create_shared_catalog(path):
+    """SharedCatalog for path, or None (with a warning) where file locking is unavailable"""
+    if fcntl is None:
+        logger.warning('SHARED_CATALOG_PATH is set but file locking is not available here, ignoring it')
+        return None
+    return SharedCatalog(path)
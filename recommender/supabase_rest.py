@@ -0,0 +1,83 @@
+"""Supabase REST access over a pooled keep-alive session"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import HTTP_POOL_SIZE, REQUEST_CONCURRENCY, SUPABASE_KEY, SUPABASE_TIMEOUT, SUPABASE_URL
+from .metrics import SUPABASE_SECONDS, logger
+
+# Fetches one request hands to fetch_executor at most (events, hotels, halls and
+# bookings are independent once the user id is known); one more runs on the request's own thread
+FETCHES_PER_REQUEST = 4
+FETCH_WORKERS = REQUEST_CONCURRENCY * FETCHES_PER_REQUEST
+
+def create_http_session():
+    """Create a keep-alive session so requests reuse pooled TCP/TLS connections"""
+    # Imported here: requests is the slowest import on the cold-start path
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    # Enough kept connections for every fetch thread, or connections past the pool are closed after one use
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(HTTP_POOL_SIZE, FETCH_WORKERS))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """The process-wide session, created on first use and kept for the life of the
+    process (a warm serverless instance reuses its connections across invocations)"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                _http_session = create_http_session()
+    return _http_session
+
+# One pool for the process: REQUEST_CONCURRENCY requests fetch at once without
+# waiting for each other's threads (threads are only started as they are needed)
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='supabase-fetch')
+
+def supabase_query(table: str, select: str = '*', filters: dict = None):
+    """Make a direct REST API call to Supabase"""
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    headers = {
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}'
+    }
+    params = {'select': select}
+    if filters:
+        params.update(filters)
+    
+    start = time.perf_counter()
+    response = get_http_session().get(url, headers=headers, params=params, timeout=SUPABASE_TIMEOUT)
+    elapsed = time.perf_counter() - start
+    SUPABASE_SECONDS.observe(elapsed, table=table)
+    logger.debug('Query %s %s -> %s (%d bytes, %.1fms)', table, params, response.status_code,
+                 len(response.content), elapsed * 1000)
+    response.raise_for_status()
+    return response.json()
+
+def supabase_table_version(table: str, version_column: str):
+    """Cheap change check: row count plus the newest value of version_column"""
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    headers = {
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}',
+        'Prefer': 'count=exact'
+    }
+    params = {
+        'select': version_column,
+        'order': f'{version_column}.desc.nullslast',
+        'limit': 1
+    }
+    
+    response = get_http_session().get(url, headers=headers, params=params, timeout=SUPABASE_TIMEOUT)
+    response.raise_for_status()
+    rows = response.json()
+    row_count = response.headers.get('Content-Range', '*/*').split('/')[-1]
+    latest = rows[0].get(version_column) if rows else None
+    return row_count, latest
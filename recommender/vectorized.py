@@ -0,0 +1,120 @@
+"""Vectorized scoring backend (SCORING_BACKEND=numpy)"""
+from .engine import VenueRecommendationEngine, cached_row
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for SCORING_BACKEND=numpy
+    np = None
+
+class VectorizedVenueRecommendationEngine(VenueRecommendationEngine):
+    """Batch scoring backend: halls are turned into NumPy columns once per catalog
+    and scored against each event in vectorized form.
+    
+    Produces exactly the same recommendations (values, types and order) as
+    VenueRecommendationEngine.
+    """
+    
+    def __init__(self, prefilter=True, plan=None, catalog_slots=1):
+        super().__init__(prefilter, plan, catalog_slots)
+        if np is None:
+            raise RuntimeError('numpy is required for the vectorized scoring backend')
+    
+    def build_catalog_layout(self, hotels, halls):
+        layout = super().build_catalog_layout(hotels, halls)
+        layout['columns'] = self.build_columns(layout)
+        return layout
+    
+    def build_columns(self, layout):
+        """Numpy columns over the layout's slot arrays (capacity and price share their memory)"""
+        return {
+            'hotel_index': np.asarray(layout['slot_hotels']).astype(np.intp, copy=False),
+            'has_hall': np.asarray(layout['slot_halls']) >= 0,
+            'capacity': np.asarray(layout['slot_capacity']),
+            'price': np.asarray(layout['slot_price']),
+        }
+    
+    def score_capacity_batch(self, event_guests, capacity, has_hall):
+        """Vectorized calculate_capacity_score; returns (scores, is_float)"""
+        ratio = capacity / event_guests
+        too_large = 50 - (ratio - 1.5) * 10
+        too_small = 30 - (1.0 - ratio) * 50
+        
+        scores = np.select(
+            [(1.0 <= ratio) & (ratio <= 1.2), (0.8 <= ratio) & (ratio < 1.0), (1.2 < ratio) & (ratio <= 1.5), ratio > 1.5],
+            [100, 70, 85, np.maximum(too_large, 20)],
+            default=np.maximum(too_small, 0)
+        )
+        # max() returns the computed float unless the floor wins, then it returns the int floor
+        is_float = np.where(ratio > 1.5, too_large >= 20, (ratio < 0.8) & (too_small >= 0))
+        
+        missing = np.isnan(capacity)
+        scores = np.where(missing, np.where(has_hall, 25, 50), scores)
+        is_float &= ~missing
+        return scores, is_float
+    
+    def score_budget_batch(self, event_budget, price):
+        """Vectorized calculate_budget_score"""
+        if event_budget is None:
+            return np.full(price.shape, 50.0)
+        
+        price_ratio = price / event_budget
+        scores = np.select(
+            [price_ratio <= 0.7, price_ratio <= 0.85, price_ratio <= 1.0, price_ratio <= 1.15, price_ratio <= 1.3],
+            [100, 90, 80, 50, 30],
+            default=10
+        )
+        return np.where(np.isnan(price), 50, scores)
+    
+    def iter_matches(self, events, hotels, indexes, booking_index=None):
+        """Yield the same matches as VenueRecommendationEngine.iter_matches using batch scoring"""
+        columns = indexes['columns']
+        hotel_rows, hall_rows = {}, {}
+        
+        for event in events:
+            # The scalar path raises ZeroDivisionError here; keep that behaviour
+            if event['guest_count'] == 0 or event.get('budget') == 0:
+                yield from super().iter_matches([event], hotels, indexes, booking_index)
+                continue
+            
+            # Location and event type only depend on the hotel, so score them once per hotel
+            location_by_hotel = self.score_locations(event, indexes)
+            event_type_scores = self.score_event_types(event, indexes['keywords'])
+            event_type = [event_type_scores[hotel_id] for hotel_id in indexes['hotel_ids']]
+            
+            # Only score the candidate slots, kept in generation order
+            if self.prefilter:
+                positions = np.array(self.candidate_positions(event, location_by_hotel, indexes), dtype=np.intp)
+            else:
+                positions = np.arange(len(indexes['slot_hotels']), dtype=np.intp)
+            unavailable = self.unavailable_hotels(event, indexes, booking_index)
+            if unavailable:
+                positions = positions[~np.isin(columns['hotel_index'][positions], list(unavailable))]
+            slot_hotels = columns['hotel_index'][positions]
+            
+            capacity, capacity_is_float = self.score_capacity_batch(
+                event['guest_count'], columns['capacity'][positions], columns['has_hall'][positions])
+            budget = self.score_budget_batch(event.get('budget'), columns['price'][positions])
+            
+            overall = (
+                np.array(location_by_hotel, dtype=np.float64)[slot_hotels] * self.location_weight +
+                capacity * self.capacity_weight +
+                budget * self.budget_weight +
+                np.array(event_type, dtype=np.float64)[slot_hotels] * self.event_type_weight
+            )
+            
+            # round() happens per survivor with Python semantics, so pre-filter with some slack
+            for i in np.flatnonzero(overall >= self.plan.threshold).tolist():
+                overall_score = round(float(overall[i]), 2)
+                if overall_score < self.plan.min_score:
+                    continue
+                
+                position = positions[i]
+                hotel_index, hall_position = indexes['slot_hotels'][position], indexes['slot_halls'][position]
+                scores = {
+                    'location': location_by_hotel[hotel_index],
+                    'capacity': float(capacity[i]) if capacity_is_float[i] else int(capacity[i]),
+                    'budget': int(budget[i]),
+                    'event_type': event_type[hotel_index]
+                }
+                hall = cached_row(indexes['halls'], hall_position, hall_rows) if hall_position >= 0 else None
+                yield overall_score, event, cached_row(hotels, hotel_index, hotel_rows), hall, scores
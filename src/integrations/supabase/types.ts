@@ -142,6 +142,7 @@ export type Database = {
           images: string[] | null
           name: string
           price_per_event: number | null
+          updated_at: string | null
         }
         Insert: {
           capacity: number
@@ -152,6 +153,7 @@ export type Database = {
           images?: string[] | null
           name: string
           price_per_event?: number | null
+          updated_at?: string | null
         }
         Update: {
           capacity?: number
@@ -162,6 +164,7 @@ export type Database = {
           images?: string[] | null
           name?: string
           price_per_event?: number | null
+          updated_at?: string | null
         }
         Relationships: [
           {
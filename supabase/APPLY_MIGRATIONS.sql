@@ -70,6 +70,17 @@ CREATE TRIGGER update_menu_bundles_updated_at
   FOR EACH ROW 
   EXECUTE FUNCTION public.update_updated_at();
 
+-- 5. Track edits to halls (the recommendation service's catalog cache checks updated_at)
+ALTER TABLE public.hotel_halls ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+DROP TRIGGER IF EXISTS update_hotel_halls_updated_at ON public.hotel_halls;
+CREATE TRIGGER update_hotel_halls_updated_at 
+  BEFORE UPDATE ON public.hotel_halls 
+  FOR EACH ROW 
+  EXECUTE FUNCTION public.update_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_hotel_halls_updated_at ON hotel_halls(updated_at DESC);
+
 -- =====================================================
 -- MIGRATION COMPLETE
 -- Your database is now ready for:
@@ -78,4 +89,5 @@ CREATE TRIGGER update_menu_bundles_updated_at
 -- - Menu bundles (menu_bundles table)
 -- - Map location (map_location field)
 -- - Parking capacity (parking_capacity field)
+-- - Hall edit tracking (hotel_halls.updated_at)
 -- =====================================================
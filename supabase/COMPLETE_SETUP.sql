@@ -62,7 +62,8 @@ CREATE TABLE IF NOT EXISTS public.hotel_halls (
   description TEXT,
   images TEXT[],
   price_per_event DECIMAL(10,2),
-  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- Create hotel reviews table
@@ -236,6 +237,7 @@ $$;
 DROP TRIGGER IF EXISTS on_auth_user_created ON auth.users;
 DROP TRIGGER IF EXISTS update_profiles_updated_at ON public.profiles;
 DROP TRIGGER IF EXISTS update_hotels_updated_at ON public.hotels;
+DROP TRIGGER IF EXISTS update_hotel_halls_updated_at ON public.hotel_halls;
 DROP TRIGGER IF EXISTS update_events_updated_at ON public.events;
 DROP TRIGGER IF EXISTS update_invites_updated_at ON public.invites;
 DROP TRIGGER IF EXISTS update_menu_bundles_updated_at ON public.menu_bundles;
@@ -247,6 +249,7 @@ CREATE TRIGGER on_auth_user_created
 
 CREATE TRIGGER update_profiles_updated_at BEFORE UPDATE ON public.profiles FOR EACH ROW EXECUTE FUNCTION public.update_updated_at();
 CREATE TRIGGER update_hotels_updated_at BEFORE UPDATE ON public.hotels FOR EACH ROW EXECUTE FUNCTION public.update_updated_at();
+CREATE TRIGGER update_hotel_halls_updated_at BEFORE UPDATE ON public.hotel_halls FOR EACH ROW EXECUTE FUNCTION public.update_updated_at();
 CREATE TRIGGER update_events_updated_at BEFORE UPDATE ON public.events FOR EACH ROW EXECUTE FUNCTION public.update_updated_at();
 CREATE TRIGGER update_invites_updated_at BEFORE UPDATE ON public.invites FOR EACH ROW EXECUTE FUNCTION public.update_updated_at();
 CREATE TRIGGER update_menu_bundles_updated_at BEFORE UPDATE ON public.menu_bundles FOR EACH ROW EXECUTE FUNCTION public.update_updated_at();
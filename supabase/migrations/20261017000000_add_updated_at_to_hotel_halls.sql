@@ -0,0 +1,8 @@
+-- Track edits to halls like the other catalog tables, so the recommendation service's
+-- catalog cache sees capacity and price changes (it checks each table's newest updated_at)
+ALTER TABLE public.hotel_halls ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+DROP TRIGGER IF EXISTS update_hotel_halls_updated_at ON public.hotel_halls;
+CREATE TRIGGER update_hotel_halls_updated_at BEFORE UPDATE ON public.hotel_halls FOR EACH ROW EXECUTE FUNCTION public.update_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_hotel_halls_updated_at ON hotel_halls(updated_at DESC);